@@ -0,0 +1,158 @@
+"""
+ASGI entry point: async read path in front of the Flask app.
+
+    uvicorn backend.asgi:app --workers 4
+
+`GET /api/current_stock` and `GET /api/products` are served here from a psycopg
+AsyncConnectionPool, so thousands of concurrent readers share a handful of connections without
+holding a thread each. Responses are identical to the Flask views. Every other request (writes,
+admin, UI, static files) is passed through to the WSGI app unchanged.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from backend.app import DATABASE_URL, DB_APPLICATION_NAME, DEFAULT_TENANT_ID, app as flask_app
+from backend.services.product_search import search_page, search_request
+from backend.services.sql_registry import sql_registry
+
+ASYNC_POOL_MIN_SIZE = int(os.getenv("ASYNC_POOL_MIN_SIZE", "2"))
+ASYNC_POOL_MAX_SIZE = int(os.getenv("ASYNC_POOL_MAX_SIZE", "20"))
+ASYNC_POOL_TIMEOUT = float(os.getenv("ASYNC_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+
+PARAM_RE = re.compile(r"(?<![:\w]):([a-z_]\w*)")
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+def _to_psycopg(sql: str) -> str:
+    """`:name` bind parameters (SQLAlchemy text()) -> `%(name)s` (psycopg)."""
+    return PARAM_RE.sub(r"%(\1)s", sql.replace("%", "%%"))
+
+
+SQL_CURRENT_STOCK = _to_psycopg(sql_registry.source("current_stock.current_stock"))
+PRODUCT_SEARCH_SQL = {
+    name: _to_psycopg(sql_registry.source(f"product_search.{name}"))
+    for name in sql_registry.statements("product_search")
+}
+
+
+def _conninfo(url: str) -> str:
+    """SQLAlchemy URL -> libpq URL (drops the +driver suffix)."""
+    scheme, sep, rest = url.partition("://")
+    return f"{scheme.split('+', 1)[0]}{sep}{rest}"
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ReadPath:
+    """Minimal ASGI router: async handlers for the hot GET endpoints, WSGI fallback for the rest."""
+
+    def __init__(self, conninfo: str, fallback: Callable):
+        self.pool = AsyncConnectionPool(
+            conninfo,
+            min_size=ASYNC_POOL_MIN_SIZE,
+            max_size=ASYNC_POOL_MAX_SIZE,
+            timeout=ASYNC_POOL_TIMEOUT,
+            kwargs={"application_name": f"{DB_APPLICATION_NAME}-async"},
+            open=False,
+        )
+        self.fallback = fallback
+        self.routes = {
+            "/api/current_stock": self.current_stock,
+            "/api/products": self.product_search,
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = self.routes.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if handler is None or scope["method"] != "GET":
+            await self.fallback(scope, receive, send)
+            return
+        try:
+            status, body = 200, await handler(scope)
+        except HTTPError as exc:
+            status, body = exc.status, {"error": exc.message}
+        await _send_json(send, status, body)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.pool.open(wait=True)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.pool.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _fetch(self, tenant_id: uuid.UUID, sql: str, params: dict) -> list[dict]:
+        """Run one statement with RLS scoped to the tenant (transaction-local app.tenant_id)."""
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT set_config('app.tenant_id', %s, true)", (str(tenant_id),))
+                cur = conn.cursor(row_factory=dict_row)
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    async def current_stock(self, scope: Scope) -> dict:
+        tenant_id = _require_tenant(scope)
+        args = _query_args(scope)
+        product_id = args.get("product_id")
+        if not product_id:
+            raise HTTPError(400, "product_id required")
+        rows = await self._fetch(tenant_id, SQL_CURRENT_STOCK, {"product_id": product_id})
+        return {"items": rows}
+
+    async def product_search(self, scope: Scope) -> dict:
+        tenant_id = _require_tenant(scope)
+        try:
+            statement, params = search_request(_query_args(scope))
+        except ValueError as exc:
+            raise HTTPError(400, str(exc))
+        rows = await self._fetch(tenant_id, PRODUCT_SEARCH_SQL[statement], params)
+        return search_page(statement, rows, params["limit"])
+
+
+def _query_args(scope: Scope) -> Dict[str, str]:
+    parsed = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return {key: values[0] for key, values in parsed.items()}
+
+
+def _require_tenant(scope: Scope) -> uuid.UUID:
+    headers = dict(scope.get("headers") or [])
+    tid = headers.get(b"x-tenant-id", DEFAULT_TENANT_ID.encode()).decode("latin-1")
+    try:
+        return uuid.UUID(tid)
+    except ValueError:
+        raise HTTPError(400, "Invalid or missing X-Tenant-Id header")
+
+
+async def _send_json(send: Send, status: int, body: Any) -> None:
+    payload = json.dumps(body, default=str).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+app = ReadPath(_conninfo(DATABASE_URL), WsgiToAsgi(flask_app))
@@ -1,47 +1,34 @@
 from __future__ import annotations
 import hashlib
+import json
 import os
 import random
 import time
 import uuid
-from pathlib import Path
 from typing import Any, Dict, List, Mapping
 
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.engine import Engine, Connection
 
-from backend.services.refresh_materialized import refresh_current_stock_mv
+from backend.services.availability_index import AvailabilityIndex, availability_index_for
+from backend.services.metrics import (
+    ALLOCATION_ATTEMPTS,
+    ALLOCATION_BACKOFF_SECONDS,
+    ALLOCATION_CANDIDATE_ROWS,
+    ALLOCATION_HOLD_CONFLICTS,
+    ALLOCATION_RETRIES,
+    metrics,
+)
+from backend.services.sql_registry import sql_registry
 
 RETRY_ERRORS = {"40P01", "40001"}  # deadlock detected / serialization failure
+ALLOCATION_STRATEGIES = ("python", "plpgsql")
+ALLOCATION_STRATEGY = os.getenv("ALLOCATION_STRATEGY", "python").strip().lower()
+ALLOCATION_SLOTS = int(os.getenv("ALLOCATION_SLOTS", "0"))  # stock slots per hot lot/location; 0 disables slotting
 
 
-def _load_named_sql(path: Path) -> dict[str, str]:
-    """
-    Tiny parser for a single .sql file that contains multiple statements,
-    each prefixed with a line:  `-- name: <key>`
-    Returns a dict {key: sql_text}.
-    """
-    content = path.read_text(encoding="utf-8")
-    blocks: dict[str, str] = {}
-    current = None
-    buf: list[str] = []
-    for line in content.splitlines():
-        if line.startswith("-- name:"):
-            if current is not None:
-                blocks[current] = "\n".join(buf).strip()
-                buf = []
-            current = line.split(":", 1)[1].strip()
-        else:
-            buf.append(line)
-    if current is not None:
-        blocks[current] = "\n".join(buf).strip()
-    return blocks
-
-
-SQL = _load_named_sql(
-    Path(__file__).resolve().parents[2] / "db" / "queries" / "allocate.sql"
-)
+SQL = sql_registry.statements("allocate")
 
 
 def _set_timeouts(conn: Connection) -> None:
@@ -55,19 +42,20 @@ def _set_timeouts(conn: Connection) -> None:
         conn.execute(text("SELECT set_config(:key, :value, true)"), {'key': key, 'value': value})
 
 
-def _advisory_lock_order(conn: Connection, tenant_id: uuid.UUID, order_id: uuid.UUID) -> None:
-    """Acquire a per-order advisory lock scoped by tenant."""
+def _order_lock_key(tid: uuid.UUID, oid: uuid.UUID) -> int:
+    """Signed 64-bit advisory lock key for (tenant, order)."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(tid.bytes)
+    digest.update(oid.bytes)
+    value = int.from_bytes(digest.digest(), byteorder="big", signed=False)
+    if value >= 2**63:
+        value -= 2**64
+    return value
 
-    def _lock_key(tid: uuid.UUID, oid: uuid.UUID) -> int:
-        digest = hashlib.blake2b(digest_size=8)
-        digest.update(tid.bytes)
-        digest.update(oid.bytes)
-        value = int.from_bytes(digest.digest(), byteorder="big", signed=False)
-        if value >= 2**63:
-            value -= 2**64
-        return value
 
-    lock_key = _lock_key(tenant_id, order_id)
+def _advisory_lock_order(conn: Connection, tenant_id: uuid.UUID, order_id: uuid.UUID) -> None:
+    """Acquire a per-order advisory lock scoped by tenant."""
+    lock_key = _order_lock_key(tenant_id, order_id)
     conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": lock_key})
 
 
@@ -75,20 +63,63 @@ def _retry_sleep(attempt: int) -> None:
     """
     Exponential backoff with jitter to avoid thundering herds.
     """
-    base = 0.05 * (2 ** attempt)
-    time.sleep(base + random.uniform(0, 0.03))
+    delay = 0.05 * (2 ** attempt) + random.uniform(0, 0.03)
+    metrics.inc(ALLOCATION_BACKOFF_SECONDS, delay)
+    time.sleep(delay)
 
 
 def _select_order_lines(conn: Connection, order_id: uuid.UUID) -> List[Mapping[str, Any]]:
     return list(
-        conn.execute(text(SQL["select_order_lines"]), {"order_id": str(order_id)}).mappings().all()
+        conn.execute(SQL["select_order_lines"], {"order_id": str(order_id)}).mappings().all()
     )
 
 
-def _select_candidates(conn: Connection, product_id: uuid.UUID, take_limit: int = 64) -> List[Mapping[str, Any]]:
+def _select_candidates(
+    conn: Connection,
+    product_id: uuid.UUID,
+    take_limit: int = 64,
+    tenant_id: uuid.UUID | None = None,
+    index: AvailabilityIndex | None = None,
+) -> List[Mapping[str, Any]]:
+    """
+    Lock and return candidate lots for a product.
+    With an availability index, only lots it reports as stocked are locked and aggregated;
+    an empty answer skips the locking query entirely.
+    """
+    if index is not None and tenant_id is not None:
+        lot_ids = index.candidate_lot_ids(conn, tenant_id, product_id)
+        if lot_ids is not None:
+            if not lot_ids:
+                return []
+            return list(
+                conn.execute(
+                    SQL["allocation_candidates_for_lots"],
+                    {"product_id": str(product_id), "lot_ids": lot_ids, "take_limit": take_limit},
+                ).mappings().all()
+            )
+    return list(
+        conn.execute(
+            SQL["allocation_candidates"], {"product_id": str(product_id), "take_limit": take_limit}
+        ).mappings().all()
+    )
+
+
+def _select_slot_candidates(
+    conn: Connection,
+    product_id: uuid.UUID,
+    slot_seed: int,
+    take_limit: int = 1,
+) -> List[Mapping[str, Any]]:
+    """
+    Lock and return stock slot buckets of a product that still have budget (SKIP LOCKED).
+    Each lot/location is entered at bucket `slot_seed` modulo its own bucket count.
+    One bucket at a time by default: a bucket held longer than needed is one less for the
+    allocators running beside this one.
+    """
     return list(
         conn.execute(
-            text(SQL["allocation_candidates"]), {"product_id": str(product_id), "take_limit": take_limit}
+            SQL["allocation_slot_candidates"],
+            {"product_id": str(product_id), "slot_seed": slot_seed, "take_limit": take_limit},
         ).mappings().all()
     )
 
@@ -102,31 +133,35 @@ def _insert_hold_and_reserve(
     warehouse_id: uuid.UUID,
     location_id: uuid.UUID,
     qty: int,
+    slot_no: int | None = None,
 ) -> None:
     """
     Atomic pair:
-      1) Insert HOLD row (enforced by exclusion constraint to avoid overlap).
-      2) Insert RESERVE ledger event with a fresh idempotency key `op_id`.
+      1) Insert HOLD row (enforced by exclusion constraint to avoid overlap; a hold taken from
+         stock slot `slot_no` is bounded by the slot budget instead).
+      2) Insert RESERVE ledger event with a fresh idempotency key `op_id`; a slotted one carries
+         `slot_no`, so its delta is kept on that bucket rather than on dw.current_stock.
     If a duplicate op_id is ever re-sent, the unique index on (tenant_id, op_id)
     in the ledger protects us (idempotent writes).
     """
     hold_id = uuid.uuid4()
-    conn.execute(
-        text(SQL["insert_hold"]),
-        {
-            "id": str(hold_id),
-            "order_id": str(order_id),
-            "order_line_id": str(order_line_id),
-            "product_id": str(product_id),
-            "lot_id": str(lot_id),
-            "warehouse_id": str(warehouse_id),
-            "location_id": str(location_id),
-            "qty": int(qty),
-        },
-    )
+    params = {
+        "id": str(hold_id),
+        "order_id": str(order_id),
+        "order_line_id": str(order_line_id),
+        "product_id": str(product_id),
+        "lot_id": str(lot_id),
+        "warehouse_id": str(warehouse_id),
+        "location_id": str(location_id),
+        "qty": int(qty),
+    }
+    if slot_no is None:
+        conn.execute(SQL["insert_hold"], params)
+    else:
+        conn.execute(SQL["insert_slot_hold"], {**params, "slot_no": int(slot_no)})
 
     conn.execute(
-        text(SQL["insert_ledger_reserve"]),
+        SQL["insert_ledger_reserve"],
         {
             "wh": str(warehouse_id),
             "loc": str(location_id),
@@ -137,10 +172,69 @@ def _insert_hold_and_reserve(
             "delta": -int(qty),
             "reason": "allocation reserve",
             "op_id": str(uuid.uuid4()),
+            "slot_no": None if slot_no is None else int(slot_no),
         },
     )
 
 
+def _reserve_from_slot(
+    conn: Connection,
+    order_id: uuid.UUID,
+    order_line_id: uuid.UUID,
+    product_id: uuid.UUID,
+    slot: Mapping[str, Any],
+    qty: int,
+) -> int:
+    """
+    Take up to `qty` from a locked stock slot: slot budget, HOLD and RESERVE in one savepoint.
+    Budgets never exceed what the lot/location has free (the ledger guard trims them on every
+    unslotted outflow), so the slot row is all this touches. Returns the quantity reserved.
+    """
+    take = min(int(slot["available_qty"]), qty)
+    if take <= 0:
+        return 0
+    with conn.begin_nested():
+        conn.execute(
+            SQL["take_from_slot"],
+            {
+                "product_id": str(product_id),
+                "lot_id": str(slot["lot_id"]),
+                "location_id": str(slot["location_id"]),
+                "slot_no": int(slot["slot_no"]),
+                "qty": take,
+            },
+        )
+        _insert_hold_and_reserve(
+            conn=conn,
+            order_id=order_id,
+            order_line_id=order_line_id,
+            product_id=product_id,
+            lot_id=slot["lot_id"],
+            warehouse_id=slot["warehouse_id"],
+            location_id=slot["location_id"],
+            qty=take,
+            slot_no=slot["slot_no"],
+        )
+    return take
+
+
+def _allocate_in_db(conn: Connection, tenant_id: uuid.UUID, order_id: uuid.UUID) -> List[dict]:
+    """
+    Server-side strategy: core.allocate_order() takes the same advisory lock, locks lots with
+    SKIP LOCKED, writes HOLD + RESERVE rows and marks the order, all in one round trip.
+    """
+    options = {"lock_key": _order_lock_key(tenant_id, order_id)}
+    rows = conn.execute(
+        SQL["allocate_order_fn"], {"order_id": str(order_id), "options": json.dumps(options)}
+    ).mappings().all()
+    return [
+        {
+            "order_line_id": str(r["order_line_id"]),
+            "requested": int(r["requested"]),
+            "allocated": int(r["allocated"]),
+        }
+        for r in rows
+    ]
 
 
 def release_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID) -> dict:
@@ -149,15 +243,14 @@ def release_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID) ->
         with conn.begin():
             conn.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": str(tenant_id)})
             released_rows = conn.execute(
-                text(SQL["release_active_holds"]), {"order_id": str(order_id)}
+                SQL["release_active_holds"], {"order_id": str(order_id)}
             ).mappings().all()
             released_qty = 0
-            ledger_changed = False
             for row in released_rows:
                 qty = int(row["qty"])
                 released_qty += qty
                 conn.execute(
-                    text(SQL["insert_ledger_release"]),
+                    SQL["insert_ledger_release"],
                     {
                         "wh": str(row["warehouse_id"]),
                         "loc": str(row["location_id"]),
@@ -168,13 +261,11 @@ def release_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID) ->
                         "delta": qty,
                         "reason": "manual release",
                         "op_id": str(uuid.uuid4()),
+                        "slot_no": row["slot_no"],
                     },
                 )
-                ledger_changed = True
             if released_rows:
-                conn.execute(text(SQL["mark_order_open"]), {"order_id": str(order_id)})
-            if ledger_changed:
-                refresh_current_stock_mv(conn)
+                conn.execute(SQL["mark_order_open"], {"order_id": str(order_id)})
     return {
         "order_id": str(order_id),
         "released_lines": len(released_rows),
@@ -182,7 +273,14 @@ def release_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID) ->
     }
 
 
-def allocate_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID, request_hint: dict | None = None) -> dict:
+def allocate_order(
+    engine: Engine,
+    tenant_id: uuid.UUID,
+    order_id: uuid.UUID,
+    request_hint: dict | None = None,
+    strategy: str | None = None,
+    slotted: bool | None = None,
+) -> dict:
     """
     End-to-end allocation for a single order.
 
@@ -198,18 +296,43 @@ def allocate_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID, re
     - Idempotency: stock_ledger has a unique (tenant_id, op_id); if a retry repeats an insert,
       the uniqueness check prevents duplicates.
     - Retries: backoff on SQLSTATE 40P01 (deadlock) or 40001 (serialization failure).
+    - Optional availability index (AVAILABILITY_INDEX=1): lots without stock are filtered out
+      before locking, using a per-process cache invalidated by LISTEN/NOTIFY.
+    - No MV refresh: the HOLD/RESERVE ledger rows update dw.current_stock via trigger.
+    - Optional stock slots (ALLOCATION_SLOTS > 0): lot/locations the rebalancer has split into
+      buckets (core.stock_slots) are reserved from one locked bucket instead of a locked lot,
+      so concurrent allocators of one hot lot proceed in parallel: the RESERVE delta is kept on
+      that bucket and folded into dw.current_stock by the rebalancer. Each order starts at its
+      own bucket; what buckets cannot cover falls through to the lot-locking candidates.
+
+    Strategies (`strategy`, else request_hint["strategy"], else ALLOCATION_STRATEGY):
+    - "python": the statement-per-candidate loop below.
+    - "plpgsql": one call to core.allocate_order(), same rules, evaluated set-based in Postgres.
+    Both run inside the same transaction setup and retry loop. Slotting (`slotted`, else
+    ALLOCATION_SLOTS > 0) applies to the "python" strategy; request_hint cannot turn it on.
     """
+    strategy = (strategy or (request_hint or {}).get("strategy") or ALLOCATION_STRATEGY).strip().lower()
+    if strategy not in ALLOCATION_STRATEGIES:
+        raise ValueError(f"strategy must be one of {', '.join(ALLOCATION_STRATEGIES)}")
+    if slotted is None:
+        slotted = ALLOCATION_SLOTS > 0
+    slot_seed = _order_lock_key(tenant_id, order_id) & 0x7FFFFFFF  # where this order enters each key's buckets
     max_attempts = 5
     attempt = 0
     last_err: Exception | None = None
+    index = availability_index_for(engine, SQL["availability_snapshot"])
 
     while attempt < max_attempts:
+        metrics.inc(ALLOCATION_ATTEMPTS, mode="order")
         try:
             with engine.connect() as conn:
                 with conn.begin():
                     # Scope everything to the tenant under RLS
                     conn.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": str(tenant_id)})
                     _set_timeouts(conn)
+                    if strategy == "plpgsql":
+                        results = _allocate_in_db(conn, tenant_id, order_id)
+                        return {"order_id": str(order_id), "lines": results}
                     try:
                         _advisory_lock_order(conn, tenant_id, order_id)
                     except SQLAlchemyError as exc:
@@ -219,12 +342,27 @@ def allocate_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID, re
 
                     lines = _select_order_lines(conn, order_id)
                     results: List[dict] = []
-                    ledger_changed = False
 
                     for line in lines:
                         remaining = int(line["qty"])
                         product_id = line["product_id"]
-                        candidates = _select_candidates(conn, product_id)
+                        locked_rows = 0
+                        while slotted and remaining > 0:
+                            slots = _select_slot_candidates(conn, product_id, slot_seed)
+                            locked_rows += len(slots)
+                            taken = 0
+                            if slots:
+                                taken = _reserve_from_slot(
+                                    conn, order_id, line["order_line_id"], product_id, slots[0], remaining
+                                )
+                            if taken <= 0:
+                                break  # no unlocked bucket with budget left; the lots take the rest
+                            remaining -= taken
+                        candidates = []
+                        if remaining > 0:
+                            candidates = _select_candidates(conn, product_id, tenant_id=tenant_id, index=index)
+                            locked_rows += len(candidates)
+                        metrics.observe(ALLOCATION_CANDIDATE_ROWS, locked_rows)
                         for c in candidates:
                             if remaining <= 0:
                                 break
@@ -244,10 +382,10 @@ def allocate_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID, re
                                         location_id=c["location_id"],
                                         qty=take,
                                     )
-                                ledger_changed = True
                             except IntegrityError as exc:
                                 sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
                                 if sqlstate == "23P01":  # hold overlap, try next candidate
+                                    metrics.inc(ALLOCATION_HOLD_CONFLICTS)
                                     continue
                                 raise
                             remaining -= take
@@ -261,16 +399,14 @@ def allocate_order(engine: Engine, tenant_id: uuid.UUID, order_id: uuid.UUID, re
                         )
 
                     if any(r["allocated"] > 0 for r in results):
-                        conn.execute(text(SQL["mark_order_allocated"]), {"order_id": str(order_id)})
-
-                    if ledger_changed:
-                        refresh_current_stock_mv(conn)
+                        conn.execute(SQL["mark_order_allocated"], {"order_id": str(order_id)})
 
             return {"order_id": str(order_id), "lines": results}
 
         except Exception as e:  # retry on known concurrency errors
             sqlstate = getattr(getattr(e, "orig", None), "sqlstate", None)
             if sqlstate in RETRY_ERRORS:
+                metrics.inc(ALLOCATION_RETRIES, mode="order", sqlstate=sqlstate)
                 attempt += 1
                 _retry_sleep(attempt)
                 last_err = e
@@ -0,0 +1,240 @@
+"""
+Durable allocation queue.
+
+`POST /api/orders/<id>/allocate?async=1` (or `Prefer: respond-async`) stores a row in
+core.allocation_jobs and returns 202; `GET /api/allocation_jobs/<id>` polls it. A separate
+process drains the queue:
+
+    python -m backend.services.allocation_jobs --workers 8
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.services.allocation import _advisory_lock_order, allocate_order
+from backend.services.sql_registry import sql_registry
+from backend.services.stock_slots import StockSlotRebalancer
+
+log = logging.getLogger(__name__)
+
+ALLOCATION_WORKERS = int(os.getenv("ALLOCATION_WORKERS", "4"))
+ALLOCATION_JOB_LEASE = float(os.getenv("ALLOCATION_JOB_LEASE", "60"))  # seconds before a running job is reclaimed
+ALLOCATION_JOB_MAX_ATTEMPTS = int(os.getenv("ALLOCATION_JOB_MAX_ATTEMPTS", "3"))
+ALLOCATION_WORKER_POLL = float(os.getenv("ALLOCATION_WORKER_POLL", "0.5"))  # idle sleep between claims (seconds)
+
+SQL = sql_registry.statements("allocation_jobs")
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def enqueue_allocation(conn: Connection, order_id: uuid.UUID, request_hint: dict | None = None) -> str | None:
+    """
+    Queue an allocation for `order_id` in the caller's tenant transaction and return the job id;
+    the pending job is returned when one exists already. None when the order is not visible.
+    """
+    params = {"order_id": str(order_id), "request_hint": json.dumps(request_hint or {}, default=_json_default)}
+    job_id = conn.execute(SQL["enqueue"], params).scalar_one_or_none()
+    if job_id is None:
+        job_id = conn.execute(SQL["pending_for_order"], params).scalar_one_or_none()
+    return str(job_id) if job_id is not None else None
+
+
+def get_allocation_job(conn: Connection, job_id: uuid.UUID) -> Dict[str, Any] | None:
+    """The job as polled by clients (tenant-scoped by RLS); `ahead` counts the tenant's earlier pending jobs."""
+    row = conn.execute(SQL["get"], {"job_id": str(job_id)}).mappings().first()
+    if row is None:
+        return None
+    job = {key: (value.isoformat() if hasattr(value, "isoformat") else value) for key, value in row.items()}
+    job["job_id"] = str(job.pop("id"))
+    job["order_id"] = str(job["order_id"])
+    return job
+
+
+class AllocationWorkerPool:
+    """
+    Runs queued allocations on `concurrency` threads.
+
+    Each thread claims one job at a time through core.claim_allocation_job (FOR UPDATE SKIP
+    LOCKED): the oldest job whose tenant has no earlier job queued or running, so a tenant's jobs
+    run strictly in submission order while different tenants proceed in parallel. The claim
+    commits before allocate_order runs (its retries and backoff included) and carries a lease,
+    which a heartbeat pushes forward every third of the lease while the job runs; if a worker
+    dies, the job is claimed again once the lease expires, up to `max_attempts`. A reclaimed job
+    first waits for any allocation of its order still in flight (the per-order advisory lock),
+    and one whose order is already allocated is completed without allocating twice.
+    Results are written back fenced on the worker name, for GET /api/allocation_jobs/<id>.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        concurrency: int = ALLOCATION_WORKERS,
+        lease: float = ALLOCATION_JOB_LEASE,
+        max_attempts: int = ALLOCATION_JOB_MAX_ATTEMPTS,
+        poll_interval: float = ALLOCATION_WORKER_POLL,
+        name: str | None = None,
+    ):
+        self.engine = engine
+        self.concurrency = max(1, int(concurrency))
+        self.lease = max(0.0, float(lease))
+        self.max_attempts = max(1, int(max_attempts))
+        self.poll_interval = max(0.0, float(poll_interval))
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()  # counters only
+        self.processed = 0
+        self.failed = 0
+
+    # -- lifecycle -------------------------------------------------------------------------
+    def start(self) -> None:
+        self._stopped.clear()
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for n in range(len(self._threads), self.concurrency):
+            thread = threading.Thread(target=self._run, args=(f"{self.name}/{n}",),
+                                      name=f"allocation-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop claiming; jobs already claimed finish first."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wait(self) -> None:
+        while any(t.is_alive() for t in self._threads):
+            for thread in self._threads:
+                thread.join(1.0)
+
+    def _run(self, worker: str) -> None:
+        while not self._stopped.is_set():
+            try:
+                job = self.run_once(worker)
+            except Exception:
+                log.exception("allocation worker %s failed to claim or record a job", worker)
+                job = None
+            if job is None:
+                self._stopped.wait(self.poll_interval)
+
+    # -- one job ---------------------------------------------------------------------------
+    def claim(self, worker: str) -> Dict[str, Any] | None:
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                SQL["claim"], {"worker": worker, "lease_s": self.lease, "max_attempts": self.max_attempts}
+            ).mappings().first()
+        return dict(row) if row is not None else None
+
+    def run_once(self, worker: str | None = None) -> Dict[str, Any] | None:
+        """Claim and run one job; returns the finished job, or None when nothing is runnable."""
+        worker = worker or f"{self.name}/0"
+        job = self.claim(worker)
+        if job is None:
+            return None
+        return self.process(job, worker)
+
+    def process(self, job: Dict[str, Any], worker: str) -> Dict[str, Any]:
+        tenant_id = uuid.UUID(str(job["tenant_id"]))
+        order_id = uuid.UUID(str(job["order_id"]))
+        status, result, error = "done", None, None
+        finished = threading.Event()
+        heartbeat = None
+        if self.lease > 0:
+            heartbeat = threading.Thread(target=self._renew_lease, args=(job, worker, finished),
+                                         name=f"{threading.current_thread().name}-lease", daemon=True)
+            heartbeat.start()
+        try:
+            if job["attempts"] > 1 and self._order_status(tenant_id, order_id) == "allocated":
+                # The previous attempt committed its holds but never recorded the outcome
+                result = {"order_id": str(order_id), "recovered": True}
+            else:
+                result = allocate_order(self.engine, tenant_id=tenant_id, order_id=order_id,
+                                        request_hint=job["request_hint"] or {})
+        except Exception as exc:
+            status, error = "failed", str(getattr(exc, "orig", exc)).strip()
+            log.warning("allocation job %s for order %s failed: %s", job["id"], order_id, error)
+        finally:
+            finished.set()
+            if heartbeat is not None:
+                heartbeat.join()
+
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": str(tenant_id)})
+            recorded = conn.execute(
+                SQL["finish"],
+                {"job_id": str(job["id"]), "worker": worker, "status": status, "error": error,
+                 "result": json.dumps(result, default=_json_default) if result is not None else None},
+            ).scalar_one_or_none()
+        if recorded is None:
+            log.warning("allocation job %s was reclaimed before %s recorded its outcome", job["id"], worker)
+        with self._lock:
+            self.processed += 1
+            self.failed += status == "failed"
+        return {"job_id": str(job["id"]), "order_id": str(order_id), "status": status, "result": result, "error": error}
+
+    def _renew_lease(self, job: Dict[str, Any], worker: str, finished: threading.Event) -> None:
+        """Extend the job's lease every third of it until `finished`, or until the job is no longer ours."""
+        tenant_id = str(job["tenant_id"])
+        while not finished.wait(self.lease / 3):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": tenant_id})
+                    renewed = conn.execute(
+                        SQL["renew"], {"job_id": str(job["id"]), "worker": worker, "lease_s": self.lease}
+                    ).scalar_one_or_none()
+            except Exception as exc:  # try again next beat; the lease may still hold
+                log.warning("allocation job %s: lease renewal failed: %s", job["id"], exc)
+                continue
+            if renewed is None:
+                log.warning("allocation job %s was reclaimed while %s was running it", job["id"], worker)
+                return
+
+    def _order_status(self, tenant_id: uuid.UUID, order_id: uuid.UUID) -> str | None:
+        """Status of the order once no allocation of it is in flight (allocate_order's advisory lock)."""
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": str(tenant_id)})
+            _advisory_lock_order(conn, tenant_id, order_id)
+            return conn.execute(SQL["order_status"], {"order_id": str(order_id)}).scalar_one_or_none()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="defaults to DATABASE_URL")
+    parser.add_argument("--workers", type=int, default=ALLOCATION_WORKERS, help="concurrent allocations")
+    parser.add_argument("--lease", type=float, default=ALLOCATION_JOB_LEASE, help="seconds before a job is reclaimed")
+    parser.add_argument("--poll-interval", type=float, default=ALLOCATION_WORKER_POLL)
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+
+    # One connection per worker thread, plus headroom for the allocator's own checkout.
+    engine = create_engine(args.database_url, future=True, pool_pre_ping=True,
+                           pool_size=args.workers, max_overflow=args.workers)
+    pool = AllocationWorkerPool(engine, concurrency=args.workers, lease=args.lease, poll_interval=args.poll_interval)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: pool.stop(timeout=0))
+    rebalancer = StockSlotRebalancer(engine)  # no-op without ALLOCATION_SLOTS
+    log.info("allocation worker pool %s: %s workers, %s stock slots", pool.name, pool.concurrency, rebalancer.slots)
+    rebalancer.start()
+    pool.start()
+    pool.wait()
+    rebalancer.stop(timeout=5)
+    engine.dispose()
+    log.info("stopped after %s jobs (%s failed)", pool.processed, pool.failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import json
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Mapping, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.services.allocation import (
+    RETRY_ERRORS,
+    SQL,
+    _order_lock_key,
+    _retry_sleep,
+    _set_timeouts,
+)
+from backend.services.metrics import ALLOCATION_ATTEMPTS, ALLOCATION_RETRIES, metrics
+
+PRIORITY_RULES = ("fifo", "largest_first", "smallest_first", "as_given")
+DEFAULT_CHUNK_SIZE = 500  # orders per transaction; bounds advisory locks held at once
+
+
+def _rank_orders(headers: Sequence[Mapping[str, Any]], order_ids: Sequence[uuid.UUID], priority: str) -> List[uuid.UUID]:
+    position = {oid: i for i, oid in enumerate(order_ids)}
+    rows = [(uuid.UUID(str(h["order_id"])), h["created_at"], int(h["total_qty"])) for h in headers]
+    if priority == "fifo":
+        rows.sort(key=lambda r: (r[1], r[0]))
+    elif priority == "largest_first":
+        rows.sort(key=lambda r: (-r[2], r[1], r[0]))
+    elif priority == "smallest_first":
+        rows.sort(key=lambda r: (r[2], r[1], r[0]))
+    else:  # as_given
+        rows.sort(key=lambda r: position[r[0]])
+    return [r[0] for r in rows]
+
+
+def _allocate_chunk(conn: Connection, tenant_id: uuid.UUID, chunk: Sequence[uuid.UUID]) -> Dict[uuid.UUID, dict]:
+    """
+    Allocate one chunk of ranked orders inside the caller's transaction.
+    Returns per-order results; orders locked by another allocator (or no longer open) are
+    reported as "skipped".
+    """
+    locked_rows = conn.execute(
+        SQL["wave_lock_orders"],
+        {
+            "order_ids": [str(oid) for oid in chunk],
+            "lock_keys": [_order_lock_key(tenant_id, oid) for oid in chunk],
+        },
+    ).scalars().all()
+    locked = {uuid.UUID(str(oid)) for oid in locked_rows}
+    results: Dict[uuid.UUID, dict] = {
+        oid: {"order_id": str(oid), "status": "skipped", "lines": []} for oid in chunk if oid not in locked
+    }
+    if not locked:
+        return results
+
+    lines_by_order: Dict[uuid.UUID, List[Mapping[str, Any]]] = defaultdict(list)
+    for line in conn.execute(
+        SQL["wave_order_lines"], {"order_ids": [str(oid) for oid in locked]}
+    ).mappings():
+        lines_by_order[uuid.UUID(str(line["order_id"]))].append(line)
+
+    product_ids = sorted({str(line["product_id"]) for lines in lines_by_order.values() for line in lines})
+    candidates: Dict[str, deque] = defaultdict(deque)
+    if product_ids:
+        for c in conn.execute(SQL["wave_candidates"], {"product_ids": product_ids}).mappings():
+            candidates[str(c["product_id"])].append(c)
+
+    # In-memory distribution in priority order. holds_no_overlap allows one active hold per
+    # lot/location, so a candidate serves a single order line, exactly as in allocate_order.
+    holds: List[dict] = []
+    allocated_orders: List[str] = []
+    for oid in chunk:
+        if oid not in locked:
+            continue
+        line_results = []
+        for line in lines_by_order.get(oid, []):
+            remaining = int(line["qty"])
+            pool = candidates.get(str(line["product_id"]))
+            while remaining > 0 and pool:
+                c = pool.popleft()
+                take = min(int(c["available_qty"]), remaining)
+                holds.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "order_id": str(oid),
+                        "order_line_id": str(line["order_line_id"]),
+                        "product_id": str(line["product_id"]),
+                        "lot_id": str(c["lot_id"]),
+                        "warehouse_id": str(c["warehouse_id"]),
+                        "location_id": str(c["location_id"]),
+                        "qty": take,
+                    }
+                )
+                remaining -= take
+            line_results.append(
+                {
+                    "order_line_id": str(line["order_line_id"]),
+                    "requested": int(line["qty"]),
+                    "allocated": int(line["qty"]) - remaining,
+                }
+            )
+        requested = sum(r["requested"] for r in line_results)
+        allocated = sum(r["allocated"] for r in line_results)
+        if allocated > 0:
+            allocated_orders.append(str(oid))
+        status = "allocated" if requested and allocated == requested else "partial" if allocated else "unallocated"
+        results[oid] = {"order_id": str(oid), "status": status, "lines": line_results}
+
+    if holds:
+        conn.execute(SQL["wave_insert_holds_and_reserves"], {"holds": json.dumps(holds)})
+    if allocated_orders:
+        conn.execute(SQL["wave_mark_orders_allocated"], {"order_ids": allocated_orders})
+    return results
+
+
+def allocate_wave(
+    engine: Engine,
+    tenant_id: uuid.UUID,
+    order_ids: Sequence[uuid.UUID],
+    priority: str = "fifo",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Allocate a wave of orders in bulk.
+
+    - Orders are ranked once by `priority` (fifo | largest_first | smallest_first | as_given),
+      then processed in chunks of `chunk_size`, one transaction per chunk.
+    - Per chunk: try-lock the per-order advisory locks (orders held elsewhere are skipped), load
+      all lines in one query, lock candidate lots for every product once, distribute stock in
+      memory, and write every HOLD and RESERVE row with a single statement.
+    - Chunks retry on 40P01/40001 with the same backoff as allocate_order.
+    """
+    if priority not in PRIORITY_RULES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITY_RULES)}")
+    started = time.perf_counter()
+    unique_ids = list(dict.fromkeys(order_ids))
+
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": str(tenant_id)})
+            headers = conn.execute(
+                SQL["wave_order_headers"], {"order_ids": [str(oid) for oid in unique_ids]}
+            ).mappings().all()
+    ranked = _rank_orders(headers, unique_ids, priority)
+
+    results: Dict[uuid.UUID, dict] = {
+        oid: {"order_id": str(oid), "status": "not_open", "lines": []} for oid in unique_ids
+    }
+    for start in range(0, len(ranked), max(1, chunk_size)):
+        chunk = ranked[start:start + max(1, chunk_size)]
+        attempt = 0
+        while True:
+            metrics.inc(ALLOCATION_ATTEMPTS, mode="wave")
+            try:
+                with engine.connect() as conn:
+                    with conn.begin():
+                        conn.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": str(tenant_id)})
+                        _set_timeouts(conn)
+                        chunk_results = _allocate_chunk(conn, tenant_id, chunk)
+                results.update(chunk_results)  # only once the chunk has committed
+                break
+            except Exception as e:
+                sqlstate = getattr(getattr(e, "orig", None), "sqlstate", None)
+                attempt += 1
+                if sqlstate in RETRY_ERRORS and attempt < 5:
+                    metrics.inc(ALLOCATION_RETRIES, mode="wave", sqlstate=sqlstate)
+                    _retry_sleep(attempt)
+                    continue
+                raise
+
+    elapsed = time.perf_counter() - started
+    ordered = [results[oid] for oid in unique_ids]
+    processed = [r for r in ordered if r["status"] not in {"skipped", "not_open"}]
+    units_requested = sum(line["requested"] for r in processed for line in r["lines"])
+    units_allocated = sum(line["allocated"] for r in processed for line in r["lines"])
+    return {
+        "priority": priority,
+        "orders": ordered,
+        "stats": {
+            "orders_requested": len(unique_ids),
+            "orders_processed": len(processed),
+            "orders_skipped": len(unique_ids) - len(processed),
+            "orders_fully_allocated": sum(1 for r in processed if r["status"] == "allocated"),
+            "units_requested": units_requested,
+            "units_allocated": units_allocated,
+            "elapsed_s": round(elapsed, 4),
+            "orders_per_s": round(len(processed) / elapsed, 1) if elapsed > 0 else None,
+        },
+    }
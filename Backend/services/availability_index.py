@@ -0,0 +1,170 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Tuple
+
+import psycopg
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+
+log = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "osl_stock_changed"  # raised by core.notify_stock_changed()
+AVAILABILITY_INDEX_ENABLED = os.getenv("AVAILABILITY_INDEX", "0") == "1"
+AVAILABILITY_INDEX_MAX_PRODUCTS = int(os.getenv("AVAILABILITY_INDEX_MAX_PRODUCTS", "10000"))
+
+Key = Tuple[str, str]  # (tenant_id, product_id)
+
+
+class AvailabilityIndex:
+    """
+    Per-process cache of which (lot, warehouse, location) rows of a product have stock.
+
+    Entries are keyed by (tenant, product), kept in LRU order and capped at `max_products`.
+    A listener thread holds a dedicated LISTEN connection and drops the entry for every
+    (tenant, product) named in an osl_stock_changed notification, so the next allocation
+    reloads it. Every ledger insert and hold change notifies, from any session; processes
+    without the index simply do not LISTEN. The index is only a pre-filter: the locking candidate query still recomputes
+    availability for the lots it returns. While the listener is down, lookups return None and
+    callers fall back to the unfiltered query.
+    """
+
+    def __init__(self, engine: Engine, snapshot_sql: TextClause, max_products: int = AVAILABILITY_INDEX_MAX_PRODUCTS):
+        self.engine = engine
+        self.snapshot_sql = snapshot_sql
+        self.max_products = max(1, max_products)
+        self._entries: "OrderedDict[Key, List[dict]]" = OrderedDict()
+        self._loading: Dict[Key, object] = {}
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.hits = 0
+        self.misses = 0
+
+    # -- lifecycle -------------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="availability-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _conninfo(self) -> str:
+        return self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def _listen_forever(self) -> None:
+        backoff = 0.5
+        while not self._stopped.is_set():
+            try:
+                with psycopg.connect(self._conninfo(), autocommit=True) as listen_conn:
+                    listen_conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    self._listening.set()
+                    backoff = 0.5
+                    while not self._stopped.is_set():
+                        for note in listen_conn.notifies(timeout=1.0):
+                            self._on_notify(note.payload)
+            except Exception as exc:
+                log.warning("availability index listener disconnected: %s", exc)
+            finally:
+                # Notifications may have been missed; nothing cached is trustworthy any more.
+                self._listening.clear()
+                self.clear()
+            if not self._stopped.wait(backoff):
+                backoff = min(backoff * 2, 30.0)
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            self.invalidate(str(data["t"]), str(data["p"]))
+        except (ValueError, KeyError, TypeError):
+            self.clear()
+
+    # -- cache ops -------------------------------------------------------------------------
+    def invalidate(self, tenant_id: Any, product_id: Any) -> None:
+        key = (str(tenant_id), str(product_id))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+
+    def available(self, conn: Connection, tenant_id: Any, product_id: Any) -> List[dict] | None:
+        """
+        Stocked (lot, warehouse, location) rows for the product, ranked expiry-first.
+        `conn` must already carry app.tenant_id. Returns None when the index cannot be trusted.
+        """
+        if not self._listening.is_set():
+            self.start()
+            return None
+        key = (str(tenant_id), str(product_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            token = object()
+            self._loading[key] = token
+
+        rows = [
+            dict(r)
+            for r in conn.execute(self.snapshot_sql, {"product_id": str(product_id)}).mappings()
+        ]
+        with self._lock:
+            # An invalidation that raced with the load removed the token: do not cache stale rows.
+            if self._loading.get(key) is token:
+                del self._loading[key]
+                self._entries[key] = rows
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_products:
+                    self._entries.popitem(last=False)
+        return rows
+
+    def candidate_lot_ids(self, conn: Connection, tenant_id: Any, product_id: Any) -> List[str] | None:
+        rows = self.available(conn, tenant_id, product_id)
+        if rows is None:
+            return None
+        return list(dict.fromkeys(str(r["lot_id"]) for r in rows))
+
+    def stats(self) -> Mapping[str, Any]:
+        with self._lock:
+            return {
+                "listening": self._listening.is_set(),
+                "entries": len(self._entries),
+                "max_products": self.max_products,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_indexes: Dict[int, AvailabilityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def availability_index_for(engine: Engine, snapshot_sql: TextClause) -> AvailabilityIndex | None:
+    """
+    Process-wide index per engine, or None when AVAILABILITY_INDEX is not enabled.
+    `snapshot_sql` is the unlocked per-product availability query (allocate.sql).
+    """
+    if not AVAILABILITY_INDEX_ENABLED:
+        return None
+    with _indexes_lock:
+        index = _indexes.get(id(engine))
+        if index is None:
+            index = AvailabilityIndex(engine, snapshot_sql)
+            _indexes[id(engine)] = index
+            index.start()
+    return index
@@ -0,0 +1,344 @@
+"""
+Synthetic multi-tenant dataset generator.
+
+    python -m backend.services.datagen --tenants 20 --products 20000 --months 24 \\
+        --events 250000 --workers 8 --seed 7
+
+Per tenant it loads products with Zipf-skewed popularity, warehouses and locations, one lot per
+product and month received (with an expiry date), `--months` of ledger history (one partition
+per month, ending with the month before the current one or an earlier --end-month) and open
+orders, of which `--hold-ratio` are allocated through the normal allocator (holds + RESERVE rows).
+
+Ledger rows are generated in Python and streamed with COPY into a session temp table, then merged
+into core.stock_ledger under the tenant's RLS context, so constraints and the ledger triggers
+(current stock, daily movements, FIFO layers) apply as for any other writer. One job per (tenant,
+month) runs in a process pool; each month's lots are new, so jobs never touch the same stock key.
+
+Everything derives from --seed: ids are md5('seed:kind:...') read as uuids (the SQL seeds use the
+same formula) and quantities, timestamps and op ids come from a random.Random per (tenant, month).
+Re-running with the same arguments inserts nothing new. Connects with DATABASE_URL (the app role);
+refresh the analytics views afterwards (/admin/refresh_mv).
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+from itertools import accumulate
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from backend.services.allocation import RETRY_ERRORS, allocate_order
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+SQL = sql_registry.statements("datagen")
+PARTITION_SQL = sql_registry.statements("partitions")
+
+STAGE_COLUMNS = ("event_type", "warehouse_id", "location_id", "product_id", "lot_id", "qty_delta", "op_id", "ts_epoch")
+COPY_CHUNK = 10_000  # lines per copy.write()
+RECEIPT_WINDOW = 6 * 3600  # receipts land in the first hours of the month, before any outbound row
+ADJUST_OUT_SHARE = 0.02  # of outbound events; the rest are SHIP
+MAX_RETRIES = 5
+
+_engine: Engine | None = None  # per worker process
+
+
+def seeded_uuid(seed: int, kind: str, *parts: Any) -> str:
+    """The uuid the SQL seeds give row `parts` of `kind`: md5('seed:kind:a:b...')."""
+    digest = hashlib.md5(":".join([str(seed), kind, *map(str, parts)]).encode()).hexdigest()
+    return str(uuid.UUID(digest))
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _epoch(month: date) -> int:
+    return int(datetime(month.year, month.month, 1, tzinfo=timezone.utc).timestamp())
+
+
+def _popularity(seed: int, tenant_no: int, products: int, skew: float):
+    """Product numbers in popularity order (a per-tenant shuffle) and their cumulative Zipf weights."""
+    ranked = list(range(1, products + 1))
+    random.Random(f"{seed}:popularity:{tenant_no}").shuffle(ranked)
+    return ranked, list(accumulate(1.0 / rank ** skew for rank in range(1, products + 1)))
+
+
+def _init_worker(database_url: str) -> None:
+    global _engine
+    _engine = create_engine(database_url, future=True, pool_size=1, max_overflow=0)
+
+
+def _write_batch(tenant_id: str, lines: Sequence[str], lots: Dict[str, Any] | None = None) -> int:
+    """COPY one batch into the stage and merge it into the ledger; retried on deadlock/serialization."""
+    attempt = 0
+    while True:
+        try:
+            with _engine.begin() as conn:
+                conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": tenant_id})
+                if lots is not None:
+                    conn.execute(SQL["seed_lots"], lots)
+                conn.execute(SQL["create_ledger_stage"])
+                raw = conn.connection.driver_connection
+                with raw.cursor() as cur:
+                    with cur.copy(f"COPY pg_temp.datagen_ledger_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN") as copy:
+                        for i in range(0, len(lines), COPY_CHUNK):
+                            copy.write("".join(lines[i:i + COPY_CHUNK]))
+                return int(conn.execute(SQL["merge_ledger_stage"]).scalar_one())
+        except DBAPIError as exc:
+            sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
+            if sqlstate not in RETRY_ERRORS or attempt >= MAX_RETRIES:
+                raise
+            attempt += 1
+            time.sleep(0.05 * 2 ** attempt + random.uniform(0, 0.03))
+
+
+def _load_month(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate and load one tenant-month: outbound events are drawn first (product by popularity,
+    qty 1-5, uniform over the month after the receipt window), then every product that shipped
+    gets one receipt into this month's lot covering its outflow plus 5-30% safety stock. Receipts
+    are written first, so stock never goes negative, whichever batch or job commits first.
+    """
+    started = time.perf_counter()
+    seed, t, month = job["seed"], job["tenant_no"], job["month"]
+    tenant_id = seeded_uuid(seed, "tenant", t)
+    tag = month.strftime("%Y%m")
+    rng = random.Random(f"{seed}:ledger:{t}:{tag}")
+    ranked, cum_weights = _popularity(seed, t, job["products"], job["skew"])
+
+    start = _epoch(month)
+    span = _epoch(_add_months(month, 1)) - start - RECEIPT_WINDOW
+    n = job["events"]
+    picks = array("i", rng.choices(ranked, cum_weights=cum_weights, k=n))
+    qtys = array("i", (rng.randint(1, 5) for _ in range(n)))
+    stamps = array("q", (start + RECEIPT_WINDOW + rng.randrange(span) for _ in range(n)))
+    adjust = [rng.random() < ADJUST_OUT_SHARE for _ in range(n)]
+
+    outflow: Dict[int, int] = {}
+    for p, q in zip(picks, qtys):
+        outflow[p] = outflow.get(p, 0) + q
+    received = sorted(outflow)
+
+    # Where each product's lot for this month lives, as tab-separated uuid columns.
+    ordinal = month.year * 12 + month.month
+    keys: Dict[int, str] = {}
+    for p in received:
+        w = 1 + (p + ordinal) % job["warehouses"]
+        loc = 1 + (p * 7 + ordinal) % job["locations"]
+        keys[p] = "\t".join((
+            seeded_uuid(seed, "warehouse", t, w),
+            seeded_uuid(seed, "location", t, w, loc),
+            seeded_uuid(seed, "product", t, p),
+            seeded_uuid(seed, "lot", t, p, tag),
+        ))
+
+    def rows():
+        for p in received:
+            qty = outflow[p] + max(1, outflow[p] * rng.randint(5, 30) // 100)
+            yield f"RECEIPT\t{keys[p]}\t{qty}\t{rng.getrandbits(128):032x}\t{start + rng.randrange(RECEIPT_WINDOW)}\n"
+        for i in range(n):
+            kind = "ADJUST_OUT" if adjust[i] else "SHIP"
+            yield f"{kind}\t{keys[picks[i]]}\t{-qtys[i]}\t{rng.getrandbits(128):032x}\t{stamps[i]}\n"
+
+    lots = {"seed": seed, "tenant_no": t, "month": month, "product_nos": received}
+    inserted = generated = 0
+    batch: List[str] = []
+    for line in rows():
+        batch.append(line)
+        if len(batch) >= job["batch_rows"]:
+            inserted += _write_batch(tenant_id, batch, lots)
+            generated += len(batch)
+            batch, lots = [], None
+    if batch or lots is not None:
+        inserted += _write_batch(tenant_id, batch, lots)
+        generated += len(batch)
+    return {
+        "tenant_no": t,
+        "month": tag,
+        "lots": len(received),
+        "rows_generated": generated,
+        "rows_inserted": inserted,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def _load_orders(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Open orders of 1-3 lines (skewed products, qty 1-3); allocate the first `hold_ratio` of them."""
+    seed, t = job["seed"], job["tenant_no"]
+    tenant_id = seeded_uuid(seed, "tenant", t)
+    rng = random.Random(f"{seed}:orders:{t}")
+    ranked, cum_weights = _popularity(seed, t, job["products"], job["skew"])
+    now = time.time()
+
+    orders, lines = [], []
+    for n in range(1, job["orders"] + 1):
+        order_id = seeded_uuid(seed, "order", t, n)
+        created_at = datetime.fromtimestamp(now - rng.randrange(7 * 86400), timezone.utc)
+        orders.append({"id": order_id, "external_ref": f"DG-{t}-{n:07d}", "created_at": created_at})
+        products = rng.choices(ranked, cum_weights=cum_weights, k=rng.randint(1, 3))
+        for k, p in enumerate(dict.fromkeys(products), start=1):
+            lines.append({
+                "id": seeded_uuid(seed, "order_line", t, n, k),
+                "order_id": order_id,
+                "product_id": seeded_uuid(seed, "product", t, p),
+                "qty": rng.randint(1, 3),
+                "created_at": created_at,
+            })
+    held = [o["id"] for o in orders[: round(job["orders"] * job["hold_ratio"])]]
+
+    with _engine.begin() as conn:
+        conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": tenant_id})
+        if orders:
+            conn.execute(SQL["insert_order"], orders)
+            conn.execute(SQL["insert_order_line"], lines)
+        pending = conn.execute(SQL["unheld_open_orders"], {"order_ids": held}).scalars().all()
+
+    allocated_orders = allocated_qty = 0
+    for order_id in pending:  # orders for products without stock stay open and unheld
+        result = allocate_order(_engine, tenant_id=uuid.UUID(tenant_id), order_id=order_id, request_hint={})
+        qty = sum(line["allocated"] for line in result["lines"])
+        allocated_orders += qty > 0
+        allocated_qty += qty
+    return {"tenant_no": t, "orders": len(orders), "order_lines": len(lines),
+            "allocated_orders": allocated_orders, "allocated_qty": allocated_qty}
+
+
+def generate(
+    database_url: str,
+    seed: int = 42,
+    tenants: int = 2,
+    products: int = 1000,
+    warehouses: int = 2,
+    locations: int = 20,
+    months: int = 3,
+    end_month: date | None = None,
+    events: int = 10_000,
+    skew: float = 1.1,
+    orders: int = 100,
+    hold_ratio: float = 0.5,
+    batch_rows: int = 200_000,
+    workers: int = os.cpu_count() or 1,
+) -> Dict[str, Any]:
+    """
+    Load the dataset described in the module docstring and return a summary. `products`,
+    `warehouses`, `orders` are per tenant, `locations` per warehouse and `events` the outbound
+    ledger rows per tenant and month. Only completed months are generated: rows are spread over
+    the whole month, and the current month would get rows dated after now(). Raises ValueError
+    for an `end_month` that has not ended yet, and when the history would fall inside an already
+    closed ledger period.
+    """
+    if min(tenants, products, warehouses, locations, months, batch_rows) < 1 or events < 0 or orders < 0:
+        raise ValueError("counts must be positive")
+    if not 0 <= hold_ratio <= 1:
+        raise ValueError("hold_ratio must be between 0 and 1")
+    started = time.perf_counter()
+    today = datetime.now(timezone.utc).date()
+    last = end_month.replace(day=1) if end_month else _add_months(today.replace(day=1), -1)
+    if last >= today.replace(day=1):
+        raise ValueError(f"end_month {last:%Y-%m} has not ended yet; generate up to {_add_months(today.replace(day=1), -1):%Y-%m}")
+    history = [_add_months(last, -k) for k in range(months - 1, -1, -1)]
+    tenant_ids = [seeded_uuid(seed, "tenant", t) for t in range(1, tenants + 1)]
+
+    engine = create_engine(database_url, future=True)
+    try:
+        with engine.begin() as conn:
+            closed = conn.execute(SQL["closed_through"], {"since": datetime(history[0].year, history[0].month, 1, tzinfo=timezone.utc)}).scalar()
+            if closed:
+                raise ValueError(f"ledger is closed through {closed}; generate fewer months or a later --end-month")
+            for month in history:
+                conn.execute(PARTITION_SQL["create_partition"], {"month": month})
+        for t, tenant_id in enumerate(tenant_ids, start=1):
+            params = {"seed": seed, "tenant_no": t, "products": products, "warehouses": warehouses, "locations": locations}
+            with engine.begin() as conn:
+                conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": tenant_id})
+                conn.execute(SQL["upsert_tenant"], {"name": f"Datagen {seed}-{t}"})
+                for key in ("seed_products", "seed_warehouses", "seed_locations"):
+                    conn.execute(SQL[key], params)
+    finally:
+        engine.dispose()  # workers open their own connections
+
+    common = {"seed": seed, "products": products, "warehouses": warehouses, "locations": locations,
+              "skew": skew, "events": events, "orders": orders, "hold_ratio": hold_ratio, "batch_rows": batch_rows}
+    # Tenant-major: concurrent jobs are mostly one tenant's months, whose days do not overlap.
+    month_jobs = [{**common, "tenant_no": t, "month": m} for t in range(1, tenants + 1) for m in history]
+    order_jobs = [{**common, "tenant_no": t} for t in range(1, tenants + 1)]
+
+    months_loaded: List[Dict[str, Any]] = []
+    orders_loaded: List[Dict[str, Any]] = []
+    if workers <= 1:
+        _init_worker(database_url)
+        try:
+            months_loaded = [_load_month(job) for job in month_jobs]
+            orders_loaded = [_load_orders(job) for job in order_jobs]
+        finally:
+            _engine.dispose()
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(database_url,)) as pool:
+            for future in as_completed([pool.submit(_load_month, job) for job in month_jobs]):
+                result = future.result()
+                months_loaded.append(result)
+                log.info("tenant %s %s: %s rows in %ss", result["tenant_no"], result["month"],
+                         result["rows_inserted"], result["elapsed_s"])
+            orders_loaded = list(pool.map(_load_orders, order_jobs))
+
+    elapsed = time.perf_counter() - started
+    inserted = sum(r["rows_inserted"] for r in months_loaded)
+    return {
+        "seed": seed,
+        "tenant_ids": tenant_ids,
+        "months": [m.strftime("%Y-%m") for m in history],
+        "lots": sum(r["lots"] for r in months_loaded),
+        "rows_generated": sum(r["rows_generated"] for r in months_loaded),
+        "ledger_rows": inserted,
+        "orders": sum(r["orders"] for r in orders_loaded),
+        "allocated_orders": sum(r["allocated_orders"] for r in orders_loaded),
+        "allocated_qty": sum(r["allocated_qty"] for r in orders_loaded),
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(inserted / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="defaults to DATABASE_URL")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tenants", type=int, default=2)
+    parser.add_argument("--products", type=int, default=1000, help="per tenant")
+    parser.add_argument("--warehouses", type=int, default=2, help="per tenant")
+    parser.add_argument("--locations", type=int, default=20, help="per warehouse")
+    parser.add_argument("--months", type=int, default=3, help="ledger months (partitions) to generate")
+    parser.add_argument("--end-month", type=lambda v: datetime.strptime(v, "%Y-%m").date(),
+                        help="last generated month, YYYY-MM; must have ended (default: the previous month)")
+    parser.add_argument("--events", type=int, default=10_000, help="outbound ledger rows per tenant and month")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of SKU popularity; 0 is uniform")
+    parser.add_argument("--orders", type=int, default=100, help="open orders per tenant")
+    parser.add_argument("--hold-ratio", type=float, default=0.5, help="share of open orders allocated")
+    parser.add_argument("--batch-rows", type=int, default=200_000, help="ledger rows per COPY + merge transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = vars(parser.parse_args())
+    database_url = args.pop("database_url")
+    if not database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    print(json.dumps(generate(database_url, **args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Mapping, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+
+from backend.services.sql_registry import sql_registry
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))  # rows fetched per server-side cursor round trip
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+LEDGER_COLUMNS = (
+    "id", "ts", "event_type", "product_id", "warehouse_id", "location_id", "lot_id",
+    "order_id", "order_line_id", "qty_delta", "reason", "op_id",
+)
+CURRENT_STOCK_COLUMNS = ("product_id", "warehouse_id", "location_id", "lot_id", "qty", "updated_at")
+
+SQL = sql_registry.statements("exports")
+
+
+def _timestamp(args: Mapping[str, str], name: str) -> datetime | None:
+    raw = (args.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an ISO-8601 timestamp") from exc
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _uuid(args: Mapping[str, str], name: str) -> str | None:
+    raw = (args.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return str(uuid.UUID(raw))
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a valid UUID") from exc
+
+
+def _limit(args: Mapping[str, str]) -> int | None:
+    if not args.get("limit"):
+        return None
+    try:
+        limit = int(args["limit"])
+    except (TypeError, ValueError) as exc:
+        raise ValueError("limit must be an integer") from exc
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return limit
+
+
+def export_format(args: Mapping[str, str], accept: str = "") -> str:
+    """`format` query arg, else the Accept header; NDJSON by default."""
+    fmt = (args.get("format") or "").strip().lower()
+    if not fmt:
+        fmt = "csv" if "text/csv" in accept else "ndjson"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def ledger_request(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Bind params for exports.ledger: `from` (inclusive) / `to` (exclusive) timestamps, optional
+    `after_ts` + `after_id` resume point, optional `limit`. Raises ValueError for bad input.
+    """
+    params = {
+        "from_ts": _timestamp(args, "from"),
+        "to_ts": _timestamp(args, "to"),
+        "after_ts": _timestamp(args, "after_ts"),
+        "after_id": _uuid(args, "after_id"),
+        "limit": _limit(args),
+    }
+    if (params["after_ts"] is None) != (params["after_id"] is None):
+        raise ValueError("after_ts and after_id must be given together")
+    if params["from_ts"] and params["to_ts"] and params["from_ts"] >= params["to_ts"]:
+        raise ValueError("from must be earlier than to")
+    return params
+
+
+def current_stock_request(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Bind params for exports.current_stock: optional `from_product_id` resume point and `limit`."""
+    return {"from_product_id": _uuid(args, "from_product_id"), "limit": _limit(args)}
+
+
+def _value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def stream_export(
+    conn: Connection,
+    tenant_id: uuid.UUID,
+    statement: TextClause,
+    params: Mapping[str, Any],
+    columns: Sequence[str],
+    fmt: str,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[str]:
+    """
+    Yield the export body in chunks of `batch_rows` rows.
+
+    The statement runs through a named server-side cursor (`yield_per`), so the app holds one batch
+    at a time however large the export is. The generator closes `conn` when the stream ends or the
+    client goes away; it must not be a request-scoped connection. A generator that is never started
+    never runs that cleanup, so the caller must close `conn` too (closing twice is harmless).
+    """
+    try:
+        with conn.begin():
+            conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": str(tenant_id)})
+            result = conn.execute(statement, dict(params), execution_options={"yield_per": batch_rows})
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n") if fmt == "csv" else None
+            if writer is not None:
+                writer.writerow(columns)
+            for batch in result.partitions():
+                for row in batch:
+                    values = [_value(row[i]) for i in range(len(columns))]
+                    if writer is not None:
+                        writer.writerow(values)
+                    else:
+                        buf.write(json.dumps(dict(zip(columns, values)), separators=(",", ":")))
+                        buf.write("\n")
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if writer is not None and buf.tell():
+                yield buf.getvalue()  # header of an empty export
+    finally:
+        conn.close()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import IO, Any, Iterable, Iterator, List, Mapping
+
+from sqlalchemy.engine import Connection
+
+from backend.services.sql_registry import sql_registry
+
+ALLOWED_LEDGER_EVENTS = {"RECEIPT", "SHIP", "ADJUST_IN", "ADJUST_OUT"}
+INBOUND_EVENTS = {"RECEIPT", "ADJUST_IN"}
+
+# Column order of pg_temp.stock_event_stage as written by COPY.
+STAGE_COLUMNS = (
+    "row_no", "event_type", "warehouse_id", "location_id", "product_id", "lot_id",
+    "order_id", "order_line_id", "qty_delta", "reason", "op_id", "ts",
+)
+
+NDJSON_MIMETYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+CSV_MIMETYPES = {"text/csv", "application/csv"}
+
+SQL = sql_registry.statements("ingest")
+
+
+def _optional_uuid(value: Any, label: str) -> uuid.UUID | None:
+    if value is None or value == "":
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"{label} must be a valid UUID") from exc
+
+
+def normalize_stock_event(payload: Mapping[str, Any]) -> dict:
+    """
+    Validate one inbound stock event (API JSON body, NDJSON line or CSV row) and return the
+    ledger column values. Raises ValueError with a client-facing message.
+    """
+    event_type = (payload.get("event_type") or "").upper()
+    if event_type not in ALLOWED_LEDGER_EVENTS:
+        raise ValueError("invalid event_type")
+    try:
+        qty = int(payload.get("qty", 0))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("qty must be an integer") from exc
+    if qty <= 0:
+        raise ValueError("qty must be positive")
+
+    if not payload.get("warehouse_id") or not payload.get("product_id"):
+        raise ValueError("warehouse_id and product_id are required")
+
+    ts = payload.get("ts") or None
+    if ts is not None and not isinstance(ts, datetime):
+        try:
+            ts = datetime.fromisoformat(str(ts))
+        except ValueError as exc:
+            raise ValueError("ts must be an ISO-8601 timestamp") from exc
+
+    return {
+        "event_type": event_type,
+        "warehouse_id": _optional_uuid(payload.get("warehouse_id"), "warehouse_id"),
+        "location_id": _optional_uuid(payload.get("location_id"), "location_id"),
+        "product_id": _optional_uuid(payload.get("product_id"), "product_id"),
+        "lot_id": _optional_uuid(payload.get("lot_id"), "lot_id"),
+        "order_id": _optional_uuid(payload.get("order_id"), "order_id"),
+        "order_line_id": _optional_uuid(payload.get("order_line_id"), "order_line_id"),
+        "qty_delta": qty if event_type in INBOUND_EVENTS else -qty,
+        "reason": (payload.get("reason") or "").strip() or None,
+        "op_id": _optional_uuid(payload.get("op_id"), "op_id") or uuid.uuid4(),
+        "ts": ts,
+    }
+
+
+def iter_ndjson(stream: IO[bytes]) -> Iterator[Mapping[str, Any] | ValueError]:
+    """Yield one object per non-blank line; undecodable lines are yielded as ValueError."""
+    for line in io.TextIOWrapper(stream, encoding="utf-8"):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield ValueError(f"invalid JSON: {exc.msg}")
+            continue
+        yield obj if isinstance(obj, dict) else ValueError("each line must be a JSON object")
+
+
+def iter_csv(stream: IO[bytes]) -> Iterator[Mapping[str, Any] | ValueError]:
+    """Yield one dict per CSV record; the header row names the event fields."""
+    yield from csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+
+
+def ingest_stock_events(
+    conn: Connection,
+    rows: Iterable[Mapping[str, Any] | ValueError],
+    max_errors: int = 100,
+) -> dict:
+    """
+    Bulk-load stock events for the tenant in app.tenant_id (caller owns the transaction).
+
+    1) Validate each row in Python and stream the valid ones into a session temp table via COPY
+       (constant memory; the body is never materialized).
+    2) Reject rows whose product/warehouse/location/lot/order references are not visible to the
+       tenant, in one set-based statement, and rows dated inside an already closed ledger month.
+    3) Merge into core.stock_ledger in a single INSERT ... SELECT, skipping op_ids already in the
+       ledger or repeated within the batch. The dw.current_stock trigger fires once for the batch.
+    """
+    received = 0
+    rejected = 0
+    errors: List[dict] = []
+
+    def reject(row_no: int, message: str) -> None:
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < max_errors:
+            errors.append({"row": row_no, "error": message})
+
+    conn.execute(SQL["create_stage"])  # ON COMMIT DELETE ROWS: starts empty every transaction
+
+    raw = conn.connection.driver_connection
+    with raw.cursor() as cur:
+        with cur.copy(f"COPY pg_temp.stock_event_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN") as copy:
+            for received, row in enumerate(rows, start=1):
+                if isinstance(row, ValueError):
+                    reject(received, str(row))
+                    continue
+                try:
+                    event = normalize_stock_event(row)
+                except ValueError as exc:
+                    reject(received, str(exc))
+                    continue
+                copy.write_row((received, *(event[col] for col in STAGE_COLUMNS[1:])))
+
+    for ref in conn.execute(SQL["reject_unknown_refs"]).mappings():
+        reject(int(ref["row_no"]), "unknown or inaccessible reference")
+    for late in conn.execute(SQL["reject_closed_period"]).mappings():
+        reject(int(late["row_no"]), "ts falls in a closed ledger period")
+
+    staged = received - rejected
+    accepted = int(conn.execute(SQL["merge_stage_into_ledger"]).scalar_one())
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "received": received,
+        "accepted": accepted,
+        "duplicates": staged - accepted,
+        "rejected": rejected,
+        "errors": errors,
+    }
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+LEDGER_WRITER_MAX_BATCH = int(os.getenv("LEDGER_WRITER_MAX_BATCH", "256"))
+LEDGER_WRITER_MAX_DELAY_MS = float(os.getenv("LEDGER_WRITER_MAX_DELAY_MS", "5"))
+LEDGER_WRITER_TIMEOUT = float(os.getenv("LEDGER_WRITER_TIMEOUT", "30"))  # seconds a request waits for its flush
+
+SQL = sql_registry.statements("ledger_writer")
+
+
+class DuplicateOpId(ValueError):
+    """The event's op_id is already in the ledger (or earlier in the same batch)."""
+
+
+class ClosedLedgerPeriod(ValueError):
+    """The event is dated inside a month already folded into balance checkpoints."""
+
+
+REJECTIONS = {
+    "duplicate": lambda: DuplicateOpId("duplicate op_id"),
+    "closed_period": lambda: ClosedLedgerPeriod("ts falls in a closed ledger period"),
+}
+
+_Item = Tuple[uuid.UUID, dict, Future]
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class LedgerWriter:
+    """
+    Group commit for single-event API writes.
+
+    Request threads call `write()` with a normalized event (ingest.normalize_stock_event) and
+    block on a Future. A writer thread takes everything queued within `max_delay_ms` (or up to
+    `max_batch` events), inserts each tenant's events with one multi-row statement, commits once
+    for all tenants, then resolves every Future with its ledger row: one WAL flush per batch
+    instead of one per request.
+
+    Duplicate op_ids and closed-period timestamps are rejected per event (DuplicateOpId,
+    ClosedLedgerPeriod). Any other failure rolls the batch back and replays its events one
+    transaction each, so a bad event fails only its own request, with the same error the
+    unbatched path would raise.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_batch: int = LEDGER_WRITER_MAX_BATCH,
+        max_delay_ms: float = LEDGER_WRITER_MAX_DELAY_MS,
+        timeout: float = LEDGER_WRITER_TIMEOUT,
+    ):
+        self.engine = engine
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000
+        self.timeout = timeout
+        self._queue: "queue.Queue[_Item | None]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.events = 0
+        self.fallbacks = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, tenant_id: uuid.UUID, event: dict) -> Future:
+        self.start()
+        future: Future = Future()
+        self._queue.put((tenant_id, event, future))
+        return future
+
+    def write(self, tenant_id: uuid.UUID, event: dict) -> dict:
+        """Queue one event and wait until it is committed; returns {"id", "op_id", "qty_delta"}."""
+        return self.submit(tenant_id, event).result(self.timeout)
+
+    # -- writer thread ---------------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch: List[_Item] = [first]
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: List[_Item]) -> None:
+        by_tenant: Dict[uuid.UUID, List[Tuple[int, dict, Future]]] = {}
+        for n, (tenant_id, event, future) in enumerate(batch):
+            by_tenant.setdefault(tenant_id, []).append((n, event, future))
+
+        outcomes: Dict[int, Any] = {}
+        try:
+            with self.engine.begin() as conn:
+                for tenant_id, items in by_tenant.items():
+                    conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": str(tenant_id)})
+                    payload = json.dumps(
+                        [{"n": n, **event} for n, event, _ in items], default=_json_default
+                    )
+                    for row in conn.execute(SQL["insert_events"], {"events": payload}).mappings():
+                        outcomes[row["n"]] = (
+                            REJECTIONS[row["rejected"]]() if row["rejected"] else row["id"]
+                        )
+        except Exception as exc:
+            log.warning("ledger batch of %d failed, replaying events one by one: %s", len(batch), exc)
+            self.fallbacks += 1
+            for tenant_id, event, future in batch:
+                self._write_one(tenant_id, event, future)
+            return
+
+        self.batches += 1
+        self.events += len(batch)
+        for n, (_, event, future) in enumerate(batch):
+            outcome = outcomes.get(n)
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result({"id": str(outcome), "op_id": str(event["op_id"]), "qty_delta": event["qty_delta"]})
+
+    def _write_one(self, tenant_id: uuid.UUID, event: dict, future: Future) -> None:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": str(tenant_id)})
+                inserted = conn.execute(SQL["insert_event"], event).mappings().one_or_none()
+        except IntegrityError as exc:
+            constraint = getattr(getattr(getattr(exc, "orig", None), "diag", None), "constraint_name", None)
+            if constraint == "stock_ledger_period_closed":
+                future.set_exception(REJECTIONS["closed_period"]())
+            elif constraint == "uk_ledger_tenant_op":
+                future.set_exception(REJECTIONS["duplicate"]())
+            else:
+                future.set_exception(exc)
+            return
+        except Exception as exc:
+            future.set_exception(exc)
+            return
+        if inserted is None:
+            future.set_exception(REJECTIONS["duplicate"]())
+            return
+        future.set_result({"id": str(inserted["id"]), "op_id": str(event["op_id"]), "qty_delta": event["qty_delta"]})
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+REFRESH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)  # seconds
+ROW_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)  # rows
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]  # (name, type, help, samples)
+
+
+class _Shard:
+    """One thread's counters and histograms; only that thread writes to it."""
+
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self):
+        self.values: Dict[Tuple[str, Labels], object] = {}
+
+
+class Metrics:
+    """
+    Counters and histograms in the Prometheus text exposition format, without a client library.
+
+    The hot path takes no lock: every thread updates its own shard (a plain dict behind a
+    threading.local), and `render()` adds the shards up at scrape time. Shards of finished threads
+    are folded into a retired total so counters stay monotonic under thread-per-request servers.
+    Values are per process; with several workers, scrape each one (or sum them in the query).
+    Gauges are read at scrape time from collectors registered with `collector()`.
+    """
+
+    def __init__(self, namespace: str = "osl"):
+        self.namespace = namespace
+        self._local = threading.local()
+        self._lock = threading.Lock()  # shard registration and scrape only
+        self._shards: Dict[int, Dict] = {}
+        self._retired: Dict[Tuple[str, Labels], object] = {}
+        self._meta: Dict[str, Tuple[str, str, Tuple[float, ...] | None]] = {}
+        self._collectors: Dict[str, Collector] = {}  # by module-qualified function name
+
+    # -- registration ----------------------------------------------------------------------
+    def counter(self, name: str, help: str) -> str:
+        name = f"{self.namespace}_{name}"
+        self._meta[name] = ("counter", help, None)
+        return name
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> str:
+        name = f"{self.namespace}_{name}"
+        self._meta[name] = ("histogram", help, tuple(sorted(buckets)))
+        return name
+
+    def collector(self, fn: Collector) -> Collector:
+        """
+        Register a scrape-time callback yielding (name, type, help, [(labels, value), ...]).
+        Keyed by the function's module and qualified name: a module imported again (tests reload
+        backend.app) replaces its collector instead of repeating its gauges.
+        """
+        self._collectors[f"{fn.__module__}.{fn.__qualname__}"] = fn
+        return fn
+
+    # -- hot path --------------------------------------------------------------------------
+    def _values(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards[id(shard.values)] = shard.values
+            weakref.finalize(shard, self._retire, shard.values)
+        return shard.values
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        values = self._values()
+        key = (name, tuple(sorted(labels.items())))
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        values = self._values()
+        key = (name, tuple(sorted(labels.items())))
+        state = values.get(key)
+        if state is None:
+            buckets = self._meta[name][2]
+            state = values[key] = [0] * (len(buckets) + 1) + [0.0]  # per-bucket counts, +Inf, sum
+        state[bisect_left(self._meta[name][2], value)] += 1
+        state[-1] += value
+
+    # -- aggregation -----------------------------------------------------------------------
+    @staticmethod
+    def _merge(into: Dict, values: Dict) -> None:
+        for key, value in values.items():
+            if isinstance(value, list):
+                total = into.get(key)
+                if total is None:
+                    into[key] = list(value)
+                else:
+                    for i, v in enumerate(value):
+                        total[i] += v
+            else:
+                into[key] = into.get(key, 0) + value
+
+    def _retire(self, values: Dict) -> None:
+        with self._lock:
+            self._shards.pop(id(values), None)
+            self._merge(self._retired, values)
+
+    def snapshot(self) -> Dict[Tuple[str, Labels], object]:
+        with self._lock:
+            totals: Dict = {}
+            self._merge(totals, self._retired)
+            for values in list(self._shards.values()):
+                self._merge(totals, values.copy())  # dict.copy() is atomic under the GIL
+        return totals
+
+    def value(self, name: str, **labels: str) -> float:
+        """Current total of a counter (histograms: observation count); 0 when never touched."""
+        state = self.snapshot().get((name, tuple(sorted(labels.items()))), 0)
+        return sum(state[:-1]) if isinstance(state, list) else state
+
+    def render(self) -> str:
+        totals = self.snapshot()
+        by_name: Dict[str, List[Tuple[Labels, object]]] = {}
+        for (name, labels), value in sorted(totals.items(), key=lambda item: item[0]):
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines: List[str] = []
+        for name, (kind, help, buckets) in sorted(self._meta.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in by_name.get(name, []):
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _number(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for fn in list(self._collectors.values()):
+            for name, kind, help, samples in fn():
+                name = f"{self.namespace}_{name}"
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+metrics = Metrics()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template, method and status.")
+DB_POOL_WAIT_SECONDS = metrics.histogram(
+    "db_pool_wait_seconds", "Time a request waited for a pooled database connection.")
+ALLOCATION_ATTEMPTS = metrics.counter(
+    "allocation_attempts_total", "Allocation transactions started, including retries, by mode (order, wave).")
+ALLOCATION_RETRIES = metrics.counter(
+    "allocation_retries_total", "Allocation transactions retried, by mode and SQLSTATE (40P01 deadlock, 40001 serialization).")
+ALLOCATION_BACKOFF_SECONDS = metrics.counter(
+    "allocation_backoff_seconds_total", "Time slept in allocation retry backoff.")
+ALLOCATION_HOLD_CONFLICTS = metrics.counter(
+    "allocation_hold_conflicts_total", "Candidates skipped because a concurrent hold overlapped (23P01).")
+ALLOCATION_CANDIDATE_ROWS = metrics.histogram(
+    "allocation_candidate_rows", "Candidate lot and stock slot rows locked per order line.", ROW_BUCKETS)
+MV_REFRESH_SECONDS = metrics.histogram(
+    "mv_refresh_duration_seconds", "Materialized view refreshes and rollup loads, by view and status.",
+    REFRESH_BUCKETS)
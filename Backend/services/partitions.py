@@ -0,0 +1,169 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
+
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+LEDGER_RETENTION_MONTHS = int(os.getenv("LEDGER_RETENTION_MONTHS", "0"))  # 0 keeps every partition
+LEDGER_RETENTION_ACTION = os.getenv("LEDGER_RETENTION_ACTION", "detach").strip().lower()
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))  # seconds; 0 disables
+
+RETENTION_ACTIONS = ("detach", "drop")
+LOCK_BUSY = {"55P03"}  # lock_not_available: the function's lock_timeout fired; retried next run
+
+SQL = sql_registry.statements("partitions")
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class PartitionManager:
+    """
+    Keeps core.stock_ledger partitions ahead of the clock and trims them behind it.
+
+    Each run:
+    1) creates partitions for the current month and `premake_months` ahead, plus every month that
+       has rows sitting in the DEFAULT partition (inserts that hit a missing range);
+    2) retires month partitions older than `retention_months` once they are checkpointed
+       (core.close_stock_ledger_month), by detaching or dropping them.
+    Every step runs in its own short transaction; a step that hits lock_timeout is reported as
+    skipped and retried on the next run. A daemon thread repeats the run every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        premake_months: int = PARTITION_PREMAKE_MONTHS,
+        retention_months: int = LEDGER_RETENTION_MONTHS,
+        retention_action: str = LEDGER_RETENTION_ACTION,
+        interval: float = PARTITION_MAINTENANCE_INTERVAL,
+    ):
+        if retention_action not in RETENTION_ACTIONS:
+            raise ValueError(f"retention_action must be one of {', '.join(RETENTION_ACTIONS)}")
+        self.engine = engine
+        self.premake_months = max(0, premake_months)
+        self.retention_months = max(0, retention_months)
+        self.retention_action = retention_action
+        self.interval = max(0.0, float(interval))
+        self._lock = threading.Lock()  # one run at a time
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_run: Dict[str, Any] | None = None
+        self.next_run_at: float | None = None
+
+    # -- lifecycle -------------------------------------------------------------------------
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="partition-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run_forever(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:  # keep the scheduler alive; status shows the error
+                log.warning("partition maintenance failed: %s", exc)
+            self.next_run_at = time.time() + self.interval
+            self._stopped.wait(self.interval)
+
+    # -- maintenance -----------------------------------------------------------------------
+    def _step(self, report: Dict[str, Any], action: str, target: str, statement: TextClause, params: dict) -> Any:
+        started = time.perf_counter()
+        entry: Dict[str, Any] = {"action": action, "target": target}
+        try:
+            with self.engine.begin() as conn:
+                result = conn.execute(statement, params).scalar()
+            entry["status"] = "ok"
+            return result
+        except Exception as exc:
+            sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
+            entry["status"] = "skipped" if sqlstate in LOCK_BUSY else "error"
+            entry["error"] = str(getattr(exc, "orig", exc)).strip()
+            return None
+        finally:
+            entry["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            report["steps"].append(entry)
+
+    def run_once(self, today: date | None = None) -> Dict[str, Any]:
+        today = today or datetime.now(timezone.utc).date()
+        current = today.replace(day=1)
+        with self._lock:
+            started_wall = time.time()
+            started = time.perf_counter()
+            report: Dict[str, Any] = {"started_at": started_wall, "steps": []}
+
+            with self.engine.connect() as conn:
+                default_months = [r.month for r in conn.execute(SQL["default_months"])]
+            months = sorted(set(default_months) | {_add_months(current, i) for i in range(self.premake_months + 1)})
+            for month in months:
+                moved = self._step(report, "create", month.strftime("%Y-%m"), SQL["create_partition"], {"month": month})
+                if moved is not None:
+                    report["steps"][-1]["rows_moved"] = int(moved)
+
+            if self.retention_months:
+                cutoff = datetime.combine(_add_months(current, -self.retention_months), datetime.min.time(), timezone.utc)
+                for part in self.partitions():
+                    if part["is_default"] or part["range_end"] is None or part["range_end"] > cutoff:
+                        continue
+                    if not part["checkpointed"]:
+                        report["steps"].append(
+                            {"action": self.retention_action, "target": part["partition_name"],
+                             "status": "skipped", "error": "month not closed yet", "duration_ms": 0.0}
+                        )
+                        continue
+                    self._step(
+                        report, self.retention_action, part["partition_name"], SQL["retire_partition"],
+                        {"partition": part["partition_name"], "drop": self.retention_action == "drop"},
+                    )
+
+            report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            report["ok"] = all(s["status"] != "error" for s in report["steps"])
+            self.last_run = report
+            return report
+
+    # -- reporting -------------------------------------------------------------------------
+    def partitions(self) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(SQL["list_partitions"]).mappings()]
+
+    def status(self, today: date | None = None) -> Dict[str, Any]:
+        """Partitions, DEFAULT partition contents, premake horizon gaps, last run report."""
+        today = today or datetime.now(timezone.utc).date()
+        current = today.replace(day=1)
+        parts = self.partitions()
+        with self.engine.connect() as conn:
+            default_rows = [dict(r) for r in conn.execute(SQL["default_months"]).mappings()]
+        covered = {p["range_start"].date().replace(day=1) for p in parts if p["range_start"] is not None}
+        horizon = [_add_months(current, i) for i in range(self.premake_months + 1)]
+        return {
+            "settings": {
+                "premake_months": self.premake_months,
+                "retention_months": self.retention_months,
+                "retention_action": self.retention_action,
+                "interval_s": self.interval,
+            },
+            "partitions": parts,
+            "default_partition_rows": default_rows,
+            "missing_months": [m.isoformat() for m in horizon if m not in covered],
+            "last_run": self.last_run,
+            "next_run_at": self.next_run_at,
+        }
@@ -0,0 +1,66 @@
+from __future__ import annotations
+import base64
+import binascii
+import json
+import uuid
+from typing import Any, Dict, Iterable, Mapping, Tuple
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_CANDIDATE_PAGES = 10  # keyset search ranks the limit * this nearest products, then stops
+
+
+def encode_cursor(rank: float, product_id: Any) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = json.dumps([rank, str(product_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, product_id = json.loads(raw)
+        return float(rank), str(uuid.UUID(str(product_id)))
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def search_request(args: Mapping[str, str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Map /api/products query args to (statement name in product_search.sql, bind params).
+
+    `offset` selects the legacy offset query; otherwise keyset pagination with an optional
+    `cursor` taken from the previous page's `next_cursor`, over the `limit` *
+    SEARCH_CANDIDATE_PAGES products nearest to `q` (keep `limit` fixed while paging). Raises
+    ValueError for bad input.
+    """
+    q = (args.get("q") or "").strip()
+    try:
+        limit = int(args.get("limit", SEARCH_DEFAULT_LIMIT))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("limit must be an integer") from exc
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    params: Dict[str, Any] = {"q": q, "limit": limit}
+
+    if args.get("offset") is not None and not args.get("cursor"):
+        try:
+            params["offset"] = max(0, int(args["offset"]))
+        except (TypeError, ValueError) as exc:
+            raise ValueError("offset must be an integer") from exc
+        params["like"] = f"%{q}%"
+        return "product_search", params
+
+    after_rank, after_id = decode_cursor(args["cursor"]) if args.get("cursor") else (None, None)
+    params.update(candidates=limit * SEARCH_CANDIDATE_PAGES, after_rank=after_rank, after_id=after_id)
+    return "product_search_keyset", params
+
+
+def search_page(statement: str, rows: Iterable[Mapping[str, Any]], limit: int) -> dict:
+    """Response body: items (without rank) plus next_cursor when the page is full."""
+    rows = [dict(row) for row in rows]
+    if statement != "product_search_keyset":
+        return {"items": rows}
+    next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"]) if len(rows) == limit else None
+    for row in rows:
+        row.pop("rank", None)
+    return {"items": rows, "next_cursor": next_cursor}
@@ -1,15 +1,306 @@
 from __future__ import annotations
-from sqlalchemy import text
-from sqlalchemy.engine import Connection
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
 
-def refresh_current_stock_mv(conn: Connection) -> None:
+from sqlalchemy.engine import Connection, Engine
+
+from backend.services.metrics import MV_REFRESH_SECONDS, metrics
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+MV_REFRESH_PARALLELISM = int(os.getenv("MV_REFRESH_PARALLELISM", "3"))  # views refreshed at once, one connection each
+MV_REFRESH_SCHEDULE = float(os.getenv("MV_REFRESH_SCHEDULE", "0"))  # seconds between unconditional refreshes; 0 disables
+MOVEMENT_ROLLUP_LOOKBACK_DAYS = int(os.getenv("MOVEMENT_ROLLUP_LOOKBACK_DAYS", "1"))  # days before the watermark re-aggregated per load
+
+SQL = sql_registry.statements("mv_refresh")
+
+Graph = Dict[str, Tuple[Tuple[str, ...], bool]]  # view -> (matviews / dw tables it reads, has unique index)
+
+# dw tables that views read and that are loaded incrementally rather than refreshed; a run loads
+# them before any view that reads them.
+ROLLUPS = {"dw.fact_daily_movements": "load_daily_movements"}
+
+
+def refresh_materialized_view(conn: Connection, view: str, concurrently: bool = False) -> None:
+    """
+    REFRESH a dw materialized view through dw.refresh_materialized_view(), which runs with
+    owner privileges so the app role can refresh views it does not own.
+    CONCURRENTLY needs a unique index on the view and keeps readers unblocked.
+    """
+    started = time.perf_counter()
+    status = "error"
+    try:
+        conn.execute(SQL["refresh"], {"view": view, "concurrently": concurrently})
+        status = "ok"
+    finally:
+        metrics.observe(MV_REFRESH_SECONDS, time.perf_counter() - started, view=view, status=status)
+
+
+def refresh_current_stock_mv(conn: Connection, concurrently: bool = False) -> None:
     """
     Full MV refresh for dw.current_stock_mv.
 
     Why full refresh?
     - It's deterministic and simple for a small/medium ledger.
-    - Incremental refresh requires additional bookkeeping (e.g., change tables).
-    - We keep a unique index, so a future `REFRESH MATERIALIZED VIEW CONCURRENTLY`
-      is possible if we want to avoid blocking readers.
+    - Operational reads no longer depend on it: dw.current_stock is maintained per ledger
+      insert by trigger, so write paths never call this. The MV only feeds analytics
+      (dw.reorder_candidates_mv) and is refreshed on demand or by MaterializedViewRefresher.
+    - The unique index uk_current_stock_key allows `concurrently=True`.
+    """
+    refresh_materialized_view(conn, "dw.current_stock_mv", concurrently=concurrently)
+
+
+def load_view_graph(conn: Connection) -> Graph:
+    """Every dw materialized view with the matviews and dw tables it reads (dw.materialized_view_graph())."""
+    return {
+        row.view_name: (tuple(sorted(row.depends_on)), bool(row.has_unique_index))
+        for row in conn.execute(SQL["view_graph"])
+    }
+
+
+class MaterializedViewRefresher:
     """
-    conn.execute(text("REFRESH MATERIALIZED VIEW dw.current_stock_mv"))
+    Dependency-aware refresh orchestrator for the dw materialized views.
+
+    The dependency DAG is read from the catalog: a view waits for the matviews its query reads, and
+    for the ROLLUPS tables it reads, which are loaded incrementally as nodes of their own. Views
+    whose dependencies are done are refreshed in parallel, each on its own connection, up to
+    `parallelism` at a time. Views with a plain unique index use REFRESH ... CONCURRENTLY so
+    readers are never blocked; the others take a plain REFRESH. A failed view skips its dependents.
+    Every attempt is recorded in dw.mv_refresh_status (duration, row count, last success).
+
+    Runs are triggered three ways: write paths call `request()`, which only flips a flag and is
+    debounced to one run per `min_interval` seconds; `schedule` seconds after the previous run when
+    set; and synchronously through `refresh_now()` (/admin/refresh_mv). `data_age()` is the age of
+    the snapshot the views currently hold.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        views: Iterable[str] | None = None,
+        min_interval: float = 5.0,
+        parallelism: int = MV_REFRESH_PARALLELISM,
+        schedule: float = MV_REFRESH_SCHEDULE,
+        rollup_lookback_days: int = MOVEMENT_ROLLUP_LOOKBACK_DAYS,
+    ):
+        self.engine = engine
+        self.views = tuple(views) if views is not None else None  # None: every dw materialized view
+        self.min_interval = max(0.0, float(min_interval))
+        self.parallelism = max(1, int(parallelism))
+        self.schedule = max(0.0, float(schedule))
+        self.rollup_lookback_days = max(0, int(rollup_lookback_days))
+        self._cond = threading.Condition()
+        self._run_lock = threading.Lock()  # one orchestrated run at a time
+        self._pending = False
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+        self._last_started = 0.0  # monotonic, for the interval budget
+        self._snapshot_at: float | None = None  # wall clock start of the last fully successful refresh
+        self.last_error: str | None = None
+        self.last_run: Dict[str, Any] | None = None
+
+    # -- lifecycle -------------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the worker (if needed) and refresh once so data_age() becomes known."""
+        self.request()
+
+    def start_schedule(self) -> None:
+        """Start the worker without requesting a run; it refreshes every `schedule` seconds."""
+        if self.schedule:
+            with self._cond:
+                self._ensure_thread()
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def request(self) -> None:
+        """Mark the views stale; cheap enough to call from every write path."""
+        with self._cond:
+            self._ensure_thread()
+            self._pending = True
+            self._cond.notify()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="mv-refresher", daemon=True)
+            self._thread.start()
+
+    def data_age(self) -> float | None:
+        """Seconds since the snapshot held by the views was taken, or None if unknown."""
+        snapshot_at = self._snapshot_at
+        if snapshot_at is None:
+            return None
+        return max(0.0, time.time() - snapshot_at)
+
+    # -- orchestration ---------------------------------------------------------------------
+    def refresh_now(self, views: Iterable[str] | None = None) -> Dict[str, Any]:
+        """
+        Refresh `views` (default: the configured set) in dependency order and return the run
+        report. Matviews outside the requested set are not refreshed, but the ROLLUPS tables the
+        requested views read are loaded first. Raises ValueError for names that are not dw
+        materialized views.
+        """
+        with self._run_lock:
+            started_wall = time.time()
+            started = time.perf_counter()
+            with self.engine.connect() as conn:
+                graph = load_view_graph(conn)
+            managed = list(self.views) if self.views is not None else sorted(graph)
+            targets = list(views) if views is not None else managed
+            unknown = [v for v in targets if v not in graph and v not in ROLLUPS]
+            if unknown:
+                raise ValueError(f"not a dw materialized view: {', '.join(unknown)}")
+            rollups = {dep for view in targets if view in graph for dep in graph[view][0] if dep in ROLLUPS}
+            targets = sorted(rollups - set(targets)) + targets
+            for rollup in ROLLUPS:
+                graph[rollup] = ((), False)
+
+            results = self._run_dag(targets, graph)
+            failed = [r for r in results if r["status"] != "ok"]
+            report = {
+                "started_at": started_wall,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "ok": not failed,
+                "views": results,
+            }
+            self.last_run = report
+            if failed:
+                self.last_error = "; ".join(f"{r['view']}: {r.get('error')}" for r in failed)
+            elif set(managed) <= set(targets):
+                self._snapshot_at = started_wall
+                self.last_error = None
+            return report
+
+    def _run_dag(self, targets: List[str], graph: Graph) -> List[Dict[str, Any]]:
+        wanted = set(targets)
+        pending = {view: set(graph[view][0]) & wanted for view in targets}
+        results: Dict[str, Dict[str, Any]] = {}
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="mv-refresh") as pool:
+            while pending or running:
+                ready = [view for view, deps in pending.items() if deps <= set(results)]
+                for view in ready:
+                    deps = pending.pop(view)
+                    failed = sorted(d for d in deps if results[d]["status"] != "ok")
+                    if failed:
+                        results[view] = {"view": view, "status": "skipped",
+                                         "error": f"dependency not refreshed: {', '.join(failed)}"}
+                        continue
+                    running[pool.submit(self._refresh_one, view, graph[view][1])] = view
+                if not running:
+                    if ready:
+                        continue  # skips may have unblocked more views
+                    for view in pending:  # a cycle; matviews cannot form one, but never spin
+                        results[view] = {"view": view, "status": "skipped", "error": "dependency cycle"}
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return [results[view] for view in targets]
+
+    def _refresh_one(self, view: str, concurrently: bool) -> Dict[str, Any]:
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        entry: Dict[str, Any] = {"view": view, "concurrently": concurrently}
+        try:
+            with self.engine.begin() as conn:
+                if view in ROLLUPS:
+                    conn.execute(SQL[ROLLUPS[view]], {"lookback_days": self.rollup_lookback_days})
+                    metrics.observe(MV_REFRESH_SECONDS, time.perf_counter() - started, view=view, status="ok")
+                else:
+                    refresh_materialized_view(conn, view, concurrently=concurrently)
+                duration_ms = (time.perf_counter() - started) * 1000
+                entry["rows"] = conn.execute(
+                    SQL["record"],
+                    {"view": view, "started_at": started_at, "duration_ms": duration_ms,
+                     "concurrently": concurrently, "error": None},
+                ).scalar()
+            entry["status"] = "ok"
+        except Exception as exc:
+            duration_ms = (time.perf_counter() - started) * 1000
+            entry["status"] = "error"
+            entry["error"] = str(getattr(exc, "orig", exc)).strip()
+            if view in ROLLUPS:  # matview failures are observed by refresh_materialized_view()
+                metrics.observe(MV_REFRESH_SECONDS, duration_ms / 1000, view=view, status="error")
+            log.warning("refresh of %s failed: %s", view, entry["error"])
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        SQL["record"],
+                        {"view": view, "started_at": started_at, "duration_ms": duration_ms,
+                         "concurrently": concurrently, "error": entry["error"]},
+                    )
+            except Exception as record_exc:
+                log.warning("could not record refresh failure of %s: %s", view, record_exc)
+        entry["duration_ms"] = round(duration_ms, 1)
+        return entry
+
+    # -- reporting -------------------------------------------------------------------------
+    def status(self) -> Dict[str, Any]:
+        """Dependency graph, dw.mv_refresh_status rows and the last run report."""
+        with self.engine.connect() as conn:
+            graph = load_view_graph(conn)
+            rows = {row["view_name"]: dict(row) for row in conn.execute(SQL["status"]).mappings()}
+        return {
+            "settings": {
+                "min_interval_s": self.min_interval,
+                "schedule_s": self.schedule,
+                "parallelism": self.parallelism,
+            },
+            "views": [
+                {"view": view, "depends_on": list(deps), "concurrently": unique, **rows.get(view, {})}
+                for view, (deps, unique) in graph.items()
+            ],
+            "data_age_s": self.data_age(),
+            "last_run": self.last_run,
+        }
+
+    # -- worker ----------------------------------------------------------------------------
+    def _schedule_due(self) -> float | None:
+        """Seconds until the next scheduled run (0 when due), or None without a schedule."""
+        if not self.schedule:
+            return None
+        return max(0.0, self._last_started + self.schedule - time.monotonic())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    due = self._schedule_due()
+                    if due == 0:
+                        self._pending = True
+                        break
+                    self._cond.wait(due)
+                if self._stopped:
+                    return
+                # Debounce: hold further requests until the interval budget allows another refresh.
+                wait_s = self._last_started + self.min_interval - time.monotonic()
+                while wait_s > 0 and not self._stopped:
+                    self._cond.wait(wait_s)
+                    wait_s = self._last_started + self.min_interval - time.monotonic()
+                if self._stopped:
+                    return
+                self._pending = False
+                self._last_started = time.monotonic()
+            try:
+                report = self.refresh_now()
+                if not report["ok"]:
+                    with self._cond:
+                        self._pending = True  # retried after the next interval
+            except Exception as exc:  # keep the worker alive; the next request retries
+                self.last_error = str(exc)
+                log.warning("materialized view refresh failed: %s", exc)
+                with self._cond:
+                    self._pending = True
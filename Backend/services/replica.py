@@ -0,0 +1,96 @@
+from __future__ import annotations
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import Connection, Engine
+
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "1"))  # seconds between lag probes
+
+LSN_RE = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+SQL = sql_registry.statements("replica")
+
+
+class ReplicaRouter:
+    """
+    Decides whether a read may go to the streaming replica.
+
+    Reads go to the replica unless the caller forces the primary, the replica's replay lag (probed
+    at most every `check_interval` seconds, shared by all requests) exceeds `max_lag`, the probe
+    fails, or a read-your-writes LSN has not been replayed yet (`replayed()`). Every fallback lands
+    on the primary, so a missing or broken replica only costs capacity, never correctness.
+    """
+
+    def __init__(
+        self,
+        replica: Engine | None,
+        max_lag: float = REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = REPLICA_LAG_CHECK_INTERVAL,
+    ):
+        self.replica = replica
+        self.max_lag = float(max_lag)
+        self.check_interval = max(0.0, float(check_interval))
+        self._lock = threading.Lock()
+        self._checked_at = 0.0  # monotonic
+        self.last_lag: float | None = None
+        self.last_error: str | None = None
+        self.routed = {"replica": 0, "primary": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica is not None
+
+    def lag(self) -> float | None:
+        """Cached replay lag in seconds, or None when the replica cannot be reached."""
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self.last_lag
+            self._checked_at = time.monotonic()
+        try:
+            with self.replica.connect() as conn:
+                lag = float(conn.execute(SQL["replica_lag"]).scalar_one())
+            self.last_error = None
+        except Exception as exc:
+            lag = None
+            self.last_error = str(getattr(exc, "orig", exc)).strip()
+            log.warning("replica lag probe failed: %s", self.last_error)
+        self.last_lag = lag
+        return lag
+
+    def healthy(self) -> bool:
+        if self.replica is None:
+            return False
+        lag = self.lag()
+        return lag is not None and lag <= self.max_lag
+
+    @staticmethod
+    def replayed(conn: Connection, lsn: str) -> bool:
+        """True when the server behind `conn` has applied WAL up to `lsn` (e.g. "0/16B3748")."""
+        if not LSN_RE.match(lsn):
+            return False
+        return bool(conn.execute(SQL["replayed_lsn"], {"lsn": lsn}).scalar_one())
+
+    def record(self, target: str) -> None:
+        self.routed[target] += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_lag_s": self.max_lag,
+            "last_lag_s": self.last_lag,
+            "last_error": self.last_error,
+            "routed": dict(self.routed),
+        }
+
+
+def current_lsn(conn: Connection) -> str:
+    return conn.execute(SQL["current_lsn"]).scalar_one()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+
+log = logging.getLogger(__name__)
+
+QUERY_DIR = Path(__file__).resolve().parents[2] / "db" / "queries"
+
+# Statements executed on every allocation / stock write / read request. psycopg prepares these
+# server-side on first use (per connection) instead of after its default 5 executions.
+DEFAULT_PREPARED = (
+    "allocate.select_order_lines",
+    "allocate.allocation_candidates",
+    "allocate.allocation_candidates_for_lots",
+    "allocate.insert_hold",
+    "allocate.insert_ledger_reserve",
+    "allocate.mark_order_allocated",
+    "current_stock.current_stock",
+    "ledger_writer.insert_event",
+    "product_search.product_search_keyset",
+)
+SQL_PREPARED = tuple(
+    key.strip() for key in os.getenv("SQL_PREPARED", ",".join(DEFAULT_PREPARED)).split(",") if key.strip()
+)
+
+_DDL = re.compile(r"^\s*(CREATE|ALTER|DROP)\b", re.IGNORECASE)
+_LEADING_COMMENTS = re.compile(r"^(\s*(--[^\n]*\n|/\*.*?\*/))+", re.DOTALL)
+
+
+def load_named_sql(path: Path) -> dict[str, str]:
+    """
+    Tiny parser for a single .sql file that contains multiple statements,
+    each prefixed with a line:  `-- name: <key>`
+    Returns a dict {key: sql_text}.
+    """
+    content = path.read_text(encoding="utf-8")
+    blocks: dict[str, str] = {}
+    current = None
+    buf: list[str] = []
+    for line in content.splitlines():
+        if line.startswith("-- name:"):
+            if current is not None:
+                blocks[current] = "\n".join(buf).strip()
+                buf = []
+            current = line.split(":", 1)[1].strip()
+        else:
+            buf.append(line)
+    if current is not None:
+        blocks[current] = "\n".join(buf).strip()
+    return blocks
+
+
+class SqlRegistry:
+    """
+    Every named block in db/queries/*.sql, loaded once and keyed "<file stem>.<name>".
+
+    Each statement is a TextClause built once, so SQLAlchemy's compiled cache and psycopg's
+    prepared-statement cache both see a stable statement. Statements listed in `prepared` carry
+    `prepare=True`, which an instrumented psycopg engine honours per execution. Instrumented
+    engines also record call counts and latency per statement (`stats()`), and `validate()`
+    EXPLAINs every statement so a query that no longer matches the schema fails at deploy time
+    instead of on first use.
+    """
+
+    def __init__(self, query_dir: Path = QUERY_DIR, prepared: Iterable[str] = SQL_PREPARED):
+        self.sources: Dict[str, str] = {}
+        for path in sorted(query_dir.glob("*.sql")):
+            for name, sql in load_named_sql(path).items():
+                self.sources[f"{path.stem}.{name}"] = sql
+        self.prepared = frozenset(prepared)
+        unknown = self.prepared - set(self.sources)
+        if unknown:
+            raise ValueError(f"unknown statements in SQL_PREPARED: {', '.join(sorted(unknown))}")
+        self._clauses: Dict[str, TextClause] = {
+            key: text(sql).execution_options(sql_name=key, prepare=key in self.prepared)
+            for key, sql in self.sources.items()
+        }
+        self._lock = threading.Lock()
+        self._stats: Dict[str, list] = {}  # key -> [calls, errors, total_ms, max_ms]
+        self._engines: set[int] = set()
+        self.validation: Dict[str, Any] | None = None
+
+    def __getitem__(self, key: str) -> TextClause:
+        return self._clauses[key]
+
+    def source(self, key: str) -> str:
+        return self.sources[key]
+
+    def statements(self, file: str) -> Dict[str, TextClause]:
+        """{name: statement} for one query file, e.g. statements("allocate")."""
+        prefix = f"{file}."
+        return {key[len(prefix):]: clause for key, clause in self._clauses.items() if key.startswith(prefix)}
+
+    # -- instrumentation -------------------------------------------------------------------
+    def instrument(self, engine: Engine) -> None:
+        """Record per-statement timings on `engine` and honour `prepare=True` (psycopg only)."""
+        if id(engine) in self._engines:
+            return
+        self._engines.add(id(engine))
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+        if engine.dialect.driver == "psycopg":
+            event.listen(engine, "do_execute", self._do_execute)
+
+    @staticmethod
+    def _do_execute(cursor, statement, parameters, context) -> bool | None:
+        if context is not None and context.execution_options.get("prepare"):
+            cursor.execute(statement, parameters, prepare=True)
+            return True
+        return None
+
+    @staticmethod
+    def _before_execute(conn: Connection, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("sql_registry_started", []).append(time.perf_counter())
+
+    def _after_execute(self, conn: Connection, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info["sql_registry_started"].pop()
+        name = context.execution_options.get("sql_name") if context is not None else None
+        if name is not None:
+            self._record(name, (time.perf_counter() - started) * 1000, error=False)
+
+    def _on_error(self, exception_context) -> None:
+        conn = exception_context.connection
+        timers = conn.info.get("sql_registry_started") if conn is not None else None
+        if not timers:
+            return
+        started = timers.pop()
+        context = exception_context.execution_context
+        name = context.execution_options.get("sql_name") if context is not None else None
+        if name is not None:
+            self._record(name, (time.perf_counter() - started) * 1000, error=True)
+
+    def _record(self, name: str, elapsed_ms: float, error: bool) -> None:
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += int(error)
+            entry[2] += elapsed_ms
+            entry[3] = max(entry[3], elapsed_ms)
+
+    def stats(self) -> list[dict]:
+        """Per-statement counters, slowest total first."""
+        with self._lock:
+            snapshot = {name: list(values) for name, values in self._stats.items()}
+        rows = [
+            {
+                "statement": name,
+                "prepared": name in self.prepared,
+                "calls": calls,
+                "errors": errors,
+                "total_ms": round(total, 3),
+                "mean_ms": round(total / calls, 3) if calls else 0.0,
+                "max_ms": round(peak, 3),
+            }
+            for name, (calls, errors, total, peak) in snapshot.items()
+        ]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # -- validation ------------------------------------------------------------------------
+    def validate(self, conn: Connection) -> Dict[str, str]:
+        """
+        EXPLAIN every statement with NULL parameters inside a rolled-back transaction.
+        DDL blocks (e.g. ingest.create_stage) are executed so later statements can see them.
+        Returns {key: error} for the statements that fail; nothing is written.
+        """
+        errors: Dict[str, str] = {}
+        if conn.in_transaction():
+            conn.rollback()
+        with conn.begin() as tx:
+            for key, sql in self.sources.items():
+                params = {name: None for name in self._clauses[key].compile().params}
+                body = _LEADING_COMMENTS.sub("", sql)
+                statement = sql if _DDL.match(body) else f"EXPLAIN {sql}"
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text(statement), params)
+                except Exception as exc:
+                    errors[key] = str(getattr(exc, "orig", exc)).strip().splitlines()[0]
+            tx.rollback()
+        self.validation = {"checked_at": time.time(), "statements": len(self.sources), "errors": errors}
+        for key, message in errors.items():
+            log.error("named SQL %s failed validation: %s", key, message)
+        return errors
+
+
+sql_registry = SqlRegistry()
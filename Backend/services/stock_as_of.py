@@ -0,0 +1,106 @@
+from __future__ import annotations
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Tuple
+
+from sqlalchemy.engine import Connection
+
+from backend.services.sql_registry import sql_registry
+
+STOCK_AS_OF_CACHE_SIZE = int(os.getenv("STOCK_AS_OF_CACHE_SIZE", "1024"))  # entries; 0 disables the cache
+
+SQL = sql_registry.statements("stock_as_of")
+
+Key = Tuple[str, datetime, str | None, str | None]  # (tenant_id, ts, product_id, warehouse_id)
+
+
+def as_of_request(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Bind params for stock_as_of: `ts` (ISO-8601, UTC when no offset is given) plus `product_id`
+    and/or `warehouse_id`. Raises ValueError for bad input.
+    """
+    raw_ts = (args.get("ts") or "").strip()
+    if not raw_ts:
+        raise ValueError("ts required")
+    try:
+        ts = datetime.fromisoformat(raw_ts.replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise ValueError("ts must be an ISO-8601 timestamp") from exc
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+
+    params: Dict[str, Any] = {"ts": ts}
+    for name in ("product_id", "warehouse_id"):
+        value = (args.get(name) or "").strip()
+        try:
+            params[name] = str(uuid.UUID(value)) if value else None
+        except ValueError as exc:
+            raise ValueError(f"{name} must be a valid UUID") from exc
+    if params["product_id"] is None and params["warehouse_id"] is None:
+        raise ValueError("product_id or warehouse_id required")
+    return params
+
+
+class StockAsOf:
+    """
+    Point-in-time on-hand: nearest closed-month checkpoint plus the ledger tail up to `ts`.
+
+    Once `ts` is before the checkpoint watermark, no write can change the answer any more
+    (core.reject_closed_period_writes), so those results are kept in a per-process LRU of
+    `max_entries`. The watermark only moves forward, so a cached entry never goes stale; the last
+    watermark seen is kept to serve hits without a round trip.
+    """
+
+    def __init__(self, max_entries: int = STOCK_AS_OF_CACHE_SIZE):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Key, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.watermark: datetime | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, conn: Connection, tenant_id: uuid.UUID, params: Mapping[str, Any]) -> Dict[str, Any]:
+        """Run on a tenant-scoped connection; returns {"items", "closed", "cached"}."""
+        key: Key = (str(tenant_id), params["ts"], params["product_id"], params["warehouse_id"])
+        if self._closed(params["ts"]):
+            with self._lock:
+                items = self._entries.get(key)
+                if items is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return {"items": items, "closed": True, "cached": True}
+
+        # Watermark first: if ts is already before it, no write can land between the two statements.
+        watermark = conn.execute(SQL["watermark"]).scalar_one()
+        items = [dict(row) for row in conn.execute(SQL["stock_as_of"], dict(params)).mappings()]
+        closed = watermark is not None and params["ts"] < watermark
+        with self._lock:
+            self.misses += 1
+            if watermark is not None and (self.watermark is None or watermark > self.watermark):
+                self.watermark = watermark
+            if closed and self.max_entries:
+                self._entries[key] = items
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return {"items": items, "closed": closed, "cached": False}
+
+    def _closed(self, ts: datetime) -> bool:
+        return self.watermark is not None and ts < self.watermark
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "watermark": self.watermark,
+            }
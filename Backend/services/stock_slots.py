@@ -0,0 +1,97 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import Engine
+
+from backend.services.allocation import ALLOCATION_SLOTS
+from backend.services.sql_registry import sql_registry
+
+log = logging.getLogger(__name__)
+
+STOCK_SLOT_MIN_QTY = int(os.getenv("STOCK_SLOT_MIN_QTY", "100"))  # free units before a lot/location is slotted
+STOCK_SLOT_REBALANCE_INTERVAL = float(os.getenv("STOCK_SLOT_REBALANCE_INTERVAL", "5"))  # seconds; 0 disables
+
+SQL = sql_registry.statements("stock_slots")
+
+
+class StockSlotRebalancer:
+    """
+    Keeps core.stock_slots in shape for slotted allocation (ALLOCATION_SLOTS > 0).
+
+    Each run calls core.rebalance_stock_slots once, in its own transaction:
+    0) pending deltas of slotted reservations and releases are folded into dw.current_stock,
+       bucket by bucket, skipping buckets in use;
+    1) lot/locations with at least `min_qty` free get `slots` buckets;
+    2) slotted lot/locations whose budgets drifted (receipts, shipments, uneven takes, a changed
+       bucket count) are re-spread evenly, unless one of their buckets is locked by an
+       allocation in flight, in which case they wait for the next run.
+    Runs are serialized across processes by an advisory lock inside the function, so every app
+    and worker process may run one. A daemon thread repeats the run every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        slots: int = ALLOCATION_SLOTS,
+        min_qty: int = STOCK_SLOT_MIN_QTY,
+        interval: float = STOCK_SLOT_REBALANCE_INTERVAL,
+    ):
+        self.engine = engine
+        self.slots = max(0, int(slots))
+        self.min_qty = max(1, int(min_qty))
+        self.interval = max(0.0, float(interval))
+        self._lock = threading.Lock()  # one run at a time
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_run: Dict[str, Any] | None = None
+
+    # -- lifecycle -------------------------------------------------------------------------
+    def start(self) -> None:
+        if self.slots <= 0 or self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="stock-slot-rebalancer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run_forever(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:  # keep the scheduler alive; status shows the error
+                log.warning("stock slot rebalance failed: %s", exc)
+            self._stopped.wait(self.interval)
+
+    # -- rebalance -------------------------------------------------------------------------
+    def run_once(self) -> Dict[str, Any]:
+        if self.slots <= 0:
+            raise ValueError("stock slots are disabled (ALLOCATION_SLOTS=0)")
+        with self._lock:
+            started = time.perf_counter()
+            report: Dict[str, Any] = {"started_at": time.time(), "slots": self.slots, "min_qty": self.min_qty}
+            try:
+                with self.engine.begin() as conn:
+                    row = conn.execute(SQL["rebalance"], {"slots": self.slots, "min_qty": self.min_qty}).one()
+                report.update(created_keys=int(row.created_keys), rebalanced_keys=int(row.rebalanced_keys), ok=True)
+            except Exception as exc:
+                report.update(ok=False, error=str(getattr(exc, "orig", exc)).strip())
+                raise
+            finally:
+                report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                self.last_run = report
+            return report
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "settings": {"slots": self.slots, "min_qty": self.min_qty, "interval_s": self.interval},
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_run": self.last_run,
+        }
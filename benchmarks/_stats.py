@@ -0,0 +1,68 @@
+"""
+Timing helpers shared by the benchmarks: the seed's id scheme, timed loops and the results that
+conftest.py writes to BENCH_OUTPUT at the end of the session.
+"""
+from __future__ import annotations
+import hashlib
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+RESULTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def bench_id(seed: int, kind: str, *parts: int) -> str:
+    """The uuid the seed SQL gives row `parts` of `kind` (md5 of 'seed:kind:a:b...')."""
+    digest = hashlib.md5(":".join([str(seed), kind, *map(str, parts)]).encode()).hexdigest()
+    return str(uuid.UUID(digest))
+
+
+def measure(name: str, call: Callable[[int], Any], iterations: int, concurrency: int = 1, **extra: Any) -> Dict[str, Any]:
+    """
+    Time `call(i)` for i in range(iterations) from `concurrency` threads; record and return the
+    throughput and latency percentiles under `name`.
+    """
+    latencies: List[float] = []
+
+    def timed(i: int) -> None:
+        started = time.perf_counter()
+        call(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(iterations):
+            timed(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+    return record(name, latencies, elapsed, concurrency=concurrency, **extra)
+
+
+def record(name: str, latencies_ms: Sequence[float], elapsed_s: float, **extra: Any) -> Dict[str, Any]:
+    values = sorted(latencies_ms)
+    result = {
+        "count": len(values),
+        "elapsed_s": round(elapsed_s, 4),
+        "throughput_per_s": round(len(values) / elapsed_s, 1) if elapsed_s else None,
+        "latency_ms": {
+            "mean": round(statistics.fmean(values), 3) if values else 0.0,
+            "p50": round(_percentile(values, 50), 3),
+            "p95": round(_percentile(values, 95), 3),
+            "p99": round(_percentile(values, 99), 3),
+            "max": round(values[-1], 3) if values else 0.0,
+        },
+        **extra,
+    }
+    RESULTS[name] = result
+    return result
@@ -0,0 +1,94 @@
+"""
+Closed-loop load generator for the read endpoints.
+
+Run the same workload against both servers and compare:
+
+    gunicorn -w 4 --threads 8 -b :8000 backend.app:app        # WSGI (threads)
+    uvicorn backend.asgi:app --workers 4 --port 8001          # ASGI read path
+
+    python benchmarks/bench_read_path.py --base-url http://localhost:8000 --tenant $T --product $P
+    python benchmarks/bench_read_path.py --base-url http://localhost:8001 --tenant $T --product $P
+
+Each of `--concurrency` clients issues requests back to back until `--requests` have completed;
+the script prints throughput, latency percentiles and the error count as JSON.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from _stats import _percentile
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    paths = []
+    if args.product:
+        paths.append(("/api/current_stock", {"product_id": args.product}))
+    if args.query:
+        paths.append(("/api/products", {"q": args.query, "limit": "20"}))
+    if not paths:
+        raise SystemExit("pass --product and/or --query")
+
+    latencies: list[float] = []
+    errors = 0
+    remaining = args.requests
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"X-Tenant-Id": args.tenant}
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, headers=headers, timeout=args.timeout) as client:
+        async def worker(n: int) -> None:
+            nonlocal remaining, errors
+            i = n
+            while remaining > 0:
+                remaining -= 1
+                path, params = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path, params=params)
+                    ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += 0 if ok else 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--tenant", required=True, help="X-Tenant-Id for every request")
+    parser.add_argument("--product", help="product_id for GET /api/current_stock")
+    parser.add_argument("--query", help="q for GET /api/products")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    print(json.dumps(asyncio.run(_run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Hot-path benchmarks on the same throwaway Postgres as tests/ (testcontainers, migrated to head).
+
+    python -m pytest benchmarks -q
+    BENCH_PRODUCTS=2000 BENCH_MONTHS=12 BENCH_OUTPUT=/tmp/after.json \
+        BENCH_BASELINE=/tmp/before.json python -m pytest benchmarks -q
+
+Scale and workload come from BENCH_* environment variables (see `Scale`). Seeding is
+deterministic for a given BENCH_SEED: ids are derived from the seed and every quantity, day and
+event mix comes from a hash of (seed, row), never from random(). Results are written as JSON to
+BENCH_OUTPUT (default benchmarks/results/<commit>.json); with BENCH_BASELINE pointing at an
+earlier file, the terminal summary shows each benchmark's p50 and throughput relative to it.
+"""
+from __future__ import annotations
+import json
+import os
+import platform
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from _stats import RESULTS
+from tests.__init__ import pg_url, engine_app, tenant_ids  # re-export fixtures for pytest discovery
+from tests.conftest import api_client
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+@dataclass(frozen=True)
+class Scale:
+    seed: int = int(os.getenv("BENCH_SEED", "42"))
+    tenants: int = int(os.getenv("BENCH_TENANTS", "2"))
+    products: int = int(os.getenv("BENCH_PRODUCTS", "200"))  # per tenant
+    lots: int = int(os.getenv("BENCH_LOTS", "4"))  # per product
+    months: int = int(os.getenv("BENCH_MONTHS", "3"))  # of ledger history, ending this month
+    events: int = int(os.getenv("BENCH_EVENTS", "6"))  # ledger rows per lot and month
+    iterations: int = int(os.getenv("BENCH_ITERATIONS", "200"))  # timed calls per benchmark
+    concurrency: int = int(os.getenv("BENCH_CONCURRENCY", "4"))  # client threads for write paths
+    refresh_rounds: int = int(os.getenv("BENCH_REFRESH_ROUNDS", "3"))
+
+
+@dataclass(frozen=True)
+class Seeded:
+    scale: Scale
+    tenant_ids: List[str]
+    seed_s: float
+    ledger_rows: int
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+# Every id is md5(seed:kind:n) read as a uuid, so two runs with the same seed share ids.
+SEED_SQL = (
+    """
+    INSERT INTO core.tenants (id, name)
+    SELECT md5(CAST(:seed AS text) || ':tenant:' || t)::uuid, 'Bench tenant ' || t
+      FROM generate_series(1, CAST(:tenants AS int)) t
+    ON CONFLICT (id) DO NOTHING
+    """,
+    """
+    INSERT INTO core.products (id, tenant_id, sku, name, price_cents)
+    SELECT md5(CAST(:seed AS text) || ':product:' || t || ':' || p)::uuid, md5(CAST(:seed AS text) || ':tenant:' || t)::uuid,
+           'BENCH-' || t || '-' || p,
+           (ARRAY['Steel', 'Oak', 'Cotton', 'Copper', 'Granite'])[1 + p % 5] || ' '
+             || (ARRAY['bracket', 'panel', 'spool', 'fitting', 'crate', 'hinge'])[1 + p % 6] || ' ' || p,
+           100 + abs(hashtext(CAST(:seed AS text) || ':price:' || t || ':' || p)::bigint) % 10000
+      FROM generate_series(1, CAST(:tenants AS int)) t, generate_series(1, CAST(:products AS int)) p
+    ON CONFLICT (id) DO NOTHING
+    """,
+    """
+    INSERT INTO core.warehouses (id, tenant_id, code, name)
+    SELECT md5(CAST(:seed AS text) || ':warehouse:' || t || ':' || w)::uuid, md5(CAST(:seed AS text) || ':tenant:' || t)::uuid,
+           'BW' || w, 'Bench warehouse ' || w
+      FROM generate_series(1, CAST(:tenants AS int)) t, generate_series(1, 2) w
+    ON CONFLICT (id) DO NOTHING
+    """,
+    """
+    INSERT INTO core.locations (id, tenant_id, warehouse_id, code, name)
+    SELECT md5(CAST(:seed AS text) || ':location:' || t || ':' || w || ':' || l)::uuid, md5(CAST(:seed AS text) || ':tenant:' || t)::uuid,
+           md5(CAST(:seed AS text) || ':warehouse:' || t || ':' || w)::uuid, 'BL' || l, 'Bench location ' || l
+      FROM generate_series(1, CAST(:tenants AS int)) t, generate_series(1, 2) w, generate_series(1, 5) l
+    ON CONFLICT (id) DO NOTHING
+    """,
+    """
+    INSERT INTO core.lots (id, tenant_id, product_id, lot_number, expiry_date)
+    SELECT md5(CAST(:seed AS text) || ':lot:' || t || ':' || p || ':' || l)::uuid, md5(CAST(:seed AS text) || ':tenant:' || t)::uuid,
+           md5(CAST(:seed AS text) || ':product:' || t || ':' || p)::uuid, 'BLOT-' || l, current_date + 30 * l
+      FROM generate_series(1, CAST(:tenants AS int)) t,
+           generate_series(1, CAST(:products AS int)) p,
+           generate_series(1, CAST(:lots AS int)) l
+    ON CONFLICT (id) DO NOTHING
+    """,
+)
+
+# Per lot and month: one receipt, then SHIP/ADJUST_OUT rows spread over the month (the current
+# month stops at now()); each lot lives in one location.
+LEDGER_SQL = """
+    INSERT INTO core.stock_ledger
+      (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, reason, op_id)
+    SELECT md5(CAST(:seed AS text) || ':tenant:' || t)::uuid,
+           LEAST(now(), date_trunc('month', now()) - make_interval(months => CAST(:months AS int) - m)
+                        + make_interval(days => e * 27 / CAST(:events AS int), secs => abs(h) % 86400)),
+           CASE WHEN e = 0 THEN 'RECEIPT' WHEN abs(h) % 10 = 0 THEN 'ADJUST_OUT' ELSE 'SHIP' END,
+           md5(CAST(:seed AS text) || ':warehouse:' || t || ':' || (1 + (p + l) % 2))::uuid,
+           md5(CAST(:seed AS text) || ':location:' || t || ':' || (1 + (p + l) % 2) || ':' || (1 + (p * l) % 5))::uuid,
+           md5(CAST(:seed AS text) || ':product:' || t || ':' || p)::uuid,
+           md5(CAST(:seed AS text) || ':lot:' || t || ':' || p || ':' || l)::uuid,
+           CASE WHEN e = 0 THEN 10 * CAST(:events AS int) ELSE -(1 + abs(h) % 5) END,
+           'bench seed',
+           md5(CAST(:seed AS text) || ':op:' || t || ':' || p || ':' || l || ':' || m || ':' || e)::uuid
+      FROM generate_series(1, CAST(:tenants AS int)) t,
+           generate_series(1, CAST(:products AS int)) p,
+           generate_series(1, CAST(:lots AS int)) l,
+           generate_series(1, CAST(:months AS int)) m,
+           generate_series(0, CAST(:events AS int) - 1) e,
+           LATERAL (SELECT hashtext(CAST(:seed AS text) || ':' || t || ':' || p || ':' || l || ':' || m || ':' || e)::bigint AS h) x
+     WHERE m = CAST(:month AS int)
+"""
+
+
+@pytest.fixture(scope="session")
+def scale() -> Scale:
+    return Scale()
+
+
+@pytest.fixture(autouse=True)
+def _no_background_refresh(monkeypatch):
+    """Keep the app's debounced MV refresher from competing with the timed calls."""
+    monkeypatch.setenv("MV_REFRESH_BACKGROUND", "0")
+
+
+@pytest.fixture(scope="session")
+def seeded(pg_url: str, scale: Scale) -> Seeded:
+    """Seed the scale once per session (as the owner: no RLS, no per-tenant SET)."""
+    owner = create_engine(pg_url, future=True)
+    params = asdict(scale)
+    started = time.perf_counter()
+    with owner.begin() as c:
+        for sql in SEED_SQL:
+            c.execute(text(sql), params)
+    for m in range(1, scale.months + 1):  # one transaction per month keeps the trigger batches bounded
+        with owner.begin() as c:
+            c.execute(
+                text(
+                    "SELECT core.ensure_stock_ledger_partition("
+                    "(date_trunc('month', now()) - make_interval(months => CAST(:back AS int)))::date)"
+                ),
+                {"back": scale.months - m},
+            )
+            c.execute(text(LEDGER_SQL), {**params, "month": m})
+    with owner.begin() as c:
+        for table in ("core.products", "core.lots", "core.stock_ledger", "dw.current_stock", "dw.stock_fifo_layers"):
+            c.execute(text(f"ANALYZE {table}"))
+        rows = c.execute(
+            text("SELECT count(*) FROM core.stock_ledger WHERE reason = 'bench seed'")
+        ).scalar_one()
+        tenants = c.execute(
+            text(
+                "SELECT md5(CAST(:seed AS text) || ':tenant:' || t)::uuid::text"
+                "  FROM generate_series(1, CAST(:tenants AS int)) t"
+            ),
+            params,
+        ).scalars().all()
+    owner.dispose()
+    return Seeded(scale=scale, tenant_ids=tenants, seed_s=round(time.perf_counter() - started, 3), ledger_rows=rows)
+
+
+def _output_path() -> Path:
+    configured = os.getenv("BENCH_OUTPUT")
+    if configured:
+        return Path(configured)
+    return RESULTS_DIR / f"{_git_commit() or 'worktree'}.json"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not RESULTS:
+        return
+    path = _output_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "commit": _git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "scale": asdict(Scale()),
+        "results": dict(sorted(RESULTS.items())),
+    }
+    path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    session.config._bench_output = path
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not RESULTS:
+        return
+    baseline: Dict[str, Any] = {}
+    if os.getenv("BENCH_BASELINE"):
+        baseline = json.loads(Path(os.environ["BENCH_BASELINE"]).read_text(encoding="utf-8"))["results"]
+    terminalreporter.section("benchmarks")
+    for name, result in sorted(RESULTS.items()):
+        line = (
+            f"{name:<40} {result['throughput_per_s'] or 0:>10.1f}/s"
+            f"  p50 {result['latency_ms']['p50']:>9.2f} ms  p99 {result['latency_ms']['p99']:>9.2f} ms"
+        )
+        before = baseline.get(name)
+        if before and before["latency_ms"]["p50"] and before.get("throughput_per_s"):
+            line += (
+                f"  p50 x{result['latency_ms']['p50'] / before['latency_ms']['p50']:.2f}"
+                f"  throughput x{(result['throughput_per_s'] or 0) / before['throughput_per_s']:.2f}"
+            )
+        terminalreporter.write_line(line)
+    path = getattr(config, "_bench_output", None)
+    if path is not None:
+        terminalreporter.write_line(f"results written to {path}")
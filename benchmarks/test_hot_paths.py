@@ -0,0 +1,165 @@
+"""
+Hot paths timed against the seeded scale: ledger writes through the API, allocation and release,
+the two read endpoints and a full MV refresh. Each test records its numbers via `measure`/`record`
+(see conftest.py); the assertions only guard that the timed calls did what they claim.
+"""
+from __future__ import annotations
+import uuid
+
+from sqlalchemy import text
+
+from backend.services.allocation import allocate_order, release_order
+from backend.services.refresh_materialized import MaterializedViewRefresher
+from backend.services.stock_slots import StockSlotRebalancer
+from _stats import bench_id, measure, record
+from tests.test_allocation import create_order, setup_stock
+
+WORDS = ("steel", "bracket", "oak panel", "copper fitting", "granite crate", "spool")
+
+
+def _headers(tenant: str) -> dict:
+    return {"X-Tenant-Id": tenant, "X-Api-Token": "test-token"}
+
+
+def _lot(seeded, i: int):
+    """(product, lot, warehouse, location) ids of the i-th seeded lot of tenant 1, as in LEDGER_SQL."""
+    scale = seeded.scale
+    p = 1 + i % scale.products
+    l = 1 + (i // scale.products) % scale.lots
+    w = 1 + (p + l) % 2
+    return (
+        bench_id(scale.seed, "product", 1, p),
+        bench_id(scale.seed, "lot", 1, p, l),
+        bench_id(scale.seed, "warehouse", 1, w),
+        bench_id(scale.seed, "location", 1, w, 1 + (p * l) % 5),
+    )
+
+
+def test_stock_event_insert(seeded, api_client):
+    client, _ = api_client
+    headers = _headers(seeded.tenant_ids[0])
+
+    def post(i: int) -> None:
+        product, lot, warehouse, location = _lot(seeded, i)
+        resp = client.post(
+            "/api/stock_events",
+            json={"event_type": "RECEIPT", "warehouse_id": warehouse, "location_id": location,
+                  "product_id": product, "lot_id": lot, "qty": 1},
+            headers=headers,
+        )
+        assert resp.status_code == 201, resp.get_json()
+
+    measure("stock_event_insert", post, seeded.scale.iterations,
+            seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+
+
+def test_allocate_and_release(seeded, engine_app):
+    scale = seeded.scale
+    tenant = uuid.UUID(seeded.tenant_ids[0])
+    orders = [uuid.uuid4() for _ in range(scale.iterations)]
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        for i, order_id in enumerate(orders):
+            c.execute(
+                text("INSERT INTO core.orders (id, tenant_id, status) VALUES (:id, current_setting('app.tenant_id')::uuid, 'open')"),
+                {"id": str(order_id)},
+            )
+            c.execute(
+                text("""
+                    INSERT INTO core.order_lines (tenant_id, order_id, product_id, qty)
+                    VALUES (current_setting('app.tenant_id')::uuid, :o, :p, 1)
+                """),
+                {"o": str(order_id), "p": _lot(seeded, i)[0]},
+            )
+
+    allocated = []
+
+    def allocate(i: int) -> None:
+        res = allocate_order(engine_app, tenant_id=tenant, order_id=orders[i], request_hint={})
+        allocated.append(sum(line["allocated"] for line in res["lines"]))
+
+    measure("allocate_order", allocate, scale.iterations, concurrency=scale.concurrency,
+            seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+    assert sum(allocated) == scale.iterations  # one unit per order, every lot has stock
+
+    measure("release_order", lambda i: release_order(engine_app, tenant, orders[i]), scale.iterations,
+            concurrency=scale.concurrency, seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+
+
+def test_hot_sku_allocation(seeded, engine_app):
+    """
+    Every order wants the same single-lot SKU. Lot locking lets one allocator at a time through
+    (the rest skip the lot and come back empty); stock slots let each take its own bucket.
+    `filled` is the share of orders that got their unit. A slotted reservation writes only its
+    bucket, so `scaling` (slotted throughput at `concurrency` threads over one thread) must
+    exceed 1.
+    """
+    scale = seeded.scale
+    tenant = uuid.UUID(seeded.tenant_ids[0])
+    product = uuid.uuid4()
+    with engine_app.begin() as c:
+        setup_stock(c, tenant, product, uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), 4 * scale.iterations)
+    slots = 2 * scale.concurrency
+    StockSlotRebalancer(engine_app, slots=slots, min_qty=scale.iterations, interval=0).run_once()
+
+    results = {}
+    for name, slotted, concurrency in (("lots", False, scale.concurrency), ("slots:serial", True, 1),
+                                       ("slots", True, scale.concurrency)):
+        with engine_app.begin() as c:
+            orders = [create_order(c, tenant, product, 1) for _ in range(scale.iterations)]
+        allocated = []
+
+        def allocate(i: int) -> None:
+            res = allocate_order(engine_app, tenant_id=tenant, order_id=orders[i], request_hint={}, slotted=slotted)
+            allocated.append(res["lines"][0]["allocated"])
+
+        result = measure(f"hot_sku_allocate:{name}", allocate, scale.iterations,
+                         concurrency=concurrency, slots=slots if slotted else 0,
+                         seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+        result["filled"] = round(sum(allocated) / scale.iterations, 3)
+        results[name] = result
+    serial, parallel = results["slots:serial"], results["slots"]
+    assert serial["throughput_per_s"] and parallel["throughput_per_s"]
+    parallel["scaling"] = round(parallel["throughput_per_s"] / serial["throughput_per_s"], 2)
+    assert serial["filled"] == parallel["filled"] == 1.0  # slotted: every order found an unlocked bucket
+    if scale.concurrency > 1:
+        assert parallel["scaling"] > 1, parallel  # reservations on one lot no longer queue on one row
+
+
+def test_current_stock_lookup(seeded, api_client):
+    client, _ = api_client
+    headers = _headers(seeded.tenant_ids[0])
+
+    def lookup(i: int) -> None:
+        resp = client.get("/api/current_stock", query_string={"product_id": _lot(seeded, i)[0]}, headers=headers)
+        assert resp.status_code == 200
+
+    measure("current_stock", lookup, seeded.scale.iterations,
+            seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+
+
+def test_product_search(seeded, api_client):
+    client, _ = api_client
+    headers = _headers(seeded.tenant_ids[0])
+
+    def search(i: int) -> None:
+        resp = client.get("/api/products", query_string={"q": WORDS[i % len(WORDS)], "limit": "20"}, headers=headers)
+        assert resp.status_code == 200
+
+    measure("product_search", search, seeded.scale.iterations,
+            seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
+
+
+def test_mv_refresh(seeded, engine_app):
+    refresher = MaterializedViewRefresher(engine_app, min_interval=0)
+    totals, per_view = [], {}
+    for _ in range(seeded.scale.refresh_rounds):
+        report = refresher.refresh_now()
+        assert report["ok"], report
+        totals.append(report["duration_ms"])
+        for entry in report["views"]:
+            per_view.setdefault(entry["view"], []).append(entry["duration_ms"])
+    for view, durations in per_view.items():
+        record(f"mv_refresh:{view}", durations, sum(durations) / 1000, ledger_rows=seeded.ledger_rows)
+    record("mv_refresh", totals, sum(totals) / 1000,
+           parallelism=refresher.parallelism, seed_s=seeded.seed_s, ledger_rows=seeded.ledger_rows)
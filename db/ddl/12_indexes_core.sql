@@ -1 +1,60 @@
--- Index definitions placeholder for demo.\n
+SET search_path = core, public;
+
+-- Indexes for the hot statements in db/queries/*.sql.
+-- Every statement is tenant-scoped (RLS adds tenant_id = app.tenant_id), so tenant_id leads.
+-- tests/test_query_plans.py EXPLAINs those statements and fails on sequential scans of large tables.
+
+-- Ledger (created on the partitioned parent; every monthly partition inherits them)
+-- On-hand per lot: allocation candidates, core.stock_balance_rows tail. INCLUDE allows index-only scans.
+CREATE INDEX IF NOT EXISTS ix_ledger_tenant_prod_lot
+  ON core.stock_ledger (tenant_id, product_id, lot_id)
+  INCLUDE (warehouse_id, location_id, qty_delta);
+
+-- Movement history / time windows per product
+CREATE INDEX IF NOT EXISTS ix_ledger_tenant_prod_ts
+  ON core.stock_ledger (tenant_id, product_id, ts);
+
+-- Tenant ledger in time order: streaming exports resume on (ts, id) (db/queries/exports.sql)
+CREATE INDEX IF NOT EXISTS ix_ledger_tenant_ts_id
+  ON core.stock_ledger (tenant_id, ts, id);
+
+-- Ledger rows of an order (audits; ON DELETE SET NULL from core.orders)
+CREATE INDEX IF NOT EXISTS ix_ledger_order
+  ON core.stock_ledger (order_id)
+  WHERE order_id IS NOT NULL;
+
+-- Holds
+-- Active holds per lot/location: availability math and the "already held" checks
+CREATE INDEX IF NOT EXISTS ix_holds_active_prod_lot
+  ON core.holds (tenant_id, product_id, lot_id, location_id)
+  INCLUDE (warehouse_id, qty)
+  WHERE released_at IS NULL;
+
+-- Release by order, and FK cascades from orders / order_lines
+CREATE INDEX IF NOT EXISTS ix_holds_order ON core.holds (order_id);
+CREATE INDEX IF NOT EXISTS ix_holds_order_line ON core.holds (order_line_id);
+
+-- Orders
+CREATE INDEX IF NOT EXISTS ix_order_lines_order ON core.order_lines (order_id);
+CREATE INDEX IF NOT EXISTS ix_orders_customer
+  ON core.orders (customer_id)
+  WHERE customer_id IS NOT NULL;
+
+-- Lots: candidate selection locks active lots of a product in (expiry, id) order
+CREATE INDEX IF NOT EXISTS ix_lots_active_fefo
+  ON core.lots (tenant_id, product_id, expiry_date, id)
+  WHERE is_active;
+
+-- Products: JSONB attribute filters and search
+CREATE INDEX IF NOT EXISTS ix_products_attrs_gin
+  ON core.products USING GIN (attributes jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS ix_products_search_tsv
+  ON core.products USING GIN (search_tsv);
+
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm
+  ON core.products USING GIN (name gin_trgm_ops);
+
+-- Substring SKU search (lower(sku) LIKE '%q%') and SKU similarity in product_search_keyset
+CREATE INDEX IF NOT EXISTS ix_products_sku_trgm
+  ON core.products USING GIN (lower(sku) gin_trgm_ops);
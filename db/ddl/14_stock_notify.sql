@@ -0,0 +1,34 @@
+SET search_path = core, public;
+
+-- Change notifications for in-process caches (see backend/services/availability_index.py).
+-- One NOTIFY per distinct (tenant, product) touched by a statement; Postgres delivers them on
+-- commit and folds duplicates raised inside the same transaction.
+CREATE OR REPLACE FUNCTION core.notify_stock_changed()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('osl_stock_changed', json_build_object('t', d.tenant_id, 'p', d.product_id)::text)
+     FROM (SELECT DISTINCT tenant_id, product_id FROM new_rows) d;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_notify ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_notify
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.notify_stock_changed();
+
+-- Transition tables allow a single event per trigger, hence separate INSERT and UPDATE triggers.
+DROP TRIGGER IF EXISTS trg_holds_notify_ins ON core.holds;
+CREATE TRIGGER trg_holds_notify_ins
+  AFTER INSERT ON core.holds
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.notify_stock_changed();
+
+DROP TRIGGER IF EXISTS trg_holds_notify_upd ON core.holds;
+CREATE TRIGGER trg_holds_notify_upd
+  AFTER UPDATE ON core.holds
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.notify_stock_changed();
+
+COMMENT ON FUNCTION core.notify_stock_changed()
+  IS 'NOTIFY osl_stock_changed {"t": tenant_id, "p": product_id} for ledger inserts and hold changes.';
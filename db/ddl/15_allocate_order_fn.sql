@@ -0,0 +1,129 @@
+SET search_path = core, public;
+
+-- Server-side allocation: one call per order instead of a round trip per candidate.
+-- Same rules as backend/services/allocation.py:
+--   * per-order advisory lock (key supplied by the caller so both strategies share it),
+--   * lots locked FOR UPDATE SKIP LOCKED in (expiry, lot) order,
+--   * candidates consumed in (warehouse, lot, location, expiry) order,
+--   * lot/locations that already carry an active hold are skipped (holds_no_overlap).
+-- Each line is filled by a single INSERT ... SELECT over a running sum of availability.
+-- SECURITY INVOKER on purpose: RLS and app.tenant_id apply exactly as for the Python path.
+--
+-- p_options (all optional):
+--   lock_key   bigint  advisory lock key for (tenant, order)
+--   take_limit integer candidates considered per line (default 64)
+--   reason     text    reason written on RESERVE ledger rows
+CREATE OR REPLACE FUNCTION core.allocate_order(p_order_id uuid, p_options jsonb DEFAULT '{}'::jsonb)
+RETURNS TABLE (order_line_id uuid, requested integer, allocated integer)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+  v_tenant     uuid    := current_setting('app.tenant_id')::uuid;
+  v_take_limit integer := COALESCE((p_options->>'take_limit')::integer, 64);
+  v_reason     text    := COALESCE(p_options->>'reason', 'allocation reserve');
+  v_line       record;
+  v_allocated  integer;
+  v_any        boolean := false;
+BEGIN
+  IF p_options ? 'lock_key' THEN
+    PERFORM pg_advisory_xact_lock((p_options->>'lock_key')::bigint);
+  END IF;
+
+  FOR v_line IN
+    SELECT ol.id, ol.product_id, ol.qty
+      FROM core.order_lines ol
+      JOIN core.orders o ON o.id = ol.order_id
+     WHERE ol.order_id = p_order_id
+       AND ol.tenant_id = v_tenant
+       AND o.status IN ('open','allocated')
+     ORDER BY ol.created_at, ol.id
+  LOOP
+    BEGIN
+      WITH candidate_lots AS (
+        SELECT l.id AS lot_id, l.expiry_date
+          FROM core.lots l
+         WHERE l.tenant_id = v_tenant
+           AND l.product_id = v_line.product_id
+           AND l.is_active
+         ORDER BY l.expiry_date NULLS LAST, l.id
+         FOR UPDATE OF l SKIP LOCKED
+      ), candidates AS (
+        SELECT cl.lot_id, s.warehouse_id, s.location_id, s.onhand AS available_qty, cl.expiry_date
+          FROM candidate_lots cl
+          CROSS JOIN LATERAL (
+            SELECT sl.warehouse_id, sl.location_id, SUM(sl.qty) AS onhand
+              FROM core.stock_balance_rows sl
+             WHERE sl.tenant_id = v_tenant
+               AND sl.product_id = v_line.product_id
+               AND sl.lot_id = cl.lot_id
+             GROUP BY sl.warehouse_id, sl.location_id
+          ) s
+         WHERE s.onhand > 0
+           AND s.warehouse_id IS NOT NULL
+           AND s.location_id IS NOT NULL
+           AND NOT EXISTS (
+             SELECT 1 FROM core.holds h
+              WHERE h.tenant_id = v_tenant
+                AND h.product_id = v_line.product_id
+                AND h.lot_id = cl.lot_id
+                AND h.location_id = s.location_id
+                AND h.released_at IS NULL
+           )
+         ORDER BY s.warehouse_id, cl.lot_id, s.location_id, cl.expiry_date NULLS LAST
+         LIMIT v_take_limit
+      ), ranked AS (
+        SELECT c.*,
+               SUM(c.available_qty) OVER (
+                 ORDER BY c.warehouse_id, c.lot_id, c.location_id, c.expiry_date NULLS LAST
+                 ROWS UNBOUNDED PRECEDING
+               ) - c.available_qty AS taken_before
+          FROM candidates c
+      ), picks AS (
+        SELECT r.lot_id, r.warehouse_id, r.location_id,
+               LEAST(r.available_qty, v_line.qty - r.taken_before)::integer AS qty
+          FROM ranked r
+         WHERE r.taken_before < v_line.qty
+      ), ins_holds AS (
+        INSERT INTO core.holds
+          (tenant_id, order_id, order_line_id, product_id, lot_id, warehouse_id, location_id, qty)
+        SELECT v_tenant, p_order_id, v_line.id, v_line.product_id, p.lot_id, p.warehouse_id, p.location_id, p.qty
+          FROM picks p
+        RETURNING lot_id, warehouse_id, location_id, qty
+      ), ins_ledger AS (
+        INSERT INTO core.stock_ledger
+          (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
+           order_id, order_line_id, qty_delta, reason, op_id)
+        SELECT v_tenant, now(), 'RESERVE', h.warehouse_id, h.location_id, v_line.product_id, h.lot_id,
+               p_order_id, v_line.id, -h.qty, v_reason, gen_random_uuid()
+          FROM ins_holds h
+        RETURNING 1
+      )
+      SELECT COALESCE(SUM(h.qty), 0)::integer INTO v_allocated FROM ins_holds h;
+    EXCEPTION WHEN exclusion_violation THEN
+      -- A hold appeared between the NOT EXISTS check and the insert (writer that does not lock
+      -- lots first). Surface it as a serialization failure so the caller's retry loop re-runs.
+      RAISE EXCEPTION 'concurrent hold on a candidate of order line %', v_line.id
+        USING ERRCODE = 'serialization_failure';
+    END;
+
+    v_any := v_any OR v_allocated > 0;
+    order_line_id := v_line.id;
+    requested := v_line.qty;
+    allocated := v_allocated;
+    RETURN NEXT;
+  END LOOP;
+
+  IF v_any THEN
+    UPDATE core.orders
+       SET status = 'allocated'
+     WHERE id = p_order_id
+       AND tenant_id = v_tenant
+       AND status = 'open';
+  END IF;
+END$$;
+
+REVOKE ALL ON FUNCTION core.allocate_order(uuid, jsonb) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.allocate_order(uuid, jsonb) TO osl_app;
+
+COMMENT ON FUNCTION core.allocate_order(uuid, jsonb)
+  IS 'Allocate an order in one call (holds + RESERVE ledger rows); returns per-line requested/allocated.';
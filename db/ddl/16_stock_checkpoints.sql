@@ -0,0 +1,156 @@
+SET search_path = core, public;
+
+-- Balance checkpoints at month boundaries.
+-- Closing a month folds that month's ledger rows into a new checkpoint set (as_of = month end,
+-- exclusive). On-hand is then "latest checkpoint + ledger rows with ts >= watermark", and the
+-- tail scan only touches partitions that are still open (run-time pruning on ts).
+
+CREATE TABLE IF NOT EXISTS core.stock_ledger_closed_periods (
+  period_end      timestamptz PRIMARY KEY,
+  period_start    timestamptz NOT NULL,
+  closed_at       timestamptz NOT NULL DEFAULT now(),
+  checkpoint_rows bigint NOT NULL,
+  CONSTRAINT closed_periods_range_ck CHECK (period_end > period_start)
+);
+COMMENT ON TABLE core.stock_ledger_closed_periods
+  IS 'Ledger months folded into stock_balance_checkpoints; max(period_end) is the checkpoint watermark.';
+
+CREATE TABLE IF NOT EXISTS core.stock_balance_checkpoints (
+  as_of        timestamptz NOT NULL,
+  tenant_id    uuid NOT NULL REFERENCES core.tenants(id) ON DELETE RESTRICT,
+  product_id   uuid NOT NULL,
+  warehouse_id uuid,
+  location_id  uuid,
+  lot_id       uuid,
+  qty          bigint NOT NULL,
+  shipped_qty  bigint NOT NULL DEFAULT 0,
+  first_in_at  timestamptz
+);
+COMMENT ON TABLE core.stock_balance_checkpoints
+  IS 'Cumulative per lot/location balances of all ledger rows with ts < as_of (qty, shipped units, first inbound).';
+
+CREATE UNIQUE INDEX IF NOT EXISTS uk_stock_balance_checkpoints
+  ON core.stock_balance_checkpoints (as_of, tenant_id, product_id, lot_id, warehouse_id, location_id)
+  NULLS NOT DISTINCT;
+
+ALTER TABLE core.stock_balance_checkpoints ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS stock_balance_checkpoints_rls ON core.stock_balance_checkpoints;
+CREATE POLICY stock_balance_checkpoints_rls ON core.stock_balance_checkpoints
+  USING (tenant_id = current_setting('app.tenant_id', true)::uuid);
+
+-- Written only by close_stock_ledger_month() (definer); the app reads.
+REVOKE ALL ON core.stock_balance_checkpoints, core.stock_ledger_closed_periods FROM osl_app;
+GRANT SELECT ON core.stock_balance_checkpoints, core.stock_ledger_closed_periods TO osl_app;
+
+CREATE OR REPLACE FUNCTION core.stock_checkpoint_watermark()
+RETURNS timestamptz LANGUAGE sql STABLE AS $$
+  SELECT COALESCE(max(period_end), '-infinity'::timestamptz) FROM core.stock_ledger_closed_periods
+$$;
+COMMENT ON FUNCTION core.stock_checkpoint_watermark()
+  IS 'End of the last closed ledger month (-infinity when none); ledger rows before it are checkpointed.';
+
+-- Checkpoint rows + open tail, unaggregated: callers SUM/GROUP BY exactly as they did on the ledger.
+-- The watermark is an uncorrelated sub-select so it is evaluated once per query (initplan) and
+-- the ts >= $watermark filter prunes closed partitions at run time.
+CREATE OR REPLACE VIEW core.stock_balance_rows WITH (security_invoker = true) AS
+SELECT cp.tenant_id, cp.product_id, cp.warehouse_id, cp.location_id, cp.lot_id,
+       cp.qty, cp.shipped_qty, cp.first_in_at
+  FROM core.stock_balance_checkpoints cp
+ WHERE cp.as_of = (SELECT core.stock_checkpoint_watermark())
+UNION ALL
+SELECT sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id,
+       sl.qty_delta::bigint,
+       CASE WHEN sl.event_type = 'SHIP' THEN -sl.qty_delta ELSE 0 END::bigint,
+       CASE WHEN sl.event_type IN ('RECEIPT','ADJUST_IN') THEN sl.ts END
+  FROM core.stock_ledger sl
+ WHERE sl.ts >= (SELECT core.stock_checkpoint_watermark());
+
+GRANT SELECT ON core.stock_balance_rows TO osl_app;
+COMMENT ON VIEW core.stock_balance_rows
+  IS 'Latest checkpoint rows plus ledger rows after the watermark; SUM(qty) per key is on-hand.';
+
+-- Close every ledger month up to and including p_month.
+-- Partitions that can hold rows before the new boundary are locked in SHARE mode so in-flight
+-- writers finish first; afterwards trg_stock_ledger_closed_period rejects rows dated before it.
+CREATE OR REPLACE FUNCTION core.close_stock_ledger_month(p_month date)
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_end  timestamptz := (date_trunc('month', p_month) + INTERVAL '1 month')::timestamptz;
+  v_prev timestamptz;
+  v_part record;
+  n      bigint;
+BEGIN
+  LOCK TABLE core.stock_ledger_closed_periods IN EXCLUSIVE MODE;  -- one close at a time
+  v_prev := core.stock_checkpoint_watermark();
+  IF v_end <= v_prev THEN
+    RAISE NOTICE 'stock ledger already closed through %', v_prev;
+    RETURN 0;
+  END IF;
+  IF v_end > now() THEN
+    RAISE EXCEPTION 'cannot close %: month has not ended', to_char(p_month, 'YYYY-MM')
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+
+  FOR v_part IN
+    SELECT c.oid::regclass AS rel
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+     WHERE i.inhparent = 'core.stock_ledger'::regclass
+       AND (pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'
+            OR COALESCE(substring(pg_get_expr(c.relpartbound, c.oid) FROM $r$FROM \('([^']+)'\)$r$)::timestamptz,
+                        '-infinity') < v_end)
+     ORDER BY c.oid
+  LOOP
+    EXECUTE format('LOCK TABLE %s IN SHARE MODE', v_part.rel);
+  END LOOP;
+
+  INSERT INTO core.stock_balance_checkpoints
+    (as_of, tenant_id, product_id, warehouse_id, location_id, lot_id, qty, shipped_qty, first_in_at)
+  SELECT v_end, b.tenant_id, b.product_id, b.warehouse_id, b.location_id, b.lot_id,
+         SUM(b.qty), SUM(b.shipped_qty), MIN(b.first_in_at)
+    FROM (
+      SELECT cp.tenant_id, cp.product_id, cp.warehouse_id, cp.location_id, cp.lot_id,
+             cp.qty, cp.shipped_qty, cp.first_in_at
+        FROM core.stock_balance_checkpoints cp
+       WHERE cp.as_of = v_prev
+      UNION ALL
+      SELECT sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id,
+             sl.qty_delta,
+             CASE WHEN sl.event_type = 'SHIP' THEN -sl.qty_delta ELSE 0 END,
+             CASE WHEN sl.event_type IN ('RECEIPT','ADJUST_IN') THEN sl.ts END
+        FROM core.stock_ledger sl
+       WHERE sl.ts >= v_prev AND sl.ts < v_end
+    ) b
+   GROUP BY b.tenant_id, b.product_id, b.warehouse_id, b.location_id, b.lot_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+
+  INSERT INTO core.stock_ledger_closed_periods (period_start, period_end, checkpoint_rows)
+  VALUES (v_prev, v_end, n);
+  RETURN n;
+END$$;
+
+REVOKE ALL ON FUNCTION core.close_stock_ledger_month(date) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.close_stock_ledger_month(date) TO osl_app;  -- /admin/close_ledger_month
+
+COMMENT ON FUNCTION core.close_stock_ledger_month(date)
+  IS 'Folds ledger rows up to the end of p_month into a new checkpoint set and advances the watermark.';
+
+-- Closed months are immutable: a late or back-dated event would silently diverge from the checkpoint.
+CREATE OR REPLACE FUNCTION core.reject_closed_period_writes()
+RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+  v_watermark timestamptz := core.stock_checkpoint_watermark();
+BEGIN
+  IF v_watermark > '-infinity' AND EXISTS (SELECT 1 FROM new_rows WHERE ts < v_watermark) THEN
+    RAISE EXCEPTION 'stock ledger is closed before %', v_watermark
+      USING ERRCODE = 'check_violation', CONSTRAINT = 'stock_ledger_period_closed';
+  END IF;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_closed_period ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_closed_period
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.reject_closed_period_writes();
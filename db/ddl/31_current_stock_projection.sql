@@ -0,0 +1,73 @@
+SET search_path = dw, public;
+
+-- Delta-maintained current stock projection.
+-- Rationale: every ledger insert adds its qty_delta to exactly one row per key, so write cost
+-- is O(1) per event and readers never wait behind a REFRESH of dw.current_stock_mv.
+CREATE TABLE IF NOT EXISTS dw.current_stock (
+  tenant_id    uuid        NOT NULL,
+  product_id   uuid        NOT NULL,
+  warehouse_id uuid,
+  location_id  uuid,
+  lot_id       uuid,
+  qty          bigint      NOT NULL DEFAULT 0,
+  updated_at   timestamptz NOT NULL DEFAULT now()
+);
+
+-- Nullable key columns (ledger rows may omit location/lot) must still collapse to one row.
+CREATE UNIQUE INDEX IF NOT EXISTS uk_current_stock_proj_key
+  ON dw.current_stock (tenant_id, product_id, warehouse_id, location_id, lot_id) NULLS NOT DISTINCT;
+
+COMMENT ON TABLE dw.current_stock
+  IS 'Current stock per (tenant, product, warehouse, location, lot), maintained from stock_ledger inserts.';
+
+-- Statement-level trigger: one aggregated upsert per statement, so bulk inserts touch each key once.
+-- Keys are upserted in a fixed order to keep concurrent writers from deadlocking on each other.
+CREATE OR REPLACE FUNCTION dw.apply_ledger_to_current_stock()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  INSERT INTO dw.current_stock AS cs
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+  SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty_delta), now()
+    FROM new_rows
+   GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+   ORDER BY tenant_id, product_id, warehouse_id, location_id, lot_id
+  ON CONFLICT (tenant_id, product_id, warehouse_id, location_id, lot_id)
+  DO UPDATE SET qty = cs.qty + EXCLUDED.qty,
+                updated_at = EXCLUDED.updated_at;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_current_stock ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_current_stock
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION dw.apply_ledger_to_current_stock();
+
+-- Full rebuild from the ledger (backfill, repair after bulk loads with triggers disabled).
+-- The EXCLUSIVE lock makes concurrent ledger writers queue their upserts until the rebuild commits,
+-- so their deltas land on top of the rebuilt totals instead of being lost.
+CREATE OR REPLACE FUNCTION dw.rebuild_current_stock()
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE dw.current_stock IN EXCLUSIVE MODE;
+  DELETE FROM dw.current_stock;
+  INSERT INTO dw.current_stock (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+  SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty_delta)::bigint, now()
+    FROM core.stock_ledger
+   GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$;
+
+REVOKE ALL ON FUNCTION dw.rebuild_current_stock() FROM PUBLIC;
+
+COMMENT ON FUNCTION dw.rebuild_current_stock()
+  IS 'Recomputes dw.current_stock from the full ledger. Normal writes maintain it via trigger.';
+
+GRANT SELECT ON dw.current_stock TO osl_app;
+
+SELECT dw.rebuild_current_stock();
@@ -0,0 +1,28 @@
+SET search_path = dw, public;
+
+-- REFRESH requires ownership of the view; the API role (osl_app) only has SELECT on dw.
+-- This definer wrapper lets the app refresh dw materialized views without owning them.
+CREATE OR REPLACE FUNCTION dw.refresh_materialized_view(p_view text, p_concurrently boolean DEFAULT false)
+RETURNS void LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_oid regclass := to_regclass(p_view);
+BEGIN
+  IF v_oid IS NULL OR NOT EXISTS (
+    SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+     WHERE c.oid = v_oid AND c.relkind = 'm' AND n.nspname = 'dw'
+  ) THEN
+    RAISE EXCEPTION 'not a dw materialized view: %', p_view USING ERRCODE = '42809';
+  END IF;
+  IF p_concurrently THEN
+    EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %s', v_oid);
+  ELSE
+    EXECUTE format('REFRESH MATERIALIZED VIEW %s', v_oid);
+  END IF;
+END$$;
+
+REVOKE ALL ON FUNCTION dw.refresh_materialized_view(text, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dw.refresh_materialized_view(text, boolean) TO osl_app;
+
+COMMENT ON FUNCTION dw.refresh_materialized_view(text, boolean)
+  IS 'Owner-privileged REFRESH [CONCURRENTLY] of a dw materialized view, callable by osl_app.';
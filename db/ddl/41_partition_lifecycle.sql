@@ -0,0 +1,217 @@
+SET search_path = core, public;
+
+-- Partition lifecycle for core.stock_ledger (driven by backend/services/partitions.py).
+--  * A DEFAULT partition catches rows whose month has no partition yet, so inserts never fail;
+--    creating the month later moves those rows into it.
+--  * Tenants listed in stock_ledger_partition_policy get their own sub-partitions per month,
+--    sliced by day or week; everyone else shares the month's "_rest" partition.
+--  * Closed (checkpointed) months can be detached or dropped.
+-- DDL here takes short ACCESS EXCLUSIVE locks on the parent; every function sets lock_timeout so
+-- a busy ledger makes the step fail fast (and the manager retry later) instead of queueing writers.
+
+-- Sub-partitioning by tenant_id requires it in every unique constraint.
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1
+      FROM pg_constraint c
+      JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+     WHERE c.conrelid = 'core.stock_ledger'::regclass
+       AND c.conname = 'pk_stock_ledger'
+       AND a.attname = 'tenant_id'
+  ) THEN
+    ALTER TABLE core.stock_ledger
+      DROP CONSTRAINT pk_stock_ledger,
+      ADD CONSTRAINT pk_stock_ledger PRIMARY KEY (id, ts, tenant_id);
+  END IF;
+END$$;
+
+CREATE TABLE IF NOT EXISTS core.stock_ledger_default PARTITION OF core.stock_ledger DEFAULT;
+CREATE INDEX IF NOT EXISTS stock_ledger_default_brin_ts
+  ON core.stock_ledger_default USING BRIN (ts) WITH (pages_per_range=128);
+
+CREATE TABLE IF NOT EXISTS core.stock_ledger_partition_policy (
+  tenant_id   uuid PRIMARY KEY REFERENCES core.tenants(id) ON DELETE CASCADE,
+  granularity text NOT NULL CHECK (granularity IN ('day','week')),
+  created_at  timestamptz NOT NULL DEFAULT now()
+);
+COMMENT ON TABLE core.stock_ledger_partition_policy
+  IS 'High-volume tenants: months created after a row is added here get per-tenant day/week partitions.';
+
+REVOKE ALL ON core.stock_ledger_partition_policy FROM osl_app;
+GRANT SELECT ON core.stock_ledger_partition_policy TO osl_app;
+
+-- Create the partition for one month; returns the number of rows moved out of the default
+-- partition, or NULL when the partition already existed.
+CREATE OR REPLACE FUNCTION core.create_stock_ledger_partition(p_month_start date)
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+SET lock_timeout = '2s' AS $$
+DECLARE
+  part_start  timestamptz := date_trunc('month', p_month_start)::timestamptz;
+  part_end    timestamptz := (date_trunc('month', p_month_start) + INTERVAL '1 month')::timestamptz;
+  part_name   text := format('stock_ledger_%s', to_char(part_start, 'YYYY_MM'));
+  full_name   text := format('core.%I', part_name);
+  sub_name    text;
+  leaf_name   text;
+  slice_start timestamptz;
+  slice_end   timestamptz;
+  v_policy    record;
+  v_moved     bigint;
+BEGIN
+  IF to_regclass(full_name) IS NOT NULL THEN
+    RETURN NULL;
+  END IF;
+
+  -- Rows already routed to DEFAULT for this month would make CREATE ... PARTITION OF fail its
+  -- validation scan, so park them first and re-insert once the partition exists. Inserting into
+  -- the partition directly skips the parent's statement triggers: these rows were applied to
+  -- dw.current_stock (and notified) when they first arrived.
+  LOCK TABLE core.stock_ledger_default IN ACCESS EXCLUSIVE MODE;
+  CREATE TEMP TABLE stock_ledger_moving (LIKE core.stock_ledger) ON COMMIT DROP;
+  WITH moved AS (
+    DELETE FROM core.stock_ledger_default
+     WHERE ts >= part_start AND ts < part_end
+    RETURNING *
+  )
+  INSERT INTO pg_temp.stock_ledger_moving SELECT * FROM moved;
+  GET DIAGNOSTICS v_moved = ROW_COUNT;
+
+  IF EXISTS (SELECT 1 FROM core.stock_ledger_partition_policy) THEN
+    EXECUTE format(
+      'CREATE TABLE %s PARTITION OF core.stock_ledger FOR VALUES FROM (%L) TO (%L) PARTITION BY LIST (tenant_id)',
+      full_name, part_start, part_end
+    );
+    FOR v_policy IN
+      SELECT tenant_id, granularity FROM core.stock_ledger_partition_policy ORDER BY tenant_id
+    LOOP
+      sub_name := format('%s_t%s', part_name, left(replace(v_policy.tenant_id::text, '-', ''), 12));
+      EXECUTE format(
+        'CREATE TABLE core.%I PARTITION OF %s FOR VALUES IN (%L) PARTITION BY RANGE (ts)',
+        sub_name, full_name, v_policy.tenant_id
+      );
+      slice_start := part_start;
+      WHILE slice_start < part_end LOOP
+        slice_end := LEAST(
+          slice_start + CASE v_policy.granularity WHEN 'day' THEN INTERVAL '1 day' ELSE INTERVAL '7 days' END,
+          part_end
+        );
+        leaf_name := format('%s_%s', sub_name, to_char(slice_start, 'DD'));
+        EXECUTE format(
+          'CREATE TABLE core.%I PARTITION OF core.%I FOR VALUES FROM (%L) TO (%L)',
+          leaf_name, sub_name, slice_start, slice_end
+        );
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON core.%I USING BRIN (ts) WITH (pages_per_range=128)',
+                       leaf_name || '_brin_ts', leaf_name);
+        slice_start := slice_end;
+      END LOOP;
+    END LOOP;
+    EXECUTE format('CREATE TABLE core.%I PARTITION OF %s DEFAULT', part_name || '_rest', full_name);
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON core.%I USING BRIN (ts) WITH (pages_per_range=128)',
+                   part_name || '_rest_brin_ts', part_name || '_rest');
+  ELSE
+    EXECUTE format(
+      'CREATE TABLE %s PARTITION OF core.stock_ledger FOR VALUES FROM (%L) TO (%L)',
+      full_name, part_start, part_end
+    );
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I_brin_ts ON %s USING BRIN (ts) WITH (pages_per_range=128)',
+                   part_name, full_name);
+  END IF;
+
+  IF v_moved > 0 THEN
+    EXECUTE format('INSERT INTO %s SELECT * FROM pg_temp.stock_ledger_moving', full_name);
+  END IF;
+  DROP TABLE pg_temp.stock_ledger_moving;
+  RETURN v_moved;
+END$$;
+
+REVOKE ALL ON FUNCTION core.create_stock_ledger_partition(date) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.create_stock_ledger_partition(date) TO osl_app;
+
+COMMENT ON FUNCTION core.create_stock_ledger_partition(date)
+  IS 'Creates the month partition (per-tenant slices for policy tenants), moving matching rows out of DEFAULT.';
+
+-- Kept for existing callers (migrations, scripts).
+CREATE OR REPLACE FUNCTION core.ensure_stock_ledger_partition(p_month_start date)
+RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM core.create_stock_ledger_partition(p_month_start);
+END$$;
+
+-- Direct children of the ledger with their range, size and whether the range is checkpointed.
+CREATE OR REPLACE FUNCTION core.stock_ledger_partitions()
+RETURNS TABLE (
+  partition_name text,
+  range_start    timestamptz,
+  range_end      timestamptz,
+  is_default     boolean,
+  leaf_count     integer,
+  approx_rows    bigint,
+  total_bytes    bigint,
+  checkpointed   boolean
+) LANGUAGE sql STABLE SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+  WITH children AS (
+    SELECT c.oid, c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+     WHERE i.inhparent = 'core.stock_ledger'::regclass
+  )
+  SELECT ch.relname::text,
+         substring(ch.bound FROM $r$FROM \('([^']+)'\)$r$)::timestamptz,
+         substring(ch.bound FROM $r$TO \('([^']+)'\)$r$)::timestamptz,
+         ch.bound = 'DEFAULT',
+         (SELECT count(*)::int FROM pg_partition_tree(ch.oid) t WHERE t.isleaf),
+         (SELECT COALESCE(sum(GREATEST(c2.reltuples, 0)), 0)::bigint
+            FROM pg_partition_tree(ch.oid) t JOIN pg_class c2 ON c2.oid = t.relid WHERE t.isleaf),
+         (SELECT COALESCE(sum(pg_total_relation_size(t.relid)), 0)::bigint
+            FROM pg_partition_tree(ch.oid) t WHERE t.isleaf),
+         substring(ch.bound FROM $r$TO \('([^']+)'\)$r$)::timestamptz <= core.stock_checkpoint_watermark()
+    FROM children ch
+   ORDER BY 2 NULLS LAST
+$$;
+
+REVOKE ALL ON FUNCTION core.stock_ledger_partitions() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.stock_ledger_partitions() TO osl_app;
+
+-- Months that currently have rows in the DEFAULT partition (i.e. inserts that hit a missing range).
+CREATE OR REPLACE FUNCTION core.stock_ledger_default_months()
+RETURNS TABLE (month date, row_count bigint) LANGUAGE sql STABLE SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+  SELECT date_trunc('month', ts)::date, count(*)
+    FROM core.stock_ledger_default
+   GROUP BY 1
+   ORDER BY 1
+$$;
+
+REVOKE ALL ON FUNCTION core.stock_ledger_default_months() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.stock_ledger_default_months() TO osl_app;
+
+-- Retention: detach (keep as a standalone table for archiving) or drop a checkpointed month.
+CREATE OR REPLACE FUNCTION core.retire_stock_ledger_partition(p_partition text, p_drop boolean DEFAULT false)
+RETURNS void LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+SET lock_timeout = '2s' AS $$
+DECLARE
+  v_part record;
+BEGIN
+  SELECT * INTO v_part FROM core.stock_ledger_partitions() p WHERE p.partition_name = p_partition;
+  IF NOT FOUND OR v_part.is_default THEN
+    RAISE EXCEPTION 'not a month partition of core.stock_ledger: %', p_partition
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+  IF NOT v_part.checkpointed THEN
+    RAISE EXCEPTION 'partition % ends after the checkpoint watermark; close the month first', p_partition
+      USING ERRCODE = 'object_not_in_prerequisite_state';
+  END IF;
+  EXECUTE format('ALTER TABLE core.stock_ledger DETACH PARTITION core.%I', p_partition);
+  IF p_drop THEN
+    EXECUTE format('DROP TABLE core.%I', p_partition);
+  END IF;
+END$$;
+
+REVOKE ALL ON FUNCTION core.retire_stock_ledger_partition(text, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.retire_stock_ledger_partition(text, boolean) TO osl_app;
+
+COMMENT ON FUNCTION core.retire_stock_ledger_partition(text, boolean)
+  IS 'Detaches (or drops) a month partition that is already folded into balance checkpoints.';
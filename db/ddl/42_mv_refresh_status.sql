@@ -0,0 +1,99 @@
+SET search_path = dw, public;
+
+-- Last refresh outcome per dw materialized view, written by backend/services/refresh_materialized.py
+-- through dw.record_mv_refresh() (the app role only reads dw).
+CREATE TABLE IF NOT EXISTS dw.mv_refresh_status (
+  view_name         text PRIMARY KEY,
+  last_started_at   timestamptz NOT NULL,
+  last_finished_at  timestamptz NOT NULL,
+  last_duration_ms  double precision NOT NULL,
+  last_concurrently boolean NOT NULL,
+  last_rows         bigint,
+  last_success_at   timestamptz,
+  last_error        text,
+  refreshes         bigint NOT NULL DEFAULT 0,
+  failures          bigint NOT NULL DEFAULT 0
+);
+COMMENT ON TABLE dw.mv_refresh_status
+  IS 'Per-view outcome of the last REFRESH run by the MV refresh orchestrator; last_success_at survives failures.';
+
+REVOKE ALL ON dw.mv_refresh_status FROM osl_app;
+GRANT SELECT ON dw.mv_refresh_status TO osl_app;
+
+-- Dependency graph of dw materialized views: the matviews each view's query reads, and whether a
+-- plain-column, non-partial unique index allows REFRESH ... CONCURRENTLY.
+CREATE OR REPLACE FUNCTION dw.materialized_view_graph()
+RETURNS TABLE (view_name text, depends_on text[], has_unique_index boolean)
+LANGUAGE sql STABLE SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+  SELECT format('%I.%I', n.nspname, v.relname),
+         COALESCE(array_agg(DISTINCT format('%I.%I', dn.nspname, dep.relname))
+                    FILTER (WHERE dep.oid IS NOT NULL), '{}'),
+         EXISTS (SELECT 1 FROM pg_index i
+                  WHERE i.indrelid = v.oid AND i.indisunique AND i.indisvalid
+                    AND i.indpred IS NULL AND i.indexprs IS NULL)
+    FROM pg_class v
+    JOIN pg_namespace n ON n.oid = v.relnamespace AND n.nspname = 'dw'
+    LEFT JOIN pg_rewrite r ON r.ev_class = v.oid
+    LEFT JOIN pg_depend d
+      ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+     AND d.refclassid = 'pg_class'::regclass AND d.refobjid <> v.oid
+    LEFT JOIN pg_class dep ON dep.oid = d.refobjid AND dep.relkind = 'm'
+    LEFT JOIN pg_namespace dn ON dn.oid = dep.relnamespace
+   WHERE v.relkind = 'm'
+   GROUP BY n.nspname, v.relname, v.oid
+   ORDER BY 1
+$$;
+
+REVOKE ALL ON FUNCTION dw.materialized_view_graph() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dw.materialized_view_graph() TO osl_app;
+
+-- Record one refresh attempt. On success (p_error IS NULL) the view's row count is taken here, in the
+-- same transaction as the REFRESH, so it matches the snapshot just built.
+CREATE OR REPLACE FUNCTION dw.record_mv_refresh(
+  p_view         text,
+  p_started_at   timestamptz,
+  p_duration_ms  double precision,
+  p_concurrently boolean,
+  p_error        text DEFAULT NULL
+)
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_oid  regclass := to_regclass(p_view);
+  v_rows bigint;
+BEGIN
+  IF v_oid IS NULL OR NOT EXISTS (
+    SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+     WHERE c.oid = v_oid AND c.relkind = 'm' AND n.nspname = 'dw'
+  ) THEN
+    RAISE EXCEPTION 'not a dw materialized view: %', p_view USING ERRCODE = '42809';
+  END IF;
+  IF p_error IS NULL THEN
+    EXECUTE format('SELECT count(*) FROM %s', v_oid) INTO v_rows;
+  END IF;
+
+  INSERT INTO dw.mv_refresh_status AS s
+    (view_name, last_started_at, last_finished_at, last_duration_ms, last_concurrently, last_rows,
+     last_success_at, last_error, refreshes, failures)
+  VALUES (p_view, p_started_at, clock_timestamp(), p_duration_ms, p_concurrently, v_rows,
+          CASE WHEN p_error IS NULL THEN p_started_at END, p_error,
+          (p_error IS NULL)::int, (p_error IS NOT NULL)::int)
+  ON CONFLICT (view_name) DO UPDATE
+    SET last_started_at   = EXCLUDED.last_started_at,
+        last_finished_at  = EXCLUDED.last_finished_at,
+        last_duration_ms  = EXCLUDED.last_duration_ms,
+        last_concurrently = EXCLUDED.last_concurrently,
+        last_rows         = COALESCE(EXCLUDED.last_rows, s.last_rows),
+        last_success_at   = COALESCE(EXCLUDED.last_success_at, s.last_success_at),
+        last_error        = EXCLUDED.last_error,
+        refreshes         = s.refreshes + EXCLUDED.refreshes,
+        failures          = s.failures + EXCLUDED.failures;
+  RETURN v_rows;
+END$$;
+
+REVOKE ALL ON FUNCTION dw.record_mv_refresh(text, timestamptz, double precision, boolean, text) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dw.record_mv_refresh(text, timestamptz, double precision, boolean, text) TO osl_app;
+
+COMMENT ON FUNCTION dw.record_mv_refresh(text, timestamptz, double precision, boolean, text)
+  IS 'Upserts dw.mv_refresh_status for one refresh attempt; returns the view row count on success.';
@@ -0,0 +1,293 @@
+SET search_path = dw, public;
+
+-- Daily movement rollup: one row per (tenant, product, warehouse, UTC day) with units per event type.
+-- Analytics MVs aggregate these rows instead of the ledger, so their refresh cost follows
+-- days x products rather than the number of events.
+CREATE TABLE IF NOT EXISTS dw.fact_daily_movements (
+  tenant_id      uuid   NOT NULL,
+  product_id     uuid   NOT NULL,
+  warehouse_id   uuid,
+  day            date   NOT NULL,
+  receipt_qty    bigint NOT NULL DEFAULT 0,
+  ship_qty       bigint NOT NULL DEFAULT 0,
+  reserve_qty    bigint NOT NULL DEFAULT 0,
+  release_qty    bigint NOT NULL DEFAULT 0,
+  adjust_in_qty  bigint NOT NULL DEFAULT 0,
+  adjust_out_qty bigint NOT NULL DEFAULT 0,
+  events         bigint NOT NULL DEFAULT 0
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uk_fact_daily_movements
+  ON dw.fact_daily_movements (tenant_id, product_id, warehouse_id, day) NULLS NOT DISTINCT;
+-- Loader deletes/reloads whole days; reorder analytics read a trailing window of days
+CREATE INDEX IF NOT EXISTS ix_fact_daily_movements_day
+  ON dw.fact_daily_movements (day);
+
+COMMENT ON TABLE dw.fact_daily_movements
+  IS 'Units per event type per tenant/product/warehouse and UTC day (all quantities positive), loaded by dw.load_fact_daily_movements().';
+
+-- Loader watermark (single row): ledger rows dated before loaded_through have been rolled up.
+CREATE TABLE IF NOT EXISTS dw.fact_daily_movements_state (
+  id             boolean PRIMARY KEY DEFAULT true CHECK (id),
+  loaded_through timestamptz NOT NULL DEFAULT '-infinity',
+  last_loaded_at timestamptz,
+  last_from      timestamptz,
+  last_rows      bigint
+);
+INSERT INTO dw.fact_daily_movements_state (id) VALUES (true) ON CONFLICT DO NOTHING;
+
+-- UTC days that received ledger rows dated before the watermark (back-dated or late events).
+CREATE TABLE IF NOT EXISTS dw.fact_daily_movements_dirty (
+  day date PRIMARY KEY
+);
+
+GRANT SELECT ON dw.fact_daily_movements, dw.fact_daily_movements_state, dw.fact_daily_movements_dirty
+  TO osl_app;
+
+-- Events are normally dated "now", after the watermark, and this trigger writes nothing. Only
+-- statements carrying older timestamps mark their days, so the next load goes back far enough.
+CREATE OR REPLACE FUNCTION dw.mark_late_daily_movements()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  INSERT INTO dw.fact_daily_movements_dirty (day)
+  SELECT DISTINCT (n.ts AT TIME ZONE 'UTC')::date
+    FROM new_rows n
+   WHERE n.ts < (SELECT loaded_through FROM dw.fact_daily_movements_state WHERE id)
+  ON CONFLICT DO NOTHING;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_daily_movements ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_daily_movements
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION dw.mark_late_daily_movements();
+
+-- Incremental load. Each run recomputes whole UTC days from the earlier of
+--   * the day of the previous watermark minus p_lookback (rows of transactions still in flight
+--     during the previous load), and
+--   * the earliest day marked by trg_stock_ledger_daily_movements since then.
+-- Days before that are not touched, so the rollup keeps its history after old ledger partitions
+-- are detached, and the ts >= start filter prunes every older partition at run time.
+CREATE OR REPLACE FUNCTION dw.load_fact_daily_movements(p_lookback interval DEFAULT '1 day')
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_started timestamptz := now();
+  v_from    timestamptz;
+  v_dirty   date;
+  v_day     date;
+  n         bigint;
+BEGIN
+  LOCK TABLE dw.fact_daily_movements IN EXCLUSIVE MODE;  -- one loader at a time; readers unaffected
+  SELECT loaded_through - p_lookback INTO v_from FROM dw.fact_daily_movements_state WHERE id FOR UPDATE;
+  WITH taken AS (DELETE FROM dw.fact_daily_movements_dirty RETURNING day)
+  SELECT min(day) INTO v_dirty FROM taken;
+  IF v_dirty IS NOT NULL THEN
+    v_from := LEAST(v_from, v_dirty::timestamp AT TIME ZONE 'UTC');
+  END IF;
+
+  IF isfinite(v_from) THEN
+    v_day  := (v_from AT TIME ZONE 'UTC')::date;
+    v_from := v_day::timestamp AT TIME ZONE 'UTC';
+    DELETE FROM dw.fact_daily_movements WHERE day >= v_day;
+  ELSE
+    DELETE FROM dw.fact_daily_movements;
+  END IF;
+
+  INSERT INTO dw.fact_daily_movements
+    (tenant_id, product_id, warehouse_id, day, receipt_qty, ship_qty, reserve_qty, release_qty,
+     adjust_in_qty, adjust_out_qty, events)
+  SELECT sl.tenant_id, sl.product_id, sl.warehouse_id, (sl.ts AT TIME ZONE 'UTC')::date,
+         COALESCE(SUM(sl.qty_delta)  FILTER (WHERE sl.event_type = 'RECEIPT'), 0),
+         COALESCE(SUM(-sl.qty_delta) FILTER (WHERE sl.event_type = 'SHIP'), 0),
+         COALESCE(SUM(-sl.qty_delta) FILTER (WHERE sl.event_type = 'RESERVE'), 0),
+         COALESCE(SUM(sl.qty_delta)  FILTER (WHERE sl.event_type = 'RELEASE'), 0),
+         COALESCE(SUM(sl.qty_delta)  FILTER (WHERE sl.event_type = 'ADJUST_IN'), 0),
+         COALESCE(SUM(-sl.qty_delta) FILTER (WHERE sl.event_type = 'ADJUST_OUT'), 0),
+         count(*)
+    FROM core.stock_ledger sl
+   WHERE sl.ts >= v_from
+   GROUP BY sl.tenant_id, sl.product_id, sl.warehouse_id, (sl.ts AT TIME ZONE 'UTC')::date;
+  GET DIAGNOSTICS n = ROW_COUNT;
+
+  UPDATE dw.fact_daily_movements_state
+     SET loaded_through = v_started,
+         last_loaded_at = clock_timestamp(),
+         last_from      = v_from,
+         last_rows      = n
+   WHERE id;
+  RETURN n;
+END$$;
+
+REVOKE ALL ON FUNCTION dw.load_fact_daily_movements(interval) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dw.load_fact_daily_movements(interval) TO osl_app;
+
+COMMENT ON FUNCTION dw.load_fact_daily_movements(interval)
+  IS 'Recomputes dw.fact_daily_movements from the watermark (minus p_lookback) or the earliest late-marked day.';
+
+-- The refresh orchestrator treats dw tables read by a matview as DAG nodes too (the rollup is
+-- loaded before the views that read it), and records their loads in dw.mv_refresh_status.
+CREATE OR REPLACE FUNCTION dw.materialized_view_graph()
+RETURNS TABLE (view_name text, depends_on text[], has_unique_index boolean)
+LANGUAGE sql STABLE SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+  SELECT format('%I.%I', n.nspname, v.relname),
+         COALESCE(array_agg(DISTINCT format('%I.%I', dn.nspname, dep.relname))
+                    FILTER (WHERE dep.oid IS NOT NULL), '{}'),
+         EXISTS (SELECT 1 FROM pg_index i
+                  WHERE i.indrelid = v.oid AND i.indisunique AND i.indisvalid
+                    AND i.indpred IS NULL AND i.indexprs IS NULL)
+    FROM pg_class v
+    JOIN pg_namespace n ON n.oid = v.relnamespace AND n.nspname = 'dw'
+    LEFT JOIN pg_rewrite r ON r.ev_class = v.oid
+    LEFT JOIN pg_depend d
+      ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+     AND d.refclassid = 'pg_class'::regclass AND d.refobjid <> v.oid
+    LEFT JOIN (pg_class dep JOIN pg_namespace dn ON dn.oid = dep.relnamespace)
+      ON dep.oid = d.refobjid
+     AND (dep.relkind = 'm' OR (dep.relkind = 'r' AND dn.nspname = 'dw'))
+   WHERE v.relkind = 'm'
+   GROUP BY n.nspname, v.relname, v.oid
+   ORDER BY 1
+$$;
+
+CREATE OR REPLACE FUNCTION dw.record_mv_refresh(
+  p_view         text,
+  p_started_at   timestamptz,
+  p_duration_ms  double precision,
+  p_concurrently boolean,
+  p_error        text DEFAULT NULL
+)
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_oid  regclass := to_regclass(p_view);
+  v_rows bigint;
+BEGIN
+  IF v_oid IS NULL OR NOT EXISTS (
+    SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+     WHERE c.oid = v_oid AND c.relkind IN ('m', 'r') AND n.nspname = 'dw'
+  ) THEN
+    RAISE EXCEPTION 'not a dw materialized view or table: %', p_view USING ERRCODE = '42809';
+  END IF;
+  IF p_error IS NULL THEN
+    EXECUTE format('SELECT count(*) FROM %s', v_oid) INTO v_rows;
+  END IF;
+
+  INSERT INTO dw.mv_refresh_status AS s
+    (view_name, last_started_at, last_finished_at, last_duration_ms, last_concurrently, last_rows,
+     last_success_at, last_error, refreshes, failures)
+  VALUES (p_view, p_started_at, clock_timestamp(), p_duration_ms, p_concurrently, v_rows,
+          CASE WHEN p_error IS NULL THEN p_started_at END, p_error,
+          (p_error IS NULL)::int, (p_error IS NOT NULL)::int)
+  ON CONFLICT (view_name) DO UPDATE
+    SET last_started_at   = EXCLUDED.last_started_at,
+        last_finished_at  = EXCLUDED.last_finished_at,
+        last_duration_ms  = EXCLUDED.last_duration_ms,
+        last_concurrently = EXCLUDED.last_concurrently,
+        last_rows         = COALESCE(EXCLUDED.last_rows, s.last_rows),
+        last_success_at   = COALESCE(EXCLUDED.last_success_at, s.last_success_at),
+        last_error        = EXCLUDED.last_error,
+        refreshes         = s.refreshes + EXCLUDED.refreshes,
+        failures          = s.failures + EXCLUDED.failures;
+  RETURN v_rows;
+END$$;
+
+-- ABC and reorder analytics read the rollup. Names, columns and indexes are unchanged.
+DROP MATERIALIZED VIEW IF EXISTS dw.reorder_candidates_mv;
+DROP MATERIALIZED VIEW IF EXISTS dw.product_abc_mv;
+
+-- ABC classification materialized view (all-time shipped units from the rollup)
+CREATE MATERIALIZED VIEW product_abc_mv AS
+WITH shipped AS (
+  SELECT
+    tenant_id,
+    product_id,
+    SUM(ship_qty)::numeric AS shipped_qty
+  FROM dw.fact_daily_movements
+  GROUP BY tenant_id, product_id
+), ordered AS (
+  SELECT
+    tenant_id,
+    product_id,
+    COALESCE(shipped_qty, 0) AS shipped_qty,
+    SUM(COALESCE(shipped_qty, 0)) OVER (PARTITION BY tenant_id) AS total_shipped,
+    SUM(COALESCE(shipped_qty, 0)) OVER (
+      PARTITION BY tenant_id
+      ORDER BY COALESCE(shipped_qty, 0) DESC, product_id
+      ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS running_shipped
+  FROM shipped
+), classified AS (
+  SELECT
+    tenant_id,
+    product_id,
+    shipped_qty,
+    total_shipped,
+    running_shipped,
+    CASE
+      WHEN total_shipped <= 0 THEN 'C'
+      WHEN running_shipped / total_shipped <= 0.7 THEN 'A'
+      WHEN running_shipped / total_shipped <= 0.9 THEN 'B'
+      ELSE 'C'
+    END AS abc_class,
+    COALESCE(running_shipped / NULLIF(total_shipped, 0), 0) AS cumulative_ratio
+  FROM ordered
+)
+SELECT tenant_id, product_id, shipped_qty, total_shipped, cumulative_ratio, abc_class
+FROM classified;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_product_abc_mv
+  ON product_abc_mv (tenant_id, product_id);
+
+COMMENT ON MATERIALIZED VIEW product_abc_mv
+  IS 'ABC classification by shipped quantity per tenant (A=top 70%, B=next 20%, C=rest).';
+
+-- Reorder candidates materialized view (30 UTC days of shipments, today included, from the rollup)
+CREATE MATERIALIZED VIEW reorder_candidates_mv AS
+WITH current_qty AS (
+  SELECT tenant_id, product_id, SUM(qty)::bigint AS on_hand
+  FROM dw.current_stock_mv
+  GROUP BY tenant_id, product_id
+), ship_window AS (
+  SELECT
+    tenant_id,
+    product_id,
+    SUM(ship_qty)::numeric AS shipped_30
+  FROM dw.fact_daily_movements
+  WHERE day > (now() AT TIME ZONE 'UTC')::date - 30
+  GROUP BY tenant_id, product_id
+), base AS (
+  SELECT
+    COALESCE(c.tenant_id, s.tenant_id) AS tenant_id,
+    COALESCE(c.product_id, s.product_id) AS product_id,
+    COALESCE(c.on_hand, 0) AS on_hand,
+    COALESCE(s.shipped_30, 0) AS shipped_30
+  FROM current_qty c
+  FULL OUTER JOIN ship_window s
+    ON s.tenant_id = c.tenant_id AND s.product_id = c.product_id
+)
+SELECT
+  tenant_id,
+  product_id,
+  on_hand,
+  shipped_30,
+  (COALESCE(shipped_30, 0) / 30.0)::numeric AS avg_daily_ship,
+  CEIL((COALESCE(shipped_30, 0) / 30.0) * 7)::bigint AS reorder_point,
+  (on_hand < CEIL((COALESCE(shipped_30, 0) / 30.0) * 7)) AS needs_reorder
+FROM base;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_reorder_candidates_mv
+  ON reorder_candidates_mv (tenant_id, product_id);
+
+COMMENT ON MATERIALIZED VIEW reorder_candidates_mv
+  IS 'Simple reorder heuristic: current on-hand vs 7-day buffer of average daily shipments (30-day lookback).';
+
+GRANT SELECT ON dw.product_abc_mv, dw.reorder_candidates_mv TO osl_app;
+
+-- Backfill so the recreated views start from full history.
+SELECT dw.load_fact_daily_movements();
+REFRESH MATERIALIZED VIEW dw.product_abc_mv;
+REFRESH MATERIALIZED VIEW dw.reorder_candidates_mv;
@@ -0,0 +1,178 @@
+SET search_path = dw, public;
+
+-- FIFO cost/age layers: one row per inbound ledger row (RECEIPT, ADJUST_IN) that still has units
+-- left. Outbound rows (SHIP, ADJUST_OUT) consume the oldest layers of their key first; empty
+-- layers are deleted. RESERVE/RELEASE do not move stock physically and leave the layers alone.
+-- Aging and valuation read the live layers instead of replaying the ledger.
+CREATE TABLE IF NOT EXISTS dw.stock_fifo_layers (
+  id              bigint      GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  tenant_id       uuid        NOT NULL,
+  product_id      uuid        NOT NULL,
+  warehouse_id    uuid,
+  location_id     uuid,
+  lot_id          uuid,
+  received_at     timestamptz NOT NULL,
+  qty_in          bigint      NOT NULL,
+  qty_remaining   bigint      NOT NULL,
+  unit_cost_cents bigint      NOT NULL DEFAULT 0,
+  CONSTRAINT stock_fifo_layers_qty_ck CHECK (qty_remaining > 0 AND qty_remaining <= qty_in)
+);
+
+-- Consumption order per key, and per-product aging/valuation lookups
+CREATE INDEX IF NOT EXISTS ix_stock_fifo_layers_key
+  ON dw.stock_fifo_layers (tenant_id, product_id, warehouse_id, location_id, lot_id, received_at, id);
+
+COMMENT ON TABLE dw.stock_fifo_layers
+  IS 'Open FIFO layers per (tenant, product, warehouse, location, lot), maintained from stock_ledger inserts.';
+COMMENT ON COLUMN dw.stock_fifo_layers.unit_cost_cents
+  IS 'The ledger carries no purchase cost: layers are valued at the product price_cents when received.';
+
+GRANT SELECT ON dw.stock_fifo_layers TO osl_app;
+
+-- Statement-level trigger: push one layer per inbound row, then consume each key's outbound total
+-- from its oldest layers in one pass (running sum over the key's layers in FIFO order).
+-- Fires after trg_stock_ledger_current_stock (same-event triggers run in name order), whose upsert
+-- holds every touched dw.current_stock key row until commit. Concurrent writers to a key therefore
+-- apply their layers one at a time, and each statement here sees the previous writer's layers.
+-- Outbound units beyond the open layers are owed to the next receipt (50_fifo_deficits.sql).
+CREATE OR REPLACE FUNCTION dw.apply_ledger_to_fifo_layers()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  INSERT INTO dw.stock_fifo_layers
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, received_at, qty_in, qty_remaining,
+     unit_cost_cents)
+  SELECT n.tenant_id, n.product_id, n.warehouse_id, n.location_id, n.lot_id, n.ts, n.qty_delta, n.qty_delta,
+         p.price_cents
+    FROM new_rows n
+    JOIN core.products p ON p.id = n.product_id
+   WHERE n.event_type IN ('RECEIPT','ADJUST_IN') AND n.qty_delta > 0
+   ORDER BY n.ts, n.id;
+
+  WITH outbound AS (
+    SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(-qty_delta) AS qty
+      FROM new_rows
+     WHERE event_type IN ('SHIP','ADJUST_OUT') AND qty_delta < 0
+     GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+  ), taken AS (
+    SELECT l.id, l.qty_remaining,
+           o.qty - (SUM(l.qty_remaining) OVER w - l.qty_remaining) AS take  -- left after older layers
+      FROM outbound o
+      JOIN dw.stock_fifo_layers l
+        ON l.tenant_id = o.tenant_id AND l.product_id = o.product_id
+       AND l.warehouse_id IS NOT DISTINCT FROM o.warehouse_id
+       AND l.location_id IS NOT DISTINCT FROM o.location_id
+       AND l.lot_id IS NOT DISTINCT FROM o.lot_id
+    WINDOW w AS (PARTITION BY l.tenant_id, l.product_id, l.warehouse_id, l.location_id, l.lot_id
+                 ORDER BY l.received_at, l.id)
+  ), emptied AS (
+    DELETE FROM dw.stock_fifo_layers l
+     USING taken t
+     WHERE l.id = t.id AND t.take >= t.qty_remaining
+  )
+  UPDATE dw.stock_fifo_layers l
+     SET qty_remaining = l.qty_remaining - t.take
+    FROM taken t
+   WHERE l.id = t.id AND t.take > 0 AND t.take < t.qty_remaining;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_fifo_layers ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_fifo_layers
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION dw.apply_ledger_to_fifo_layers();
+
+-- Full rebuild from the ledger (backfill, repair after bulk loads with triggers disabled): every
+-- key's outbound total consumes its inbound rows oldest first. Same locking as
+-- dw.rebuild_current_stock(): concurrent writers queue until the rebuild commits.
+CREATE OR REPLACE FUNCTION dw.rebuild_stock_fifo_layers()
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE dw.stock_fifo_layers IN EXCLUSIVE MODE;
+  DELETE FROM dw.stock_fifo_layers;
+  WITH inbound AS (
+    SELECT sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id, sl.ts, sl.id,
+           sl.qty_delta::bigint AS qty,
+           SUM(sl.qty_delta::bigint) OVER (
+             PARTITION BY sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id
+             ORDER BY sl.ts, sl.id
+           ) AS cum_in
+      FROM core.stock_ledger sl
+     WHERE sl.event_type IN ('RECEIPT','ADJUST_IN') AND sl.qty_delta > 0
+  ), outbound AS (
+    SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(-qty_delta)::bigint AS qty
+      FROM core.stock_ledger
+     WHERE event_type IN ('SHIP','ADJUST_OUT') AND qty_delta < 0
+     GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+  )
+  INSERT INTO dw.stock_fifo_layers
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, received_at, qty_in, qty_remaining,
+     unit_cost_cents)
+  SELECT i.tenant_id, i.product_id, i.warehouse_id, i.location_id, i.lot_id, i.ts, i.qty,
+         LEAST(i.qty, i.cum_in - COALESCE(o.qty, 0)), p.price_cents
+    FROM inbound i
+    JOIN core.products p ON p.id = i.product_id
+    LEFT JOIN outbound o
+      ON o.tenant_id = i.tenant_id AND o.product_id = i.product_id
+     AND o.warehouse_id IS NOT DISTINCT FROM i.warehouse_id
+     AND o.location_id IS NOT DISTINCT FROM i.location_id
+     AND o.lot_id IS NOT DISTINCT FROM i.lot_id
+   WHERE i.cum_in - COALESCE(o.qty, 0) > 0
+   ORDER BY i.ts, i.id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$;
+
+REVOKE ALL ON FUNCTION dw.rebuild_stock_fifo_layers() FROM PUBLIC;
+
+COMMENT ON FUNCTION dw.rebuild_stock_fifo_layers()
+  IS 'Recomputes dw.stock_fifo_layers from the full ledger. Normal writes maintain it via trigger.';
+
+SELECT dw.rebuild_stock_fifo_layers();
+
+-- Aging per FIFO layer instead of per lot's first receipt: a lot received repeatedly spreads over
+-- several buckets. The refresh reads only the open layers, never the ledger.
+DROP MATERIALIZED VIEW IF EXISTS dw.inventory_aging_mv;
+
+CREATE MATERIALIZED VIEW inventory_aging_mv AS
+WITH aged AS (
+  SELECT
+    tenant_id,
+    product_id,
+    warehouse_id,
+    location_id,
+    lot_id,
+    qty_remaining,
+    qty_remaining * unit_cost_cents AS value_cents,
+    DATE_PART('day', now() - received_at)::int AS age_days
+  FROM dw.stock_fifo_layers
+)
+SELECT
+  tenant_id,
+  product_id,
+  warehouse_id,
+  location_id,
+  lot_id,
+  SUM(qty_remaining)::bigint AS qty,
+  MAX(age_days) AS age_days,
+  CASE
+    WHEN age_days < 30 THEN '0-29'
+    WHEN age_days < 60 THEN '30-59'
+    WHEN age_days < 90 THEN '60-89'
+    ELSE '90+'
+  END AS age_bucket,
+  SUM(value_cents)::bigint AS value_cents
+FROM aged
+GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id, 8;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_inventory_aging_mv
+  ON inventory_aging_mv (tenant_id, product_id, warehouse_id, location_id, lot_id, age_bucket) NULLS NOT DISTINCT;
+
+COMMENT ON MATERIALIZED VIEW inventory_aging_mv
+  IS 'On-hand units and FIFO value per lot/location and age bucket (age of the oldest layer in the bucket).';
+
+GRANT SELECT ON dw.inventory_aging_mv TO osl_app;
@@ -0,0 +1,81 @@
+SET search_path = core, public;
+
+-- Asynchronous allocation requests (POST /api/orders/<id>/allocate?async=1), executed by the
+-- worker pool in backend/services/allocation_jobs.py. `seq` is the submission order: a tenant's
+-- jobs run one at a time in that order, different tenants' jobs in parallel.
+CREATE TABLE IF NOT EXISTS core.allocation_jobs (
+  id               uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  seq              bigint GENERATED ALWAYS AS IDENTITY,
+  tenant_id        uuid NOT NULL REFERENCES core.tenants(id) ON DELETE RESTRICT,
+  order_id         uuid NOT NULL REFERENCES core.orders(id) ON DELETE CASCADE,
+  request_hint     jsonb NOT NULL DEFAULT '{}'::jsonb,
+  status           text NOT NULL DEFAULT 'queued' CHECK (status IN ('queued','running','done','failed')),
+  attempts         integer NOT NULL DEFAULT 0,
+  worker           text,
+  lease_expires_at timestamptz,
+  result           jsonb,
+  error            text,
+  created_at       timestamptz NOT NULL DEFAULT now(),
+  started_at       timestamptz,
+  finished_at      timestamptz,
+  CONSTRAINT allocation_jobs_seq_uk UNIQUE (seq)
+);
+COMMENT ON TABLE core.allocation_jobs
+  IS 'Queued allocation requests; claimed with FOR UPDATE SKIP LOCKED, one running job per tenant.';
+
+-- Claim scan (oldest active job first) and the per-tenant "earlier active job" probe; since
+-- 51_allocation_job_heads.sql the claim skip-scans the second for each tenant's oldest active job.
+CREATE INDEX IF NOT EXISTS ix_allocation_jobs_active_seq
+  ON core.allocation_jobs (seq) WHERE status IN ('queued','running');
+CREATE INDEX IF NOT EXISTS ix_allocation_jobs_active_tenant
+  ON core.allocation_jobs (tenant_id, seq) WHERE status IN ('queued','running');
+-- At most one pending job per order; resubmitting returns the pending one.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_allocation_jobs_order_active
+  ON core.allocation_jobs (order_id) WHERE status IN ('queued','running');
+
+ALTER TABLE core.allocation_jobs ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS allocation_jobs_rls ON core.allocation_jobs;
+CREATE POLICY allocation_jobs_rls ON core.allocation_jobs
+  USING (tenant_id = current_setting('app.tenant_id', true)::uuid)
+  WITH CHECK (tenant_id = current_setting('app.tenant_id', true)::uuid);
+
+GRANT SELECT, INSERT, UPDATE ON core.allocation_jobs TO osl_app;
+
+-- Claim the next runnable job for p_worker: the oldest queued job (or running job whose lease
+-- expired) with no earlier queued/running job of the same tenant. SKIP LOCKED lets concurrent
+-- workers pass over each other's candidates; a tenant's later job is never a candidate while an
+-- earlier one is queued, so skipping cannot reorder a tenant's jobs. Jobs whose lease expired
+-- p_max_attempts times are failed instead of claimed again. Runs across tenants, hence DEFINER.
+CREATE OR REPLACE FUNCTION core.claim_allocation_job(p_worker text, p_lease interval, p_max_attempts integer)
+RETURNS SETOF core.allocation_jobs LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  UPDATE core.allocation_jobs
+     SET status = 'failed', finished_at = now(), lease_expires_at = NULL,
+         error = format('worker lease expired after %s attempts', attempts)
+   WHERE status = 'running' AND lease_expires_at < now() AND attempts >= p_max_attempts;
+
+  RETURN QUERY
+  WITH next AS (
+    SELECT j.id
+      FROM core.allocation_jobs j
+     WHERE (j.status = 'queued' OR (j.status = 'running' AND j.lease_expires_at < now()))
+       AND NOT EXISTS (
+             SELECT 1 FROM core.allocation_jobs e
+              WHERE e.tenant_id = j.tenant_id
+                AND e.seq < j.seq
+                AND e.status IN ('queued','running'))
+     ORDER BY j.seq
+     LIMIT 1
+     FOR UPDATE OF j SKIP LOCKED
+  )
+  UPDATE core.allocation_jobs j
+     SET status = 'running', attempts = j.attempts + 1, worker = p_worker,
+         started_at = now(), lease_expires_at = now() + p_lease
+    FROM next
+   WHERE j.id = next.id
+  RETURNING j.*;
+END$$;
+
+REVOKE ALL ON FUNCTION core.claim_allocation_job(text, interval, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.claim_allocation_job(text, interval, integer) TO osl_app;
@@ -0,0 +1,220 @@
+SET search_path = core, public;
+
+-- Stock slots: the free quantity of a hot lot/location split into N lockable buckets.
+-- Unslotted allocation locks the whole core.lots row (FOR UPDATE SKIP LOCKED), so concurrent
+-- allocators of a single-lot SKU skip it and come back empty. Slotted allocation locks one
+-- bucket row instead; N allocators each find a bucket of the same lot at once.
+-- Here every RESERVE still updates the key's one dw.current_stock row, so reservations on a hot
+-- key queue on that row lock; 48_stock_slot_deltas.sql keeps slotted deltas on the bucket instead.
+--
+--   * qty is the bucket's budget: units it may still hand out. Allocation subtracts from the
+--     bucket it locked, release gives the units back to the bucket they came from.
+--   * core.rebalance_stock_slots() (background, backend/services/stock_slots.py) creates buckets
+--     for stocked lot/locations and re-spreads dw.current_stock.qty evenly across them.
+--   * trg_stock_ledger_slot_guard keeps a RESERVE from overdrawing a slotted lot/location
+--     (replaced in 48_stock_slot_deltas.sql).
+CREATE TABLE IF NOT EXISTS core.stock_slots (
+  tenant_id    uuid     NOT NULL REFERENCES core.tenants(id) ON DELETE RESTRICT,
+  product_id   uuid     NOT NULL REFERENCES core.products(id) ON DELETE RESTRICT,
+  lot_id       uuid     NOT NULL REFERENCES core.lots(id) ON DELETE RESTRICT,
+  warehouse_id uuid     NOT NULL REFERENCES core.warehouses(id) ON DELETE RESTRICT,
+  location_id  uuid     NOT NULL REFERENCES core.locations(id) ON DELETE RESTRICT,
+  slot_no      smallint NOT NULL CHECK (slot_no >= 0),
+  qty          bigint   NOT NULL DEFAULT 0 CHECK (qty >= 0),
+  updated_at   timestamptz NOT NULL DEFAULT now(),
+  CONSTRAINT pk_stock_slots PRIMARY KEY (tenant_id, product_id, lot_id, location_id, slot_no)
+);
+COMMENT ON TABLE core.stock_slots
+  IS 'Per lot/location allocation buckets; slotted allocators lock one bucket row instead of the lot.';
+
+ALTER TABLE core.stock_slots ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS stock_slots_rls ON core.stock_slots;
+CREATE POLICY stock_slots_rls ON core.stock_slots
+  USING (tenant_id = current_setting('app.tenant_id', true)::uuid)
+  WITH CHECK (tenant_id = current_setting('app.tenant_id', true)::uuid);
+
+GRANT SELECT, UPDATE ON core.stock_slots TO osl_app;
+
+-- Holds taken from a bucket remember it, so release can return the units.
+ALTER TABLE core.holds ADD COLUMN IF NOT EXISTS slot_no smallint;
+
+-- Slotted holds are bounded by their bucket budget and the guard below, not by overlap:
+-- one lot/location carries as many of them as its buckets allow.
+ALTER TABLE core.holds DROP CONSTRAINT IF EXISTS holds_no_overlap;
+ALTER TABLE core.holds
+  ADD CONSTRAINT holds_no_overlap
+  EXCLUDE USING gist (
+    tenant_id    WITH =,
+    product_id   WITH =,
+    lot_id       WITH =,
+    location_id  WITH =,
+    valid_range  WITH &&
+  ) WHERE (slot_no IS NULL) DEFERRABLE INITIALLY IMMEDIATE;
+COMMENT ON CONSTRAINT holds_no_overlap ON core.holds
+  IS 'Exclusion constraint via btree_gist to prevent overlapping unslotted reservations for same lot/location.';
+
+-- Overdraft guard. Runs after trg_stock_ledger_current_stock (AFTER triggers fire in name order),
+-- while this transaction holds the dw.current_stock row lock of every key it just reserved on,
+-- so the qty it reads is exact. Only slotted keys are checked; unslotted allocation keeps its
+-- own rules.
+CREATE OR REPLACE FUNCTION core.guard_stock_slot_overdraft()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_key record;
+BEGIN
+  SELECT r.product_id, r.lot_id, r.location_id, cs.qty
+    INTO v_key
+    FROM (SELECT DISTINCT tenant_id, product_id, warehouse_id, location_id, lot_id
+            FROM new_rows
+           WHERE event_type = 'RESERVE') r
+    JOIN dw.current_stock cs
+      ON cs.tenant_id = r.tenant_id
+     AND cs.product_id = r.product_id
+     AND cs.warehouse_id = r.warehouse_id
+     AND cs.location_id = r.location_id
+     AND cs.lot_id = r.lot_id
+   WHERE cs.qty < 0
+     AND EXISTS (
+       SELECT 1 FROM core.stock_slots s
+        WHERE s.tenant_id = r.tenant_id
+          AND s.product_id = r.product_id
+          AND s.lot_id = r.lot_id
+          AND s.location_id = r.location_id)
+   LIMIT 1;
+  IF FOUND THEN
+    RAISE EXCEPTION 'reservation overdraws slotted lot % at location % by %',
+                    v_key.lot_id, v_key.location_id, -v_key.qty
+      USING ERRCODE = 'serialization_failure';
+  END IF;
+  RETURN NULL;
+END$$;
+
+DROP TRIGGER IF EXISTS trg_stock_ledger_slot_guard ON core.stock_ledger;
+CREATE TRIGGER trg_stock_ledger_slot_guard
+  AFTER INSERT ON core.stock_ledger
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION core.guard_stock_slot_overdraft();
+
+-- Create and re-spread buckets, across tenants (hence DEFINER).
+--   1) every active lot/location with at least p_min_qty free and no buckets yet gets p_slots
+--      of them. Its lot row is locked SKIP LOCKED first, so no unslotted allocator is mid-flight
+--      on it.
+--   2) every slotted lot/location whose budgets are uneven, no longer add up to
+--      dw.current_stock.qty, or use a different bucket count, is re-spread evenly over slots
+--      0..p_slots-1 (extra buckets dropped) provided all its buckets can be locked right now,
+--      i.e. no allocation or release is in flight on it. Busy keys wait for the next run.
+-- Only stale keys are locked and only changed buckets written. One run at a time (advisory lock).
+CREATE OR REPLACE FUNCTION core.rebalance_stock_slots(p_slots integer, p_min_qty bigint DEFAULT 1)
+RETURNS TABLE (created_keys bigint, rebalanced_keys bigint)
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  IF p_slots IS NULL OR p_slots < 1 OR p_slots > 1024 THEN
+    RAISE EXCEPTION 'p_slots must be between 1 and 1024, got %', p_slots USING ERRCODE = '22023';
+  END IF;
+  created_keys := 0;
+  rebalanced_keys := 0;
+  IF NOT pg_try_advisory_xact_lock(hashtext('core.rebalance_stock_slots')) THEN
+    RETURN NEXT;
+    RETURN;
+  END IF;
+
+  WITH fresh AS (
+    SELECT cs.tenant_id, cs.product_id, cs.lot_id, cs.warehouse_id, cs.location_id, cs.qty
+      FROM dw.current_stock cs
+      JOIN core.lots l ON l.id = cs.lot_id AND l.is_active
+     WHERE cs.qty >= GREATEST(p_min_qty, 1)
+       AND cs.warehouse_id IS NOT NULL
+       AND cs.location_id IS NOT NULL
+       AND NOT EXISTS (
+         SELECT 1 FROM core.stock_slots s
+          WHERE s.tenant_id = cs.tenant_id
+            AND s.product_id = cs.product_id
+            AND s.lot_id = cs.lot_id
+            AND s.location_id = cs.location_id)
+     FOR UPDATE OF l SKIP LOCKED
+  ), ins AS (
+    INSERT INTO core.stock_slots (tenant_id, product_id, lot_id, warehouse_id, location_id, slot_no, qty)
+    SELECT f.tenant_id, f.product_id, f.lot_id, f.warehouse_id, f.location_id, g.n,
+           f.qty / p_slots + (g.n < f.qty % p_slots)::integer
+      FROM fresh f
+      CROSS JOIN generate_series(0, p_slots - 1) AS g(n)
+    ON CONFLICT DO NOTHING
+    RETURNING tenant_id, product_id, lot_id, location_id
+  )
+  SELECT count(*) INTO created_keys
+    FROM (SELECT DISTINCT tenant_id, product_id, lot_id, location_id FROM ins) k;
+
+  WITH keys AS (
+    SELECT tenant_id, product_id, lot_id, warehouse_id, location_id, count(*) AS n,
+           sum(qty) AS budget, max(qty) - min(qty) AS skew, max(slot_no) AS top_slot
+      FROM core.stock_slots
+     GROUP BY tenant_id, product_id, lot_id, warehouse_id, location_id
+  ), stale AS (
+    SELECT k.tenant_id, k.product_id, k.lot_id, k.warehouse_id, k.location_id, k.n,
+           GREATEST(COALESCE(cs.qty, 0), 0) AS free
+      FROM keys k
+      LEFT JOIN dw.current_stock cs
+        ON cs.tenant_id = k.tenant_id
+       AND cs.product_id = k.product_id
+       AND cs.warehouse_id = k.warehouse_id
+       AND cs.location_id = k.location_id
+       AND cs.lot_id = k.lot_id
+     WHERE k.n <> p_slots
+        OR k.top_slot >= p_slots
+        OR k.skew > 1
+        OR k.budget <> GREATEST(COALESCE(cs.qty, 0), 0)
+  ), locked AS (
+    SELECT x.tenant_id, x.product_id, x.lot_id, x.location_id, count(*) AS n
+      FROM (SELECT s.tenant_id, s.product_id, s.lot_id, s.location_id
+              FROM core.stock_slots s
+              JOIN stale t
+                ON t.tenant_id = s.tenant_id
+               AND t.product_id = s.product_id
+               AND t.lot_id = s.lot_id
+               AND t.location_id = s.location_id
+               FOR UPDATE OF s SKIP LOCKED) x
+     GROUP BY x.tenant_id, x.product_id, x.lot_id, x.location_id
+  ), idle AS (
+    SELECT t.tenant_id, t.product_id, t.lot_id, t.warehouse_id, t.location_id, t.free
+      FROM stale t
+      JOIN locked l
+        ON l.tenant_id = t.tenant_id
+       AND l.product_id = t.product_id
+       AND l.lot_id = t.lot_id
+       AND l.location_id = t.location_id
+     WHERE l.n = t.n
+  ), dropped AS (
+    DELETE FROM core.stock_slots s
+     USING idle i
+     WHERE s.tenant_id = i.tenant_id
+       AND s.product_id = i.product_id
+       AND s.lot_id = i.lot_id
+       AND s.location_id = i.location_id
+       AND s.slot_no >= p_slots
+    RETURNING s.tenant_id, s.product_id, s.lot_id, s.location_id
+  ), spread AS (
+    INSERT INTO core.stock_slots AS s (tenant_id, product_id, lot_id, warehouse_id, location_id, slot_no, qty)
+    SELECT i.tenant_id, i.product_id, i.lot_id, i.warehouse_id, i.location_id, g.n,
+           i.free / p_slots + (g.n < i.free % p_slots)::integer
+      FROM idle i
+      CROSS JOIN generate_series(0, p_slots - 1) AS g(n)
+    ON CONFLICT (tenant_id, product_id, lot_id, location_id, slot_no)
+    DO UPDATE SET qty = EXCLUDED.qty, updated_at = now()
+          WHERE s.qty IS DISTINCT FROM EXCLUDED.qty
+    RETURNING s.tenant_id, s.product_id, s.lot_id, s.location_id
+  )
+  SELECT count(*) INTO rebalanced_keys
+    FROM (SELECT tenant_id, product_id, lot_id, location_id FROM spread
+          UNION
+          SELECT tenant_id, product_id, lot_id, location_id FROM dropped) k;
+
+  RETURN NEXT;
+END$$;
+
+REVOKE ALL ON FUNCTION core.rebalance_stock_slots(integer, bigint) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.rebalance_stock_slots(integer, bigint) TO osl_app;
+
+COMMENT ON FUNCTION core.rebalance_stock_slots(integer, bigint)
+  IS 'Creates p_slots buckets for stocked lot/locations and spreads their free qty evenly; skips busy keys.';
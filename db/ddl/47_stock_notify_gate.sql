@@ -0,0 +1,24 @@
+SET search_path = core, public;
+
+-- Gate the change notifications of 14_stock_notify.sql on osl.availability_notify.
+-- Superseded: migration 0020 restores 14_stock_notify.sql, because writers that never set the
+-- setting (datagen, psql, other services) left the availability index stale.
+-- Only the availability index (AVAILABILITY_INDEX=1) listens on osl_stock_changed; without it
+-- every ledger insert and hold change paid for a pg_notify nobody reads. The triggers stay in
+-- place and return at once unless the writing session has the setting on. The app and the
+-- allocation workers turn it on for their own connections when the index is enabled; any other
+-- writer must do the same, or set it for the role once:
+--   ALTER ROLE osl_app SET osl.availability_notify = on;
+CREATE OR REPLACE FUNCTION core.notify_stock_changed()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF COALESCE(current_setting('osl.availability_notify', true), '') NOT IN ('on', 'true', '1') THEN
+    RETURN NULL;
+  END IF;
+  PERFORM pg_notify('osl_stock_changed', json_build_object('t', d.tenant_id, 'p', d.product_id)::text)
+     FROM (SELECT DISTINCT tenant_id, product_id FROM new_rows) d;
+  RETURN NULL;
+END$$;
+
+COMMENT ON FUNCTION core.notify_stock_changed()
+  IS 'NOTIFY osl_stock_changed {"t": tenant_id, "p": product_id} for ledger inserts and hold changes, when osl.availability_notify is on.';
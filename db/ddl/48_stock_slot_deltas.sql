@@ -0,0 +1,370 @@
+SET search_path = core, public;
+
+-- Stock slot deltas: slotted reservations stop writing dw.current_stock.
+-- With 46_stock_slots.sql alone every slotted RESERVE still upserted its key's single
+-- dw.current_stock row, so allocators of one hot lot/location queued on that row lock until each
+-- committed. Now a slotted RESERVE (and the RELEASE that gives its units back) carries the bucket
+-- in core.stock_ledger.slot_no, and the projection trigger adds its delta to that bucket's
+-- pending_qty instead. The allocator already holds that bucket row, so the reservation touches
+-- nothing another allocator needs. core.rebalance_stock_slots() folds pending_qty into
+-- dw.current_stock later, bucket by bucket, skipping busy rows.
+--
+--   * A slotted key's real free quantity is dw.current_stock.qty + sum(pending_qty); readers of
+--     the projection add it (db/queries/current_stock.sql, exports, waves, availability).
+--   * Buckets never promise more than that: sum(qty) <= cs.qty + sum(pending_qty). Slotted
+--     reservations and releases change a bucket's qty and pending_qty by the same amount, so only
+--     unslotted outflows (SHIP, ADJUST, an unslotted RESERVE) can break it. The guard below locks
+--     the key's buckets for those, rejects an unslotted RESERVE that overdraws, and re-spreads the
+--     budgets down to what is left. A slotted RESERVE is bounded by its bucket's CHECK (qty >= 0).
+ALTER TABLE core.stock_ledger ADD COLUMN IF NOT EXISTS slot_no smallint;
+COMMENT ON COLUMN core.stock_ledger.slot_no
+  IS 'Stock slot bucket of a slotted RESERVE/RELEASE; its delta is kept on the bucket until folded into dw.current_stock.';
+
+ALTER TABLE core.stock_slots ADD COLUMN IF NOT EXISTS pending_qty bigint NOT NULL DEFAULT 0;
+COMMENT ON COLUMN core.stock_slots.pending_qty
+  IS 'Net qty_delta of slotted ledger rows on this bucket not yet folded into dw.current_stock.';
+
+-- Slotted rows land on their bucket; everything else (and a slotted row whose bucket is gone)
+-- upserts dw.current_stock as before, in key order.
+CREATE OR REPLACE FUNCTION dw.apply_ledger_to_current_stock()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  WITH slotted AS (
+    SELECT tenant_id, product_id, lot_id, location_id, slot_no, SUM(qty_delta) AS qty
+      FROM new_rows
+     WHERE slot_no IS NOT NULL
+     GROUP BY tenant_id, product_id, lot_id, location_id, slot_no
+  ), pending AS (
+    UPDATE core.stock_slots s
+       SET pending_qty = s.pending_qty + d.qty
+      FROM slotted d
+     WHERE s.tenant_id = d.tenant_id
+       AND s.product_id = d.product_id
+       AND s.lot_id = d.lot_id
+       AND s.location_id = d.location_id
+       AND s.slot_no = d.slot_no
+    RETURNING s.tenant_id, s.product_id, s.lot_id, s.location_id, s.slot_no
+  )
+  INSERT INTO dw.current_stock AS cs
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+  SELECT n.tenant_id, n.product_id, n.warehouse_id, n.location_id, n.lot_id, SUM(n.qty_delta), now()
+    FROM new_rows n
+   WHERE n.slot_no IS NULL
+      OR NOT EXISTS (
+        SELECT 1 FROM pending p
+         WHERE p.tenant_id = n.tenant_id
+           AND p.product_id = n.product_id
+           AND p.lot_id = n.lot_id
+           AND p.location_id = n.location_id
+           AND p.slot_no = n.slot_no)
+   GROUP BY n.tenant_id, n.product_id, n.warehouse_id, n.location_id, n.lot_id
+   ORDER BY n.tenant_id, n.product_id, n.warehouse_id, n.location_id, n.lot_id
+  ON CONFLICT (tenant_id, product_id, warehouse_id, location_id, lot_id)
+  DO UPDATE SET qty = cs.qty + EXCLUDED.qty,
+                updated_at = EXCLUDED.updated_at;
+  RETURN NULL;
+END$$;
+
+-- Overdraft guard, now for unslotted outflows only. Runs after trg_stock_ledger_current_stock,
+-- so this transaction already holds the dw.current_stock rows it changed; locking the buckets
+-- (in key order) then waits out any slotted allocation in flight on them, and what it reads next
+-- is exact.
+CREATE OR REPLACE FUNCTION core.guard_stock_slot_overdraft()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  v_key record;
+BEGIN
+  PERFORM 1
+     FROM core.stock_slots s
+     JOIN (SELECT DISTINCT tenant_id, product_id, lot_id, location_id
+             FROM new_rows
+            WHERE slot_no IS NULL AND qty_delta < 0) r
+       ON r.tenant_id = s.tenant_id
+      AND r.product_id = s.product_id
+      AND r.lot_id = s.lot_id
+      AND r.location_id = s.location_id
+    ORDER BY s.tenant_id, s.product_id, s.lot_id, s.location_id, s.slot_no
+      FOR UPDATE OF s;
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  SELECT r.lot_id, r.location_id, cs.qty + p.pending AS free
+    INTO v_key
+    FROM (SELECT DISTINCT tenant_id, product_id, warehouse_id, location_id, lot_id
+            FROM new_rows
+           WHERE event_type = 'RESERVE' AND slot_no IS NULL) r
+    JOIN dw.current_stock cs
+      ON cs.tenant_id = r.tenant_id
+     AND cs.product_id = r.product_id
+     AND cs.warehouse_id = r.warehouse_id
+     AND cs.location_id = r.location_id
+     AND cs.lot_id = r.lot_id
+    CROSS JOIN LATERAL (
+      SELECT SUM(s.pending_qty) AS pending
+        FROM core.stock_slots s
+       WHERE s.tenant_id = r.tenant_id
+         AND s.product_id = r.product_id
+         AND s.lot_id = r.lot_id
+         AND s.location_id = r.location_id) p
+   WHERE cs.qty + p.pending < 0
+   LIMIT 1;
+  IF FOUND THEN
+    RAISE EXCEPTION 'reservation overdraws slotted lot % at location % by %',
+                    v_key.lot_id, v_key.location_id, -v_key.free
+      USING ERRCODE = 'serialization_failure';
+  END IF;
+
+  -- Budgets the outflow left uncovered are re-spread evenly over what is still free.
+  UPDATE core.stock_slots s
+     SET qty = b.free / b.n + (b.rn < b.free % b.n)::integer,
+         updated_at = now()
+    FROM (
+      SELECT x.tenant_id, x.product_id, x.lot_id, x.location_id, x.slot_no,
+             row_number() OVER w - 1 AS rn,
+             count(*) OVER w AS n,
+             sum(x.qty) OVER w AS budget,
+             GREATEST(COALESCE(cs.qty, 0) + sum(x.pending_qty) OVER w, 0) AS free
+        FROM core.stock_slots x
+        JOIN (SELECT DISTINCT tenant_id, product_id, lot_id, location_id
+                FROM new_rows
+               WHERE slot_no IS NULL AND qty_delta < 0) r
+          ON r.tenant_id = x.tenant_id
+         AND r.product_id = x.product_id
+         AND r.lot_id = x.lot_id
+         AND r.location_id = x.location_id
+        LEFT JOIN dw.current_stock cs
+          ON cs.tenant_id = x.tenant_id
+         AND cs.product_id = x.product_id
+         AND cs.warehouse_id = x.warehouse_id
+         AND cs.location_id = x.location_id
+         AND cs.lot_id = x.lot_id
+      WINDOW w AS (PARTITION BY x.tenant_id, x.product_id, x.lot_id, x.location_id ORDER BY x.slot_no
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+    ) b
+   WHERE b.budget > b.free
+     AND s.tenant_id = b.tenant_id
+     AND s.product_id = b.product_id
+     AND s.lot_id = b.lot_id
+     AND s.location_id = b.location_id
+     AND s.slot_no = b.slot_no;
+  RETURN NULL;
+END$$;
+
+-- Rebalance, now also folding deltas:
+--   0) every bucket with pending_qty whose bucket row and dw.current_stock row can both be locked
+--      right now moves it into dw.current_stock. SKIP LOCKED on both, so the run never waits on
+--      an allocator or a ledger writer.
+--   1) creation as before; the dw.current_stock row is locked too, so an outflow in flight on the
+--      key either finishes first or sees the new buckets and trims them.
+--   2) re-spread as before, from cs.qty + sum(pending_qty) as read from the locked rows, folding
+--      what is pending. A key is only re-spread when its dw.current_stock row is free as well.
+CREATE OR REPLACE FUNCTION core.rebalance_stock_slots(p_slots integer, p_min_qty bigint DEFAULT 1)
+RETURNS TABLE (created_keys bigint, rebalanced_keys bigint)
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  IF p_slots IS NULL OR p_slots < 1 OR p_slots > 1024 THEN
+    RAISE EXCEPTION 'p_slots must be between 1 and 1024, got %', p_slots USING ERRCODE = '22023';
+  END IF;
+  created_keys := 0;
+  rebalanced_keys := 0;
+  IF NOT pg_try_advisory_xact_lock(hashtext('core.rebalance_stock_slots')) THEN
+    RETURN NEXT;
+    RETURN;
+  END IF;
+
+  WITH due AS (
+    SELECT s.tenant_id, s.product_id, s.lot_id, s.warehouse_id, s.location_id, s.slot_no, s.pending_qty
+      FROM core.stock_slots s
+      JOIN dw.current_stock cs
+        ON cs.tenant_id = s.tenant_id
+       AND cs.product_id = s.product_id
+       AND cs.warehouse_id = s.warehouse_id
+       AND cs.location_id = s.location_id
+       AND cs.lot_id = s.lot_id
+     WHERE s.pending_qty <> 0
+       FOR UPDATE OF s, cs SKIP LOCKED
+  ), cleared AS (
+    UPDATE core.stock_slots s
+       SET pending_qty = 0
+      FROM due d
+     WHERE s.tenant_id = d.tenant_id
+       AND s.product_id = d.product_id
+       AND s.lot_id = d.lot_id
+       AND s.location_id = d.location_id
+       AND s.slot_no = d.slot_no
+    RETURNING 1
+  )
+  UPDATE dw.current_stock cs
+     SET qty = cs.qty + d.qty, updated_at = now()
+    FROM (SELECT tenant_id, product_id, lot_id, warehouse_id, location_id, SUM(pending_qty) AS qty
+            FROM due
+           GROUP BY tenant_id, product_id, lot_id, warehouse_id, location_id) d
+   WHERE cs.tenant_id = d.tenant_id
+     AND cs.product_id = d.product_id
+     AND cs.warehouse_id = d.warehouse_id
+     AND cs.location_id = d.location_id
+     AND cs.lot_id = d.lot_id;
+
+  WITH fresh AS (
+    SELECT cs.tenant_id, cs.product_id, cs.lot_id, cs.warehouse_id, cs.location_id, cs.qty
+      FROM dw.current_stock cs
+      JOIN core.lots l ON l.id = cs.lot_id AND l.is_active
+     WHERE cs.qty >= GREATEST(p_min_qty, 1)
+       AND cs.warehouse_id IS NOT NULL
+       AND cs.location_id IS NOT NULL
+       AND NOT EXISTS (
+         SELECT 1 FROM core.stock_slots s
+          WHERE s.tenant_id = cs.tenant_id
+            AND s.product_id = cs.product_id
+            AND s.lot_id = cs.lot_id
+            AND s.location_id = cs.location_id)
+     FOR UPDATE OF l, cs SKIP LOCKED
+  ), ins AS (
+    INSERT INTO core.stock_slots (tenant_id, product_id, lot_id, warehouse_id, location_id, slot_no, qty)
+    SELECT f.tenant_id, f.product_id, f.lot_id, f.warehouse_id, f.location_id, g.n,
+           f.qty / p_slots + (g.n < f.qty % p_slots)::integer
+      FROM fresh f
+      CROSS JOIN generate_series(0, p_slots - 1) AS g(n)
+    ON CONFLICT DO NOTHING
+    RETURNING tenant_id, product_id, lot_id, location_id
+  )
+  SELECT count(*) INTO created_keys
+    FROM (SELECT DISTINCT tenant_id, product_id, lot_id, location_id FROM ins) k;
+
+  WITH keys AS (
+    SELECT tenant_id, product_id, lot_id, warehouse_id, location_id, count(*) AS n,
+           sum(qty) AS budget, sum(pending_qty) AS pending, max(qty) - min(qty) AS skew,
+           max(slot_no) AS top_slot
+      FROM core.stock_slots
+     GROUP BY tenant_id, product_id, lot_id, warehouse_id, location_id
+  ), stale AS (
+    SELECT k.tenant_id, k.product_id, k.lot_id, k.warehouse_id, k.location_id, k.n
+      FROM keys k
+      LEFT JOIN dw.current_stock cs
+        ON cs.tenant_id = k.tenant_id
+       AND cs.product_id = k.product_id
+       AND cs.warehouse_id = k.warehouse_id
+       AND cs.location_id = k.location_id
+       AND cs.lot_id = k.lot_id
+     WHERE k.n <> p_slots
+        OR k.top_slot >= p_slots
+        OR k.skew > 1
+        OR k.budget <> GREATEST(COALESCE(cs.qty, 0) + k.pending, 0)
+  ), locked AS (
+    SELECT s.tenant_id, s.product_id, s.lot_id, s.location_id, s.pending_qty, cs.qty AS cs_qty
+      FROM core.stock_slots s
+      JOIN stale t
+        ON t.tenant_id = s.tenant_id
+       AND t.product_id = s.product_id
+       AND t.lot_id = s.lot_id
+       AND t.location_id = s.location_id
+      JOIN dw.current_stock cs
+        ON cs.tenant_id = s.tenant_id
+       AND cs.product_id = s.product_id
+       AND cs.warehouse_id = s.warehouse_id
+       AND cs.location_id = s.location_id
+       AND cs.lot_id = s.lot_id
+       FOR UPDATE OF s, cs SKIP LOCKED
+  ), idle AS (
+    SELECT t.tenant_id, t.product_id, t.lot_id, t.warehouse_id, t.location_id,
+           l.pending, GREATEST(l.cs_qty + l.pending, 0) AS free
+      FROM stale t
+      JOIN (SELECT tenant_id, product_id, lot_id, location_id, count(*) AS n,
+                   sum(pending_qty) AS pending, max(cs_qty) AS cs_qty
+              FROM locked
+             GROUP BY tenant_id, product_id, lot_id, location_id) l
+        ON l.tenant_id = t.tenant_id
+       AND l.product_id = t.product_id
+       AND l.lot_id = t.lot_id
+       AND l.location_id = t.location_id
+     WHERE l.n = t.n
+  ), folded AS (
+    UPDATE dw.current_stock cs
+       SET qty = cs.qty + i.pending, updated_at = now()
+      FROM idle i
+     WHERE i.pending <> 0
+       AND cs.tenant_id = i.tenant_id
+       AND cs.product_id = i.product_id
+       AND cs.warehouse_id = i.warehouse_id
+       AND cs.location_id = i.location_id
+       AND cs.lot_id = i.lot_id
+    RETURNING 1
+  ), dropped AS (
+    DELETE FROM core.stock_slots s
+     USING idle i
+     WHERE s.tenant_id = i.tenant_id
+       AND s.product_id = i.product_id
+       AND s.lot_id = i.lot_id
+       AND s.location_id = i.location_id
+       AND s.slot_no >= p_slots
+    RETURNING s.tenant_id, s.product_id, s.lot_id, s.location_id
+  ), spread AS (
+    INSERT INTO core.stock_slots AS s (tenant_id, product_id, lot_id, warehouse_id, location_id, slot_no, qty)
+    SELECT i.tenant_id, i.product_id, i.lot_id, i.warehouse_id, i.location_id, g.n,
+           i.free / p_slots + (g.n < i.free % p_slots)::integer
+      FROM idle i
+      CROSS JOIN generate_series(0, p_slots - 1) AS g(n)
+    ON CONFLICT (tenant_id, product_id, lot_id, location_id, slot_no)
+    DO UPDATE SET qty = EXCLUDED.qty, pending_qty = 0, updated_at = now()
+          WHERE s.qty IS DISTINCT FROM EXCLUDED.qty OR s.pending_qty <> 0
+    RETURNING s.tenant_id, s.product_id, s.lot_id, s.location_id
+  )
+  SELECT count(*) INTO rebalanced_keys
+    FROM (SELECT tenant_id, product_id, lot_id, location_id FROM spread
+          UNION
+          SELECT tenant_id, product_id, lot_id, location_id FROM dropped) k;
+
+  RETURN NEXT;
+END$$;
+
+-- Projection repair recomputes slotted deltas from the ledger too, so it clears pending_qty.
+-- core.stock_slots is locked before dw.current_stock so slotted allocators in flight finish first.
+CREATE OR REPLACE FUNCTION dw.rebuild_current_stock()
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE core.stock_slots IN EXCLUSIVE MODE;
+  LOCK TABLE dw.current_stock IN EXCLUSIVE MODE;
+  UPDATE core.stock_slots SET pending_qty = 0 WHERE pending_qty <> 0;
+  DELETE FROM dw.current_stock;
+  INSERT INTO dw.current_stock (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+  SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty)::bigint, now()
+    FROM core.stock_balance_rows
+   GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$;
+
+-- Budgets that ran ahead of real stock under the old guard are trimmed once here; from now on
+-- the guard keeps them covered.
+UPDATE core.stock_slots s
+   SET qty = b.free / b.n + (b.rn < b.free % b.n)::integer,
+       updated_at = now()
+  FROM (
+    SELECT x.tenant_id, x.product_id, x.lot_id, x.location_id, x.slot_no,
+           row_number() OVER w - 1 AS rn,
+           count(*) OVER w AS n,
+           sum(x.qty) OVER w AS budget,
+           GREATEST(COALESCE(cs.qty, 0), 0) AS free
+      FROM core.stock_slots x
+      LEFT JOIN dw.current_stock cs
+        ON cs.tenant_id = x.tenant_id
+       AND cs.product_id = x.product_id
+       AND cs.warehouse_id = x.warehouse_id
+       AND cs.location_id = x.location_id
+       AND cs.lot_id = x.lot_id
+    WINDOW w AS (PARTITION BY x.tenant_id, x.product_id, x.lot_id, x.location_id ORDER BY x.slot_no
+                 ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+  ) b
+ WHERE b.budget > b.free
+   AND s.tenant_id = b.tenant_id
+   AND s.product_id = b.product_id
+   AND s.lot_id = b.lot_id
+   AND s.location_id = b.location_id
+   AND s.slot_no = b.slot_no;
@@ -0,0 +1,13 @@
+SET search_path = core, public;
+
+-- Nearest-first candidate scan for product_search_keyset. GIN (12_indexes_core.sql) returns
+-- matches unordered, so the keyset query had to rank every match of a broad term on every page.
+-- GiST trigram indexes can return rows in word-similarity distance order (KNN, `<->>`), so the
+-- search reads the closest :candidates rows of one tenant and stops. tenant_id leads the index
+-- (btree_gist) so other tenants' products are never visited.
+CREATE INDEX IF NOT EXISTS ix_products_search_knn
+  ON core.products USING gist (tenant_id, lower(sku || ' ' || name) gist_trgm_ops)
+  WHERE is_active;
+
+COMMENT ON INDEX core.ix_products_search_knn
+  IS 'KNN candidate scan for keyset product search: active products of a tenant nearest to the term first.';
@@ -0,0 +1,169 @@
+SET search_path = dw, public;
+
+-- One rule for outbound units that find no open FIFO layer, in the trigger and in the rebuild:
+-- they are owed, and the next inbound rows of the key cover them first. 44_fifo_layers.sql let the
+-- trigger drop them while the rebuild netted all-time outbound against inbound, so SHIP 5 with no
+-- layers and then RECEIPT 10 left a 10-unit layer maintained but a 5-unit layer rebuilt.
+CREATE TABLE IF NOT EXISTS dw.stock_fifo_deficits (
+  tenant_id    uuid   NOT NULL,
+  product_id   uuid   NOT NULL,
+  warehouse_id uuid,
+  location_id  uuid,
+  lot_id       uuid,
+  qty          bigint NOT NULL CHECK (qty > 0)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uk_stock_fifo_deficits_key
+  ON dw.stock_fifo_deficits (tenant_id, product_id, warehouse_id, location_id, lot_id) NULLS NOT DISTINCT;
+
+COMMENT ON TABLE dw.stock_fifo_deficits
+  IS 'Outbound units per key that no FIFO layer covered yet; consumed by the key''s next inbound rows.';
+
+GRANT SELECT ON dw.stock_fifo_deficits TO osl_app;
+
+-- As in 44_fifo_layers.sql, with each touched key's deficit added to what it owes. A key with a
+-- deficit has no open layers, so the sum only ever meets the layers this statement pushed. What
+-- the layers cannot cover becomes the key's new deficit.
+CREATE OR REPLACE FUNCTION dw.apply_ledger_to_fifo_layers()
+RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  INSERT INTO dw.stock_fifo_layers
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, received_at, qty_in, qty_remaining,
+     unit_cost_cents)
+  SELECT n.tenant_id, n.product_id, n.warehouse_id, n.location_id, n.lot_id, n.ts, n.qty_delta, n.qty_delta,
+         p.price_cents
+    FROM new_rows n
+    JOIN core.products p ON p.id = n.product_id
+   WHERE n.event_type IN ('RECEIPT','ADJUST_IN') AND n.qty_delta > 0
+   ORDER BY n.ts, n.id;
+
+  WITH owed AS (
+    SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty) AS qty
+      FROM (
+        SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, -qty_delta AS qty
+          FROM new_rows
+         WHERE event_type IN ('SHIP','ADJUST_OUT') AND qty_delta < 0
+        UNION ALL
+        SELECT d.tenant_id, d.product_id, d.warehouse_id, d.location_id, d.lot_id, d.qty
+          FROM dw.stock_fifo_deficits d
+          JOIN (SELECT DISTINCT tenant_id, product_id, warehouse_id, location_id, lot_id
+                  FROM new_rows
+                 WHERE (event_type IN ('RECEIPT','ADJUST_IN') AND qty_delta > 0)
+                    OR (event_type IN ('SHIP','ADJUST_OUT') AND qty_delta < 0)) r
+            ON r.tenant_id = d.tenant_id AND r.product_id = d.product_id
+           AND r.warehouse_id IS NOT DISTINCT FROM d.warehouse_id
+           AND r.location_id IS NOT DISTINCT FROM d.location_id
+           AND r.lot_id IS NOT DISTINCT FROM d.lot_id
+      ) k
+     GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+  ), taken AS (
+    SELECT l.id, l.qty_remaining,
+           o.qty - (SUM(l.qty_remaining) OVER w - l.qty_remaining) AS take  -- left after older layers
+      FROM owed o
+      JOIN dw.stock_fifo_layers l
+        ON l.tenant_id = o.tenant_id AND l.product_id = o.product_id
+       AND l.warehouse_id IS NOT DISTINCT FROM o.warehouse_id
+       AND l.location_id IS NOT DISTINCT FROM o.location_id
+       AND l.lot_id IS NOT DISTINCT FROM o.lot_id
+    WINDOW w AS (PARTITION BY l.tenant_id, l.product_id, l.warehouse_id, l.location_id, l.lot_id
+                 ORDER BY l.received_at, l.id)
+  ), short AS (
+    SELECT o.tenant_id, o.product_id, o.warehouse_id, o.location_id, o.lot_id,
+           o.qty - COALESCE(SUM(l.qty_remaining), 0) AS qty
+      FROM owed o
+      LEFT JOIN dw.stock_fifo_layers l
+        ON l.tenant_id = o.tenant_id AND l.product_id = o.product_id
+       AND l.warehouse_id IS NOT DISTINCT FROM o.warehouse_id
+       AND l.location_id IS NOT DISTINCT FROM o.location_id
+       AND l.lot_id IS NOT DISTINCT FROM o.lot_id
+     GROUP BY o.tenant_id, o.product_id, o.warehouse_id, o.location_id, o.lot_id, o.qty
+  ), emptied AS (
+    DELETE FROM dw.stock_fifo_layers l
+     USING taken t
+     WHERE l.id = t.id AND t.take >= t.qty_remaining
+  ), consumed AS (
+    UPDATE dw.stock_fifo_layers l
+       SET qty_remaining = l.qty_remaining - t.take
+      FROM taken t
+     WHERE l.id = t.id AND t.take > 0 AND t.take < t.qty_remaining
+  ), settled AS (
+    DELETE FROM dw.stock_fifo_deficits d
+     USING short s
+     WHERE s.qty <= 0
+       AND d.tenant_id = s.tenant_id AND d.product_id = s.product_id
+       AND d.warehouse_id IS NOT DISTINCT FROM s.warehouse_id
+       AND d.location_id IS NOT DISTINCT FROM s.location_id
+       AND d.lot_id IS NOT DISTINCT FROM s.lot_id
+  )
+  INSERT INTO dw.stock_fifo_deficits AS d (tenant_id, product_id, warehouse_id, location_id, lot_id, qty)
+  SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, qty
+    FROM short
+   WHERE qty > 0
+  ON CONFLICT (tenant_id, product_id, warehouse_id, location_id, lot_id)
+  DO UPDATE SET qty = EXCLUDED.qty;
+  RETURN NULL;
+END$$;
+
+-- Same rule, set-based: each inbound row keeps what is left of it once the key's all-time
+-- outbound has consumed older inbound rows; outbound beyond all inbound is the key's deficit.
+CREATE OR REPLACE FUNCTION dw.rebuild_stock_fifo_layers()
+RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE dw.stock_fifo_layers IN EXCLUSIVE MODE;
+  LOCK TABLE dw.stock_fifo_deficits IN EXCLUSIVE MODE;
+  DELETE FROM dw.stock_fifo_layers;
+  DELETE FROM dw.stock_fifo_deficits;
+  WITH inbound AS (
+    SELECT sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id, sl.ts, sl.id,
+           sl.qty_delta::bigint AS qty,
+           SUM(sl.qty_delta::bigint) OVER (
+             PARTITION BY sl.tenant_id, sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id
+             ORDER BY sl.ts, sl.id
+           ) AS cum_in
+      FROM core.stock_ledger sl
+     WHERE sl.event_type IN ('RECEIPT','ADJUST_IN') AND sl.qty_delta > 0
+  ), outbound AS (
+    SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(-qty_delta)::bigint AS qty
+      FROM core.stock_ledger
+     WHERE event_type IN ('SHIP','ADJUST_OUT') AND qty_delta < 0
+     GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+  ), deficits AS (
+    INSERT INTO dw.stock_fifo_deficits (tenant_id, product_id, warehouse_id, location_id, lot_id, qty)
+    SELECT o.tenant_id, o.product_id, o.warehouse_id, o.location_id, o.lot_id, o.qty - COALESCE(i.qty, 0)
+      FROM outbound o
+      LEFT JOIN (SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty) AS qty
+                   FROM inbound
+                  GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id) i
+        ON i.tenant_id = o.tenant_id AND i.product_id = o.product_id
+       AND i.warehouse_id IS NOT DISTINCT FROM o.warehouse_id
+       AND i.location_id IS NOT DISTINCT FROM o.location_id
+       AND i.lot_id IS NOT DISTINCT FROM o.lot_id
+     WHERE o.qty > COALESCE(i.qty, 0)
+  )
+  INSERT INTO dw.stock_fifo_layers
+    (tenant_id, product_id, warehouse_id, location_id, lot_id, received_at, qty_in, qty_remaining,
+     unit_cost_cents)
+  SELECT i.tenant_id, i.product_id, i.warehouse_id, i.location_id, i.lot_id, i.ts, i.qty,
+         LEAST(i.qty, i.cum_in - COALESCE(o.qty, 0)), p.price_cents
+    FROM inbound i
+    JOIN core.products p ON p.id = i.product_id
+    LEFT JOIN outbound o
+      ON o.tenant_id = i.tenant_id AND o.product_id = i.product_id
+     AND o.warehouse_id IS NOT DISTINCT FROM i.warehouse_id
+     AND o.location_id IS NOT DISTINCT FROM i.location_id
+     AND o.lot_id IS NOT DISTINCT FROM i.lot_id
+   WHERE i.cum_in - COALESCE(o.qty, 0) > 0
+   ORDER BY i.ts, i.id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$;
+
+COMMENT ON FUNCTION dw.rebuild_stock_fifo_layers()
+  IS 'Recomputes dw.stock_fifo_layers and dw.stock_fifo_deficits from the full ledger. Normal writes maintain them via trigger.';
+
+-- Layers the trigger maintained under the old rule are brought in line with the new one.
+SELECT dw.rebuild_stock_fifo_layers();
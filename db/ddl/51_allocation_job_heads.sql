@@ -0,0 +1,54 @@
+SET search_path = core, public;
+
+-- Replaces the claim in 45_allocation_jobs.sql, which walked every active job in seq order and
+-- probed for an earlier active job of the same tenant on each: quadratic in a tenant's backlog.
+-- Only a tenant's oldest active job can ever be claimed, so the claim first collects those heads
+-- with a skip scan over ix_allocation_jobs_active_tenant (one index descent per tenant with
+-- active jobs) and then locks the oldest claimable head. A head that is running under a live
+-- lease blocks its tenant as before; SKIP LOCKED still lets concurrent workers pass over each
+-- other's candidates, and the lock rechecks the status so an already-claimed head is skipped.
+CREATE OR REPLACE FUNCTION core.claim_allocation_job(p_worker text, p_lease interval, p_max_attempts integer)
+RETURNS SETOF core.allocation_jobs LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp AS $$
+BEGIN
+  UPDATE core.allocation_jobs
+     SET status = 'failed', finished_at = now(), lease_expires_at = NULL,
+         error = format('worker lease expired after %s attempts', attempts)
+   WHERE status = 'running' AND lease_expires_at < now() AND attempts >= p_max_attempts;
+
+  RETURN QUERY
+  WITH RECURSIVE heads AS (
+    (SELECT a.tenant_id, a.seq
+       FROM core.allocation_jobs a
+      WHERE a.status IN ('queued','running')
+      ORDER BY a.tenant_id, a.seq
+      LIMIT 1)
+    UNION ALL
+    SELECT n.tenant_id, n.seq
+      FROM heads h
+      CROSS JOIN LATERAL (
+        SELECT a.tenant_id, a.seq
+          FROM core.allocation_jobs a
+         WHERE a.status IN ('queued','running') AND a.tenant_id > h.tenant_id
+         ORDER BY a.tenant_id, a.seq
+         LIMIT 1
+      ) n
+  ), next AS (
+    SELECT j.id
+      FROM heads h
+      JOIN core.allocation_jobs j ON j.seq = h.seq
+     WHERE j.status = 'queued' OR (j.status = 'running' AND j.lease_expires_at < now())
+     ORDER BY j.seq
+     LIMIT 1
+     FOR UPDATE OF j SKIP LOCKED
+  )
+  UPDATE core.allocation_jobs j
+     SET status = 'running', attempts = j.attempts + 1, worker = p_worker,
+         started_at = now(), lease_expires_at = now() + p_lease
+    FROM next
+   WHERE j.id = next.id
+  RETURNING j.*;
+END$$;
+
+REVOKE ALL ON FUNCTION core.claim_allocation_job(text, interval, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION core.claim_allocation_job(text, interval, integer) TO osl_app;
@@ -0,0 +1,28 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003_current_stock_projection"
+down_revision = "0002_fill_gaps"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Trigger-maintained dw.current_stock (replaces refresh-on-write of dw.current_stock_mv)
+    _run_sql("31_current_stock_projection.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_current_stock ON core.stock_ledger;")
+    op.execute("DROP FUNCTION IF EXISTS dw.apply_ledger_to_current_stock();")
+    op.execute("DROP FUNCTION IF EXISTS dw.rebuild_current_stock();")
+    op.execute("DROP TABLE IF EXISTS dw.current_stock;")
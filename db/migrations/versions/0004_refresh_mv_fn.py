@@ -0,0 +1,25 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004_refresh_mv_fn"
+down_revision = "0003_current_stock_projection"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Definer wrapper so the background refresher (running as osl_app) can REFRESH dw MVs
+    _run_sql("32_refresh_mv.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS dw.refresh_materialized_view(text, boolean);")
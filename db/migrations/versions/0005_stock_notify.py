@@ -0,0 +1,28 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_stock_notify"
+down_revision = "0004_refresh_mv_fn"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # NOTIFY on ledger inserts and hold changes (feeds the in-process availability index)
+    _run_sql("14_stock_notify.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_notify ON core.stock_ledger;")
+    op.execute("DROP TRIGGER IF EXISTS trg_holds_notify_ins ON core.holds;")
+    op.execute("DROP TRIGGER IF EXISTS trg_holds_notify_upd ON core.holds;")
+    op.execute("DROP FUNCTION IF EXISTS core.notify_stock_changed();")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_allocate_order_fn"
+down_revision = "0005_stock_notify"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # core.allocate_order(order_id, options): server-side allocation strategy
+    _run_sql("15_allocate_order_fn.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS core.allocate_order(uuid, jsonb);")
@@ -0,0 +1,52 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0007_stock_checkpoints"
+down_revision = "0006_allocate_order_fn"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Month-close balance checkpoints + core.stock_balance_rows (checkpoint + open ledger tail)
+    _run_sql("16_stock_checkpoints.sql")
+    # core.allocate_order() now reads on-hand from core.stock_balance_rows
+    _run_sql("15_allocate_order_fn.sql")
+    # Balance MVs rebuilt on top of the checkpoints
+    _run_sql("36_mv_checkpointed.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS dw.reorder_candidates_mv;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS dw.inventory_aging_mv;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS dw.product_abc_mv;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS dw.current_stock_mv;")
+    _run_sql("30_mv_current_stock.sql")
+    _run_sql("35_mv_analytics.sql")
+    _run_sql("31_current_stock_projection.sql")
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_closed_period ON core.stock_ledger;")
+    op.execute("DROP FUNCTION IF EXISTS core.reject_closed_period_writes();")
+    op.execute("DROP FUNCTION IF EXISTS core.close_stock_ledger_month(date);")
+    # Keep the view (core.allocate_order reads it) but over the plain ledger again
+    op.execute(
+        """
+        CREATE OR REPLACE VIEW core.stock_balance_rows WITH (security_invoker = true) AS
+        SELECT tenant_id, product_id, warehouse_id, location_id, lot_id,
+               qty_delta::bigint AS qty,
+               CASE WHEN event_type = 'SHIP' THEN -qty_delta ELSE 0 END::bigint AS shipped_qty,
+               CASE WHEN event_type IN ('RECEIPT','ADJUST_IN') THEN ts END AS first_in_at
+          FROM core.stock_ledger
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS core.stock_checkpoint_watermark();")
+    op.execute("DROP TABLE IF EXISTS core.stock_balance_checkpoints;")
+    op.execute("DROP TABLE IF EXISTS core.stock_ledger_closed_periods;")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0008_core_indexes"
+down_revision = "0007_stock_checkpoints"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    "ix_ledger_tenant_prod_lot",
+    "ix_ledger_tenant_prod_ts",
+    "ix_ledger_order",
+    "ix_holds_active_prod_lot",
+    "ix_holds_order",
+    "ix_holds_order_line",
+    "ix_order_lines_order",
+    "ix_orders_customer",
+    "ix_lots_active_fefo",
+    "ix_products_attrs_gin",
+    "ix_products_search_tsv",
+    "ix_products_name_trgm",
+)
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # 0001 ran 12_indexes_core.sql while it was still a placeholder; IF NOT EXISTS makes this a no-op
+    # on databases initialised after the index suite landed.
+    _run_sql("12_indexes_core.sql")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS core.{name};")
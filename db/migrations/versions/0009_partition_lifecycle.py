@@ -0,0 +1,34 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0009_partition_lifecycle"
+down_revision = "0008_core_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # DEFAULT partition, per-tenant granularity policy, create/list/retire helpers
+    _run_sql("41_partition_lifecycle.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS core.retire_stock_ledger_partition(text, boolean);")
+    op.execute("DROP FUNCTION IF EXISTS core.stock_ledger_default_months();")
+    op.execute("DROP FUNCTION IF EXISTS core.stock_ledger_partitions();")
+    op.execute("DROP FUNCTION IF EXISTS core.ensure_stock_ledger_partition(date);")
+    op.execute("DROP FUNCTION IF EXISTS core.create_stock_ledger_partition(date);")
+    op.execute("DROP TABLE IF EXISTS core.stock_ledger_partition_policy;")
+    # Rows still in DEFAULT are dropped with it; create their months first if they matter.
+    op.execute("DROP TABLE IF EXISTS core.stock_ledger_default;")
+    # The (id, ts, tenant_id) primary key is kept: narrowing it back would fail on per-tenant partitions.
+    _run_sql("40_partitions_stock_ledger.sql")
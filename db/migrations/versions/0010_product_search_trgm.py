@@ -0,0 +1,25 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0010_product_search_trgm"
+down_revision = "0009_partition_lifecycle"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Adds ix_products_sku_trgm; the other indexes in the file already exist (IF NOT EXISTS).
+    _run_sql("12_indexes_core.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS core.ix_products_sku_trgm;")
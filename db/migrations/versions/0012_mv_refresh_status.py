@@ -0,0 +1,27 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0012_mv_refresh_status"
+down_revision = "0011_ledger_export_index"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # dw.mv_refresh_status, MV dependency graph and the status recorder used by the refresh orchestrator
+    _run_sql("42_mv_refresh_status.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS dw.record_mv_refresh(text, timestamptz, double precision, boolean, text);")
+    op.execute("DROP FUNCTION IF EXISTS dw.materialized_view_graph();")
+    op.execute("DROP TABLE IF EXISTS dw.mv_refresh_status;")
@@ -0,0 +1,33 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0013_fact_daily_movements"
+down_revision = "0012_mv_refresh_status"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Daily movement rollup + loader; ABC and reorder MVs rebuilt on top of it (backfilled here)
+    _run_sql("43_fact_daily_movements.sql")
+
+
+def downgrade() -> None:
+    # 36 recreates every analytics MV from the ledger; 42 restores the matview-only graph/recorder.
+    _run_sql("36_mv_checkpointed.sql")
+    _run_sql("42_mv_refresh_status.sql")
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_daily_movements ON core.stock_ledger;")
+    op.execute("DROP FUNCTION IF EXISTS dw.mark_late_daily_movements();")
+    op.execute("DROP FUNCTION IF EXISTS dw.load_fact_daily_movements(interval);")
+    op.execute("DROP TABLE IF EXISTS dw.fact_daily_movements_dirty;")
+    op.execute("DROP TABLE IF EXISTS dw.fact_daily_movements_state;")
+    op.execute("DROP TABLE IF EXISTS dw.fact_daily_movements;")
@@ -0,0 +1,33 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_fifo_layers"
+down_revision = "0013_fact_daily_movements"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Trigger-maintained FIFO layers (backfilled from the ledger); aging MV rebuilt on top of them
+    _run_sql("44_fifo_layers.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_fifo_layers ON core.stock_ledger;")
+    op.execute("DROP FUNCTION IF EXISTS dw.apply_ledger_to_fifo_layers();")
+    op.execute("DROP FUNCTION IF EXISTS dw.rebuild_stock_fifo_layers();")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS dw.inventory_aging_mv;")
+    op.execute("DROP TABLE IF EXISTS dw.stock_fifo_layers;")
+    # 36 recreates every analytics MV from the ledger (aging by first receipt); 43 moves ABC and
+    # reorder back onto the daily rollup.
+    _run_sql("36_mv_checkpointed.sql")
+    _run_sql("43_fact_daily_movements.sql")
@@ -0,0 +1,26 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0015_allocation_jobs"
+down_revision = "0014_fifo_layers"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Queue behind the asynchronous allocate mode, claimed by the worker pool with SKIP LOCKED
+    _run_sql("45_allocation_jobs.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS core.claim_allocation_job(text, interval, integer);")
+    op.execute("DROP TABLE IF EXISTS core.allocation_jobs;")
@@ -0,0 +1,37 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0016_stock_slots"
+down_revision = "0015_allocation_jobs"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Lockable allocation buckets per hot lot/location, their rebalancer and the overdraft guard
+    _run_sql("46_stock_slots.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS core.rebalance_stock_slots(integer, bigint);")
+    op.execute("DROP TRIGGER IF EXISTS trg_stock_ledger_slot_guard ON core.stock_ledger;")
+    op.execute("DROP FUNCTION IF EXISTS core.guard_stock_slot_overdraft();")
+    op.execute("DROP TABLE IF EXISTS core.stock_slots;")
+    op.execute("ALTER TABLE core.holds DROP CONSTRAINT IF EXISTS holds_no_overlap;")
+    op.execute("ALTER TABLE core.holds DROP COLUMN IF EXISTS slot_no;")
+    op.execute("""
+        ALTER TABLE core.holds
+          ADD CONSTRAINT holds_no_overlap
+          EXCLUDE USING gist (
+            tenant_id WITH =, product_id WITH =, lot_id WITH =, location_id WITH =, valid_range WITH &&
+          ) DEFERRABLE INITIALLY IMMEDIATE;
+    """)
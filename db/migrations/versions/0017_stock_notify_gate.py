@@ -0,0 +1,26 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0017_stock_notify_gate"
+down_revision = "0016_stock_slots"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Stock change NOTIFYs only for sessions with osl.availability_notify on
+    _run_sql("47_stock_notify_gate.sql")
+
+
+def downgrade() -> None:
+    # Back to notifying on every ledger insert and hold change
+    _run_sql("14_stock_notify.sql")
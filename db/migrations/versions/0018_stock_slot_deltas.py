@@ -0,0 +1,75 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0018_stock_slot_deltas"
+down_revision = "0017_stock_notify_gate"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Slotted RESERVE/RELEASE deltas kept on their bucket, folded into dw.current_stock by the rebalancer
+    _run_sql("48_stock_slot_deltas.sql")
+
+
+def downgrade() -> None:
+    op.execute("""
+        UPDATE dw.current_stock cs
+           SET qty = cs.qty + p.qty, updated_at = now()
+          FROM (SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(pending_qty) AS qty
+                  FROM core.stock_slots
+                 GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id) p
+         WHERE p.qty <> 0
+           AND cs.tenant_id = p.tenant_id
+           AND cs.product_id = p.product_id
+           AND cs.warehouse_id = p.warehouse_id
+           AND cs.location_id = p.location_id
+           AND cs.lot_id = p.lot_id;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dw.apply_ledger_to_current_stock()
+        RETURNS trigger LANGUAGE plpgsql SECURITY DEFINER
+        SET search_path = pg_catalog, pg_temp AS $$
+        BEGIN
+          INSERT INTO dw.current_stock AS cs
+            (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+          SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty_delta), now()
+            FROM new_rows
+           GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id
+           ORDER BY tenant_id, product_id, warehouse_id, location_id, lot_id
+          ON CONFLICT (tenant_id, product_id, warehouse_id, location_id, lot_id)
+          DO UPDATE SET qty = cs.qty + EXCLUDED.qty,
+                        updated_at = EXCLUDED.updated_at;
+          RETURN NULL;
+        END$$;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dw.rebuild_current_stock()
+        RETURNS bigint LANGUAGE plpgsql SECURITY DEFINER
+        SET search_path = pg_catalog, pg_temp AS $$
+        DECLARE
+          n bigint;
+        BEGIN
+          LOCK TABLE dw.current_stock IN EXCLUSIVE MODE;
+          DELETE FROM dw.current_stock;
+          INSERT INTO dw.current_stock (tenant_id, product_id, warehouse_id, location_id, lot_id, qty, updated_at)
+          SELECT tenant_id, product_id, warehouse_id, location_id, lot_id, SUM(qty)::bigint, now()
+            FROM core.stock_balance_rows
+           GROUP BY tenant_id, product_id, warehouse_id, location_id, lot_id;
+          GET DIAGNOSTICS n = ROW_COUNT;
+          RETURN n;
+        END$$;
+    """)
+    op.execute("ALTER TABLE core.stock_slots DROP COLUMN IF EXISTS pending_qty;")
+    op.execute("ALTER TABLE core.stock_ledger DROP COLUMN IF EXISTS slot_no;")
+    # Previous guard and rebalancer
+    _run_sql("46_stock_slots.sql")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0019_product_search_knn"
+down_revision = "0018_stock_slot_deltas"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # GiST trigram index the keyset product search reads nearest-first
+    _run_sql("49_product_search_knn.sql")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS core.ix_products_search_knn;")
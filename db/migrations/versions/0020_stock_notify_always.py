@@ -0,0 +1,26 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0020_stock_notify_always"
+down_revision = "0019_product_search_knn"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Stock change NOTIFYs from every writer again: a session-setting gate left the availability
+    # index stale for writers that never set it (datagen, psql, other services)
+    _run_sql("14_stock_notify.sql")
+
+
+def downgrade() -> None:
+    _run_sql("47_stock_notify_gate.sql")
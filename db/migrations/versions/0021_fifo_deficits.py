@@ -0,0 +1,27 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0021_fifo_deficits"
+down_revision = "0020_stock_notify_always"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Outbound units without an open FIFO layer are owed to the next receipt, in trigger and rebuild
+    _run_sql("50_fifo_deficits.sql")
+
+
+def downgrade() -> None:
+    # Previous trigger and rebuild (also rebuilds the layers and the aging MV)
+    _run_sql("44_fifo_layers.sql")
+    op.execute("DROP TABLE IF EXISTS dw.stock_fifo_deficits;")
@@ -0,0 +1,26 @@
+from __future__ import annotations
+from pathlib import Path
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0022_allocation_job_heads"
+down_revision = "0021_fifo_deficits"
+branch_labels = None
+depends_on = None
+
+
+def _run_sql(rel_path: str) -> None:
+    base = Path(__file__).resolve().parents[2] / "ddl"
+    sql_path = base / rel_path
+    with open(sql_path, "r", encoding="utf-8") as f:
+        op.execute(f.read())
+
+
+def upgrade() -> None:
+    # Claim allocation jobs from the per-tenant heads instead of probing every active job
+    _run_sql("51_allocation_job_heads.sql")
+
+
+def downgrade() -> None:
+    # Previous claim function (the rest of 45 is idempotent)
+    _run_sql("45_allocation_jobs.sql")
@@ -9,7 +9,7 @@ WHERE ol.order_id = :order_id
 /*
 Deterministic candidate selection with row locking:
 1) Lock lots for this product in a stable order (expiry->lot_id).
-2) Compute on-hand (ledger sum) and subtract active holds.
+2) Compute on-hand (latest balance checkpoint + open ledger tail) and subtract active holds.
 3) Return rows with available_qty > 0 in a deterministic lock order:
    (warehouse_id â†’ lot_id â†’ location_id â†’ expiry_date)
 This ensures every worker acquires row locks in the same sequence,
@@ -35,8 +35,8 @@ CROSS JOIN LATERAL (
   SELECT
     sl.warehouse_id,
     sl.location_id,
-    COALESCE(SUM(sl.qty_delta),0) AS onhand
-  FROM core.stock_ledger sl
+    COALESCE(SUM(sl.qty),0) AS onhand
+  FROM core.stock_balance_rows sl
   WHERE sl.tenant_id = current_setting('app.tenant_id', true)::uuid
     AND sl.product_id = :product_id
     AND sl.lot_id = cl.lot_id
@@ -59,23 +59,46 @@ ORDER BY s.warehouse_id, cl.lot_id, s.location_id, cl.expiry_date NULLS LAST
 LIMIT :take_limit;
 
 -- name: release_active_holds
+-- Holds taken from a stock slot give their units back to that slot; slot_no is returned only
+-- for holds whose bucket still exists, so their RELEASE row is kept on it (48_stock_slot_deltas).
 WITH updated AS (
   UPDATE core.holds
      SET released_at = now()
    WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
      AND order_id = :order_id
      AND released_at IS NULL
-  RETURNING warehouse_id, location_id, product_id, lot_id, qty, order_line_id
+  RETURNING warehouse_id, location_id, product_id, lot_id, qty, order_line_id, slot_no
+), returned AS (
+  UPDATE core.stock_slots s
+     SET qty = s.qty + r.qty, updated_at = now()
+    FROM (
+      SELECT product_id, lot_id, location_id, slot_no, SUM(qty) AS qty
+        FROM updated
+       WHERE slot_no IS NOT NULL
+       GROUP BY product_id, lot_id, location_id, slot_no
+    ) r
+   WHERE s.tenant_id = current_setting('app.tenant_id', true)::uuid
+     AND s.product_id = r.product_id
+     AND s.lot_id = r.lot_id
+     AND s.location_id = r.location_id
+     AND s.slot_no = r.slot_no
+  RETURNING s.product_id, s.lot_id, s.location_id, s.slot_no
 )
-SELECT * FROM updated;
+SELECT u.warehouse_id, u.location_id, u.product_id, u.lot_id, u.qty, u.order_line_id, r.slot_no
+  FROM updated u
+  LEFT JOIN returned r
+    ON r.product_id = u.product_id
+   AND r.lot_id = u.lot_id
+   AND r.location_id = u.location_id
+   AND r.slot_no = u.slot_no;
 
 -- name: insert_ledger_release
 INSERT INTO core.stock_ledger
   (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
-   order_id, order_line_id, qty_delta, reason, op_id)
+   order_id, order_line_id, qty_delta, reason, op_id, slot_no)
 VALUES
   (current_setting('app.tenant_id')::uuid, now(), 'RELEASE',
-   :wh, :loc, :prod, :lot, :ord, :ol, :delta, :reason, :op_id);
+   :wh, :loc, :prod, :lot, :ord, :ol, :delta, :reason, :op_id, CAST(:slot_no AS smallint));
 
 -- name: mark_order_open
 UPDATE core.orders
@@ -94,10 +117,10 @@ VALUES
 -- name: insert_ledger_reserve
 INSERT INTO core.stock_ledger
   (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
-   order_id, order_line_id, qty_delta, reason, op_id)
+   order_id, order_line_id, qty_delta, reason, op_id, slot_no)
 VALUES
   (current_setting('app.tenant_id')::uuid, now(), 'RESERVE',
-   :wh, :loc, :prod, :lot, :ord, :ol, :delta, :reason, :op_id);
+   :wh, :loc, :prod, :lot, :ord, :ol, :delta, :reason, :op_id, CAST(:slot_no AS smallint));
 
 -- name: mark_order_allocated
 UPDATE core.orders
@@ -107,3 +130,246 @@ UPDATE core.orders
    AND status = 'open';
 
 
+
+-- name: wave_order_headers
+-- Unlocked read of wave orders, used only to rank them before chunking.
+SELECT o.id AS order_id, o.created_at, COALESCE(SUM(ol.qty), 0) AS total_qty
+FROM core.orders o
+LEFT JOIN core.order_lines ol ON ol.order_id = o.id
+WHERE o.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND o.id = ANY(CAST(:order_ids AS uuid[]))
+  AND o.status = 'open'
+GROUP BY o.id, o.created_at;
+
+-- name: wave_lock_orders
+-- Same per-order advisory lock as allocate_order, but try-only: busy orders are skipped, not waited on.
+SELECT w.order_id
+FROM unnest(CAST(:order_ids AS uuid[]), CAST(:lock_keys AS bigint[])) AS w(order_id, lock_key)
+JOIN core.orders o ON o.id = w.order_id
+WHERE o.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND o.status = 'open'
+  AND pg_try_advisory_xact_lock(w.lock_key);
+
+-- name: wave_order_lines
+SELECT ol.id AS order_line_id, ol.order_id, ol.product_id, ol.qty
+FROM core.order_lines ol
+WHERE ol.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND ol.order_id = ANY(CAST(:order_ids AS uuid[]))
+ORDER BY ol.order_id, ol.created_at, ol.id;
+
+-- name: wave_candidates
+/*
+One locking pass for every product in the wave chunk.
+Lots are locked in (product_id, expiry, lot_id) order with SKIP LOCKED, on-hand comes from the
+trigger-maintained dw.current_stock plus any stock slot deltas not folded into it yet, and
+lot/locations that already carry an active hold are left out because holds_no_overlap would
+reject a second hold there.
+*/
+WITH candidate_lots AS (
+  SELECT l.id AS lot_id, l.product_id, l.expiry_date
+  FROM core.lots l
+  WHERE l.tenant_id = current_setting('app.tenant_id', true)::uuid
+    AND l.product_id = ANY(CAST(:product_ids AS uuid[]))
+    AND l.is_active
+  ORDER BY l.product_id, l.expiry_date NULLS LAST, l.id
+  FOR UPDATE OF l SKIP LOCKED
+)
+SELECT
+  cl.product_id,
+  cl.lot_id,
+  cs.warehouse_id,
+  cs.location_id,
+  cs.qty + COALESCE(p.pending, 0) AS available_qty,
+  cl.expiry_date
+FROM candidate_lots cl
+JOIN dw.current_stock cs
+  ON cs.tenant_id = current_setting('app.tenant_id', true)::uuid
+ AND cs.product_id = cl.product_id
+ AND cs.lot_id = cl.lot_id
+LEFT JOIN LATERAL (
+  SELECT SUM(s.pending_qty) AS pending
+  FROM core.stock_slots s
+  WHERE s.tenant_id = cs.tenant_id
+    AND s.product_id = cs.product_id
+    AND s.lot_id = cs.lot_id
+    AND s.location_id = cs.location_id
+) p ON true
+WHERE cs.qty + COALESCE(p.pending, 0) > 0
+  AND cs.warehouse_id IS NOT NULL
+  AND cs.location_id IS NOT NULL
+  AND NOT EXISTS (
+    SELECT 1 FROM core.holds h
+     WHERE h.tenant_id = current_setting('app.tenant_id', true)::uuid
+       AND h.product_id = cl.product_id
+       AND h.lot_id = cl.lot_id
+       AND h.location_id = cs.location_id
+       AND h.released_at IS NULL
+  )
+ORDER BY cl.product_id, cs.warehouse_id, cl.lot_id, cs.location_id, cl.expiry_date NULLS LAST;
+
+-- name: wave_insert_holds_and_reserves
+-- All holds of a wave chunk plus their RESERVE ledger rows in one statement.
+WITH h AS (
+  SELECT *
+  FROM jsonb_to_recordset(CAST(:holds AS jsonb)) AS x(
+    id uuid, order_id uuid, order_line_id uuid, product_id uuid,
+    lot_id uuid, warehouse_id uuid, location_id uuid, qty integer
+  )
+), ins_holds AS (
+  INSERT INTO core.holds
+    (id, tenant_id, order_id, order_line_id, product_id, lot_id, warehouse_id, location_id, qty)
+  SELECT h.id, current_setting('app.tenant_id')::uuid, h.order_id, h.order_line_id,
+         h.product_id, h.lot_id, h.warehouse_id, h.location_id, h.qty
+    FROM h
+  RETURNING 1
+)
+INSERT INTO core.stock_ledger
+  (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
+   order_id, order_line_id, qty_delta, reason, op_id)
+SELECT current_setting('app.tenant_id')::uuid, now(), 'RESERVE',
+       h.warehouse_id, h.location_id, h.product_id, h.lot_id,
+       h.order_id, h.order_line_id, -h.qty, 'wave allocation reserve', gen_random_uuid()
+  FROM h;
+
+-- name: wave_mark_orders_allocated
+UPDATE core.orders
+   SET status = 'allocated'
+ WHERE id = ANY(CAST(:order_ids AS uuid[]))
+   AND tenant_id = current_setting('app.tenant_id')::uuid
+   AND status = 'open';
+
+-- name: availability_snapshot
+-- Unlocked per-product availability used to warm the in-process availability index.
+SELECT
+  cs.lot_id,
+  cs.warehouse_id,
+  cs.location_id,
+  cs.qty + COALESCE(p.pending, 0) - COALESCE(h.reserved, 0) AS available_qty,
+  l.expiry_date
+FROM dw.current_stock cs
+JOIN core.lots l ON l.id = cs.lot_id AND l.is_active
+LEFT JOIN LATERAL (
+  SELECT SUM(s.pending_qty) AS pending
+  FROM core.stock_slots s
+  WHERE s.tenant_id = cs.tenant_id
+    AND s.product_id = cs.product_id
+    AND s.lot_id = cs.lot_id
+    AND s.location_id = cs.location_id
+) p ON true
+LEFT JOIN LATERAL (
+  SELECT SUM(h.qty) AS reserved
+  FROM core.holds h
+  WHERE h.tenant_id = cs.tenant_id
+    AND h.product_id = cs.product_id
+    AND h.lot_id = cs.lot_id
+    AND h.warehouse_id = cs.warehouse_id
+    AND h.location_id = cs.location_id
+    AND h.released_at IS NULL
+) h ON true
+WHERE cs.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND cs.product_id = :product_id
+  AND cs.qty + COALESCE(p.pending, 0) - COALESCE(h.reserved, 0) > 0
+ORDER BY l.expiry_date NULLS LAST, cs.lot_id, cs.warehouse_id, cs.location_id;
+
+-- name: allocation_candidates_for_lots
+-- allocation_candidates restricted to lots the availability index reports as stocked.
+WITH candidate_lots AS (
+  SELECT l.id AS lot_id, l.expiry_date
+  FROM core.lots l
+  WHERE l.tenant_id = current_setting('app.tenant_id', true)::uuid
+    AND l.product_id = :product_id
+    AND l.id = ANY(CAST(:lot_ids AS uuid[]))
+    AND l.is_active
+  ORDER BY l.expiry_date NULLS LAST, l.id
+  FOR UPDATE OF l SKIP LOCKED
+)
+SELECT
+  cl.lot_id,
+  s.warehouse_id,
+  s.location_id,
+  GREATEST(0, s.onhand - COALESCE(h.reserved,0)) AS available_qty,
+  cl.expiry_date
+FROM candidate_lots cl
+CROSS JOIN LATERAL (
+  SELECT
+    sl.warehouse_id,
+    sl.location_id,
+    COALESCE(SUM(sl.qty),0) AS onhand
+  FROM core.stock_balance_rows sl
+  WHERE sl.tenant_id = current_setting('app.tenant_id', true)::uuid
+    AND sl.product_id = :product_id
+    AND sl.lot_id = cl.lot_id
+  GROUP BY sl.warehouse_id, sl.location_id
+) s
+LEFT JOIN LATERAL (
+  SELECT
+    h.warehouse_id,
+    h.location_id,
+    COALESCE(SUM(h.qty),0) AS reserved
+  FROM core.holds h
+  WHERE h.tenant_id = current_setting('app.tenant_id', true)::uuid
+    AND h.product_id = :product_id
+    AND h.lot_id = cl.lot_id
+    AND h.released_at IS NULL
+  GROUP BY h.warehouse_id, h.location_id
+) h ON h.warehouse_id = s.warehouse_id AND h.location_id = s.location_id
+WHERE GREATEST(0, s.onhand - COALESCE(h.reserved,0)) > 0
+ORDER BY s.warehouse_id, cl.lot_id, s.location_id, cl.expiry_date NULLS LAST
+LIMIT :take_limit;
+
+-- name: allocate_order_fn
+-- Server-side strategy: the whole allocation in one call (db/ddl/15_allocate_order_fn.sql).
+SELECT order_line_id, requested, allocated
+FROM core.allocate_order(:order_id, CAST(:options AS jsonb));
+
+-- name: allocation_slot_candidates
+/*
+Slotted counterpart of allocation_candidates (db/ddl/46_stock_slots.sql): lock stock slot
+buckets instead of lots. Buckets are taken in (expiry, lot, warehouse, location) order like
+lots are; within a lot/location each caller starts at bucket :slot_seed modulo that key's own
+bucket count and wraps around, so concurrent allocators of one hot lot lock different buckets
+first, whatever ALLOCATION_SLOTS was when the key was slotted. The allocator asks for one
+bucket at a time (:take_limit = 1) and only locks another when the first runs dry. SKIP LOCKED
+never waits, so bucket locks cannot deadlock.
+*/
+SELECT
+  s.lot_id,
+  s.warehouse_id,
+  s.location_id,
+  s.slot_no,
+  s.qty AS available_qty,
+  l.expiry_date
+FROM core.stock_slots s
+JOIN core.lots l ON l.id = s.lot_id AND l.is_active
+CROSS JOIN LATERAL (
+  SELECT max(x.slot_no) + 1 AS n
+  FROM core.stock_slots x
+  WHERE x.tenant_id = s.tenant_id
+    AND x.product_id = s.product_id
+    AND x.lot_id = s.lot_id
+    AND x.location_id = s.location_id
+) k
+WHERE s.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND s.product_id = :product_id
+  AND s.qty > 0
+ORDER BY l.expiry_date NULLS LAST, s.lot_id, s.warehouse_id, s.location_id,
+         (s.slot_no + k.n - CAST(:slot_seed AS bigint) % k.n) % k.n
+LIMIT :take_limit
+FOR UPDATE OF s SKIP LOCKED;
+
+-- name: take_from_slot
+-- The bucket row is already locked by allocation_slot_candidates; CHECK (qty >= 0) backs the budget.
+UPDATE core.stock_slots
+   SET qty = qty - CAST(:qty AS bigint), updated_at = now()
+ WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
+   AND product_id = :product_id
+   AND lot_id = :lot_id
+   AND location_id = :location_id
+   AND slot_no = CAST(:slot_no AS smallint);
+
+-- name: insert_slot_hold
+INSERT INTO core.holds
+  (id, tenant_id, order_id, order_line_id, product_id, lot_id, warehouse_id, location_id, qty, slot_no)
+VALUES
+  (:id, current_setting('app.tenant_id')::uuid, :order_id, :order_line_id,
+   :product_id, :lot_id, :warehouse_id, :location_id, :qty, CAST(:slot_no AS smallint));
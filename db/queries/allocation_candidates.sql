@@ -19,8 +19,8 @@ CROSS JOIN LATERAL (
   SELECT
     sl.warehouse_id,
     sl.location_id,
-    COALESCE(SUM(sl.qty_delta),0) AS onhand
-  FROM core.stock_ledger sl
+    COALESCE(SUM(sl.qty),0) AS onhand
+  FROM core.stock_balance_rows sl
   WHERE sl.tenant_id = current_setting('app.tenant_id', true)::uuid
     AND sl.product_id = :product_id
     AND sl.lot_id = cl.lot_id
@@ -0,0 +1,55 @@
+-- name: enqueue
+-- params: order_id(uuid), request_hint(jsonb text)
+-- No row back: the order is not visible to the tenant, or a job for it is already pending.
+INSERT INTO core.allocation_jobs (tenant_id, order_id, request_hint)
+SELECT o.tenant_id, o.id, CAST(:request_hint AS jsonb)
+  FROM core.orders o
+ WHERE o.id = CAST(:order_id AS uuid)
+ON CONFLICT (order_id) WHERE status IN ('queued','running') DO NOTHING
+RETURNING id;
+
+-- name: pending_for_order
+-- params: order_id(uuid)
+SELECT id
+  FROM core.allocation_jobs
+ WHERE order_id = CAST(:order_id AS uuid)
+   AND status IN ('queued','running');
+
+-- name: get
+-- params: job_id(uuid)
+SELECT id, order_id, status, attempts, result, error, created_at, started_at, finished_at,
+       (SELECT count(*) FROM core.allocation_jobs a
+         WHERE a.tenant_id = j.tenant_id AND a.seq < j.seq AND a.status IN ('queued','running')) AS ahead
+  FROM core.allocation_jobs j
+ WHERE id = CAST(:job_id AS uuid);
+
+-- name: claim
+-- params: worker(text), lease_s(float), max_attempts(int)
+SELECT id, tenant_id, order_id, request_hint, attempts
+  FROM core.claim_allocation_job(CAST(:worker AS text), make_interval(secs => CAST(:lease_s AS float8)),
+                                 CAST(:max_attempts AS int));
+
+-- name: renew
+-- params: job_id(uuid), worker(text), lease_s(float)
+-- Lease heartbeat while a claimed job runs; no row back once it was reclaimed or finished.
+UPDATE core.allocation_jobs
+   SET lease_expires_at = now() + make_interval(secs => CAST(:lease_s AS float8))
+ WHERE id = CAST(:job_id AS uuid)
+   AND worker = CAST(:worker AS text)
+   AND status = 'running'
+RETURNING id;
+
+-- name: order_status
+-- params: order_id(uuid)
+SELECT status FROM core.orders WHERE id = CAST(:order_id AS uuid);
+
+-- name: finish
+-- params: job_id(uuid), worker(text), status(text), result(jsonb text), error(text)
+-- Fenced on the worker: a job whose lease expired and was reclaimed elsewhere is left alone.
+UPDATE core.allocation_jobs
+   SET status = CAST(:status AS text), result = CAST(:result AS jsonb), error = CAST(:error AS text),
+       finished_at = now(), lease_expires_at = NULL
+ WHERE id = CAST(:job_id AS uuid)
+   AND worker = CAST(:worker AS text)
+   AND status = 'running'
+RETURNING id;
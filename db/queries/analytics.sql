@@ -0,0 +1,33 @@
+-- name: reorder_candidates
+-- params: only_needed(bool), limit(int)
+SELECT
+  product_id, on_hand, shipped_30, avg_daily_ship, reorder_point, needs_reorder
+FROM dw.reorder_candidates_mv
+WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND (NOT :only_needed OR needs_reorder)
+ORDER BY needs_reorder DESC, (reorder_point - on_hand) DESC, product_id
+LIMIT :limit;
+
+-- name: inventory_aging
+-- params: product_id(uuid), warehouse_id(uuid|null)
+-- Live FIFO layers of one product, per age bucket (no MV refresh involved).
+SELECT
+  CASE
+    WHEN age_days < 30 THEN '0-29'
+    WHEN age_days < 60 THEN '30-59'
+    WHEN age_days < 90 THEN '60-89'
+    ELSE '90+'
+  END AS age_bucket,
+  SUM(qty_remaining)::bigint AS qty,
+  SUM(qty_remaining * unit_cost_cents)::bigint AS value_cents,
+  MIN(received_at) AS oldest_received_at
+FROM (
+  SELECT qty_remaining, unit_cost_cents, received_at,
+         DATE_PART('day', now() - received_at)::int AS age_days
+    FROM dw.stock_fifo_layers
+   WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
+     AND product_id = CAST(:product_id AS uuid)
+     AND (CAST(:warehouse_id AS uuid) IS NULL OR warehouse_id = CAST(:warehouse_id AS uuid))
+) layers
+GROUP BY 1
+ORDER BY MIN(received_at);
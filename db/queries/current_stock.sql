@@ -1,8 +1,17 @@
 -- name: current_stock
 -- params: product_id(uuid)
+-- Slotted lot/locations add the stock slot deltas not folded into dw.current_stock yet.
 SELECT
-  product_id, warehouse_id, location_id, lot_id, qty
-FROM dw.current_stock_mv
-WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
-  AND product_id = :product_id
-ORDER BY warehouse_id, location_id, lot_id;
+  cs.product_id, cs.warehouse_id, cs.location_id, cs.lot_id, cs.qty + COALESCE(p.pending, 0) AS qty
+FROM dw.current_stock cs
+LEFT JOIN LATERAL (
+  SELECT SUM(s.pending_qty) AS pending
+  FROM core.stock_slots s
+  WHERE s.tenant_id = cs.tenant_id
+    AND s.product_id = cs.product_id
+    AND s.lot_id = cs.lot_id
+    AND s.location_id = cs.location_id
+) p ON true
+WHERE cs.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND cs.product_id = :product_id
+ORDER BY cs.warehouse_id, cs.location_id, cs.lot_id;
@@ -0,0 +1,109 @@
+-- name: closed_through
+-- params: since(timestamptz)
+-- The checkpoint watermark, when it lies after `since` (generated history would be rejected).
+SELECT to_char(w, 'YYYY-MM-DD')
+  FROM core.stock_checkpoint_watermark() w
+ WHERE w > CAST(:since AS timestamptz);
+
+-- name: upsert_tenant
+-- params: name(text)
+INSERT INTO core.tenants (id, name)
+VALUES (current_setting('app.tenant_id')::uuid, :name)
+ON CONFLICT DO NOTHING;
+
+-- name: seed_products
+-- params: seed(int), tenant_no(int), products(int)
+-- Ids are md5('seed:product:tenant:n') read as a uuid; backend/services/datagen.py derives the same.
+INSERT INTO core.products (id, tenant_id, sku, name, attributes, price_cents)
+SELECT md5(CAST(:seed AS text) || ':product:' || CAST(:tenant_no AS text) || ':' || p)::uuid,
+       current_setting('app.tenant_id')::uuid,
+       'DG-' || lpad(p::text, 7, '0'),
+       (ARRAY['Steel', 'Oak', 'Cotton', 'Copper', 'Granite', 'Nylon', 'Glass'])[1 + p % 7] || ' '
+         || (ARRAY['bracket', 'panel', 'spool', 'fitting', 'crate', 'hinge', 'valve', 'gasket'])[1 + (p / 7) % 8]
+         || ' ' || p,
+       jsonb_build_object('category', (ARRAY['hardware', 'timber', 'textile', 'electrical', 'stone'])[1 + p % 5]),
+       100 + abs(hashtext(CAST(:seed AS text) || ':price:' || CAST(:tenant_no AS text) || ':' || p)::bigint) % 20000
+  FROM generate_series(1, CAST(:products AS int)) p
+ON CONFLICT DO NOTHING;
+
+-- name: seed_warehouses
+-- params: seed(int), tenant_no(int), warehouses(int)
+INSERT INTO core.warehouses (id, tenant_id, code, name)
+SELECT md5(CAST(:seed AS text) || ':warehouse:' || CAST(:tenant_no AS text) || ':' || w)::uuid,
+       current_setting('app.tenant_id')::uuid, 'DGW' || w, 'Datagen warehouse ' || w
+  FROM generate_series(1, CAST(:warehouses AS int)) w
+ON CONFLICT DO NOTHING;
+
+-- name: seed_locations
+-- params: seed(int), tenant_no(int), warehouses(int), locations(int)
+INSERT INTO core.locations (id, tenant_id, warehouse_id, code, name)
+SELECT md5(CAST(:seed AS text) || ':location:' || CAST(:tenant_no AS text) || ':' || w || ':' || l)::uuid,
+       current_setting('app.tenant_id')::uuid,
+       md5(CAST(:seed AS text) || ':warehouse:' || CAST(:tenant_no AS text) || ':' || w)::uuid,
+       'L' || lpad(l::text, 4, '0'), 'Datagen location ' || l
+  FROM generate_series(1, CAST(:warehouses AS int)) w, generate_series(1, CAST(:locations AS int)) l
+ON CONFLICT DO NOTHING;
+
+-- name: seed_lots
+-- params: seed(int), tenant_no(int), month(date), product_nos(int[])
+-- One lot per product received in the month; shelf life is 60-659 days depending on the product.
+INSERT INTO core.lots (id, tenant_id, product_id, lot_number, expiry_date)
+SELECT md5(CAST(:seed AS text) || ':lot:' || CAST(:tenant_no AS text) || ':' || p || ':'
+           || to_char(CAST(:month AS date), 'YYYYMM'))::uuid,
+       current_setting('app.tenant_id')::uuid,
+       md5(CAST(:seed AS text) || ':product:' || CAST(:tenant_no AS text) || ':' || p)::uuid,
+       'L' || to_char(CAST(:month AS date), 'YYYYMM'),
+       CAST(:month AS date) + 60 + (p * 37) % 600
+  FROM unnest(CAST(:product_nos AS int[])) p
+ON CONFLICT DO NOTHING;
+
+-- name: create_ledger_stage
+-- Session-local COPY target; ts travels as epoch seconds so the generator never formats dates.
+CREATE TEMP TABLE IF NOT EXISTS datagen_ledger_stage (
+  event_type   text    NOT NULL,
+  warehouse_id uuid    NOT NULL,
+  location_id  uuid    NOT NULL,
+  product_id   uuid    NOT NULL,
+  lot_id       uuid    NOT NULL,
+  qty_delta    integer NOT NULL,
+  op_id        uuid    NOT NULL,
+  ts_epoch     bigint  NOT NULL
+) ON COMMIT DELETE ROWS;
+
+-- name: merge_ledger_stage
+-- COPY FROM cannot target a table with row security, so rows reach the ledger through this
+-- INSERT: RLS checks the tenant and the ledger triggers fire once per batch. Op ids are
+-- deterministic, so a re-run skips rows already loaded.
+WITH ins AS (
+  INSERT INTO core.stock_ledger
+    (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, reason, op_id)
+  SELECT current_setting('app.tenant_id')::uuid, to_timestamp(s.ts_epoch), s.event_type,
+         s.warehouse_id, s.location_id, s.product_id, s.lot_id, s.qty_delta, 'datagen', s.op_id
+    FROM pg_temp.datagen_ledger_stage s
+  ON CONFLICT DO NOTHING
+  RETURNING 1
+)
+SELECT count(*) FROM ins;
+
+-- name: insert_order
+-- params: id(uuid), external_ref(text), created_at(timestamptz)
+INSERT INTO core.orders (id, tenant_id, external_ref, status, created_at)
+VALUES (CAST(:id AS uuid), current_setting('app.tenant_id')::uuid, :external_ref, 'open',
+        CAST(:created_at AS timestamptz))
+ON CONFLICT DO NOTHING;
+
+-- name: insert_order_line
+-- params: id(uuid), order_id(uuid), product_id(uuid), qty(int), created_at(timestamptz)
+INSERT INTO core.order_lines (id, tenant_id, order_id, product_id, qty, created_at)
+VALUES (CAST(:id AS uuid), current_setting('app.tenant_id')::uuid, CAST(:order_id AS uuid),
+        CAST(:product_id AS uuid), CAST(:qty AS int), CAST(:created_at AS timestamptz))
+ON CONFLICT DO NOTHING;
+
+-- name: unheld_open_orders
+-- params: order_ids(uuid[])
+SELECT o.id
+  FROM core.orders o
+ WHERE o.id = ANY(CAST(:order_ids AS uuid[]))
+   AND o.status = 'open'
+   AND NOT EXISTS (SELECT 1 FROM core.holds h WHERE h.order_id = o.id)
+ ORDER BY o.created_at, o.id;
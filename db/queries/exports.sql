@@ -0,0 +1,39 @@
+-- name: ledger
+-- params: from_ts(timestamptz|null), to_ts(timestamptz|null), after_ts(timestamptz|null), after_id(uuid|null), limit(int|null)
+-- Streamed in (ts, id) order; a broken download resumes with after_ts/after_id of the last row received.
+-- Every bound is a plain comparison on the partition key, so only partitions in [from, to) (and
+-- at or after the resume point) are scanned; ix_ledger_tenant_ts_id supplies the order without a sort.
+SELECT
+  id, ts, event_type, product_id, warehouse_id, location_id, lot_id,
+  order_id, order_line_id, qty_delta, reason, op_id
+FROM core.stock_ledger
+WHERE tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND ts >= COALESCE(CAST(:from_ts AS timestamptz), '-infinity')
+  AND ts <  COALESCE(CAST(:to_ts AS timestamptz), 'infinity')
+  AND ts >= COALESCE(CAST(:after_ts AS timestamptz), '-infinity')
+  AND (CAST(:after_ts AS timestamptz) IS NULL
+       OR (ts, id) > (CAST(:after_ts AS timestamptz), CAST(:after_id AS uuid)))
+ORDER BY ts, id
+LIMIT :limit;
+
+-- name: current_stock
+-- params: from_product_id(uuid|null), limit(int|null)
+-- Streamed in uk_current_stock_proj_key order. Resume with from_product_id = the last product_id
+-- received (inclusive: that product's rows are sent again in full). Slotted lot/locations add
+-- the stock slot deltas not folded into dw.current_stock yet.
+SELECT
+  cs.product_id, cs.warehouse_id, cs.location_id, cs.lot_id, cs.qty + COALESCE(p.pending, 0) AS qty,
+  cs.updated_at
+FROM dw.current_stock cs
+LEFT JOIN LATERAL (
+  SELECT SUM(s.pending_qty) AS pending
+  FROM core.stock_slots s
+  WHERE s.tenant_id = cs.tenant_id
+    AND s.product_id = cs.product_id
+    AND s.lot_id = cs.lot_id
+    AND s.location_id = cs.location_id
+) p ON true
+WHERE cs.tenant_id = current_setting('app.tenant_id', true)::uuid
+  AND cs.product_id >= COALESCE(CAST(:from_product_id AS uuid), '00000000-0000-0000-0000-000000000000')
+ORDER BY cs.product_id, cs.warehouse_id, cs.location_id, cs.lot_id
+LIMIT :limit;
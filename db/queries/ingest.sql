@@ -0,0 +1,58 @@
+-- name: create_stage
+-- Session-local staging table, reused across requests on a pooled connection.
+CREATE TEMP TABLE IF NOT EXISTS stock_event_stage (
+  row_no        bigint  NOT NULL,
+  event_type    text    NOT NULL,
+  warehouse_id  uuid    NOT NULL,
+  location_id   uuid,
+  product_id    uuid    NOT NULL,
+  lot_id        uuid,
+  order_id      uuid,
+  order_line_id uuid,
+  qty_delta     integer NOT NULL,
+  reason        text,
+  op_id         uuid    NOT NULL,
+  ts            timestamptz
+) ON COMMIT DELETE ROWS;
+
+-- name: reject_unknown_refs
+-- References are checked under RLS, so another tenant's ids count as unknown.
+DELETE FROM pg_temp.stock_event_stage s
+ WHERE NOT EXISTS (SELECT 1 FROM core.products p WHERE p.id = s.product_id)
+    OR NOT EXISTS (SELECT 1 FROM core.warehouses w WHERE w.id = s.warehouse_id)
+    OR (s.location_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM core.locations l WHERE l.id = s.location_id))
+    OR (s.lot_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM core.lots l WHERE l.id = s.lot_id))
+    OR (s.order_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM core.orders o WHERE o.id = s.order_id))
+    OR (s.order_line_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM core.order_lines ol WHERE ol.id = s.order_line_id))
+RETURNING s.row_no;
+
+-- name: reject_closed_period
+-- Back-dated events into a month already folded into balance checkpoints (see 16_stock_checkpoints.sql).
+DELETE FROM pg_temp.stock_event_stage s
+ WHERE s.ts < (SELECT core.stock_checkpoint_watermark())
+RETURNING s.row_no;
+
+-- name: merge_stage_into_ledger
+-- op_id dedupe: first occurrence within the batch wins; op_ids already in the ledger are skipped.
+WITH fresh AS (
+  SELECT DISTINCT ON (s.op_id) s.*
+    FROM pg_temp.stock_event_stage s
+   WHERE NOT EXISTS (
+           SELECT 1 FROM core.stock_ledger l
+            WHERE l.tenant_id = current_setting('app.tenant_id')::uuid
+              AND l.op_id = s.op_id
+         )
+   ORDER BY s.op_id, s.row_no
+), ins AS (
+  INSERT INTO core.stock_ledger
+    (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
+     order_id, order_line_id, qty_delta, reason, op_id)
+  SELECT current_setting('app.tenant_id')::uuid, COALESCE(f.ts, now()), f.event_type,
+         f.warehouse_id, f.location_id, f.product_id, f.lot_id,
+         f.order_id, f.order_line_id, f.qty_delta, f.reason, f.op_id
+    FROM fresh f
+   ORDER BY f.row_no
+  ON CONFLICT DO NOTHING
+  RETURNING 1
+)
+SELECT count(*) FROM ins;
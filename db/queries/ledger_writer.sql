@@ -0,0 +1,60 @@
+-- name: insert_events
+-- One multi-row insert for a tenant's queued API events (app.tenant_id set by the caller).
+-- :events is a JSON array of normalized events tagged with their queue position `n`.
+-- Each input row comes back once, with the new ledger id or the reason it was rejected:
+--   duplicate      op_id already in the ledger, or repeated earlier in the same batch
+--   closed_period  ts before the checkpoint watermark (see 16_stock_checkpoints.sql)
+WITH batch AS (
+  SELECT e.*
+    FROM jsonb_to_recordset(CAST(:events AS jsonb)) AS e(
+           n integer, event_type text, warehouse_id uuid, location_id uuid, product_id uuid,
+           lot_id uuid, order_id uuid, order_line_id uuid, qty_delta integer, reason text,
+           op_id uuid, ts timestamptz)
+), checked AS (
+  SELECT b.*,
+         CASE
+           WHEN b.n <> min(b.n) OVER (PARTITION BY b.op_id) THEN 'duplicate'
+           WHEN EXISTS (
+                  SELECT 1 FROM core.stock_ledger l
+                   WHERE l.tenant_id = current_setting('app.tenant_id')::uuid
+                     AND l.op_id = b.op_id
+                ) THEN 'duplicate'
+           WHEN COALESCE(b.ts, now()) < (SELECT core.stock_checkpoint_watermark()) THEN 'closed_period'
+         END AS rejected
+    FROM batch b
+), ins AS (
+  INSERT INTO core.stock_ledger
+    (tenant_id, ts, event_type, warehouse_id, location_id, product_id, lot_id,
+     order_id, order_line_id, qty_delta, reason, op_id)
+  SELECT current_setting('app.tenant_id')::uuid, COALESCE(c.ts, now()), c.event_type,
+         c.warehouse_id, c.location_id, c.product_id, c.lot_id,
+         c.order_id, c.order_line_id, c.qty_delta, c.reason, c.op_id
+    FROM checked c
+   WHERE c.rejected IS NULL
+   ORDER BY c.n
+  RETURNING id, op_id
+)
+SELECT c.n, i.id, c.rejected
+  FROM checked c
+  LEFT JOIN ins i ON i.op_id = c.op_id AND c.rejected IS NULL
+ ORDER BY c.n;
+
+-- name: insert_event
+-- Single-event insert: the per-request path, and the writer's fallback when a batch fails.
+-- Duplicates are judged like insert_events: an op_id already in the ledger is rejected whatever
+-- its ts (uk_ledger_tenant_op includes ts, so a retry stamped now() would get past it), and no
+-- row comes back.
+INSERT INTO core.stock_ledger
+  (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id,
+   order_id, order_line_id, qty_delta, reason, op_id, ts)
+SELECT current_setting('app.tenant_id')::uuid, CAST(:event_type AS text),
+       CAST(:warehouse_id AS uuid), CAST(:location_id AS uuid), CAST(:product_id AS uuid),
+       CAST(:lot_id AS uuid), CAST(:order_id AS uuid), CAST(:order_line_id AS uuid),
+       CAST(:qty_delta AS integer), CAST(:reason AS text), CAST(:op_id AS uuid),
+       COALESCE(CAST(:ts AS timestamptz), now())
+ WHERE NOT EXISTS (
+         SELECT 1 FROM core.stock_ledger l
+          WHERE l.tenant_id = current_setting('app.tenant_id')::uuid
+            AND l.op_id = CAST(:op_id AS uuid)
+       )
+RETURNING id, ts, qty_delta;
@@ -0,0 +1,22 @@
+-- name: view_graph
+-- Every dw materialized view, the matviews it reads, and whether CONCURRENTLY is possible.
+SELECT view_name, depends_on, has_unique_index FROM dw.materialized_view_graph();
+
+-- name: refresh
+-- params: view(text), concurrently(bool)
+SELECT dw.refresh_materialized_view(:view, :concurrently);
+
+-- name: record
+-- params: view(text), started_at(timestamptz), duration_ms(float), concurrently(bool), error(text|null)
+SELECT dw.record_mv_refresh(:view, :started_at, :duration_ms, :concurrently, :error) AS row_count;
+
+-- name: status
+SELECT view_name, last_started_at, last_finished_at, last_duration_ms, last_concurrently, last_rows,
+       last_success_at, last_error, refreshes, failures
+FROM dw.mv_refresh_status
+ORDER BY view_name;
+
+-- name: load_daily_movements
+-- params: lookback_days(int)
+-- Incremental rollup load; runs before the views that read dw.fact_daily_movements.
+SELECT dw.load_fact_daily_movements(make_interval(days => :lookback_days)) AS rows_loaded;
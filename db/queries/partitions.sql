@@ -0,0 +1,13 @@
+-- name: create_partition
+SELECT core.create_stock_ledger_partition(:month);
+
+-- name: retire_partition
+SELECT core.retire_stock_ledger_partition(:partition, :drop);
+
+-- name: list_partitions
+SELECT partition_name, range_start, range_end, is_default, leaf_count, approx_rows, total_bytes, checkpointed
+  FROM core.stock_ledger_partitions();
+
+-- name: default_months
+SELECT month, row_count
+  FROM core.stock_ledger_default_months();
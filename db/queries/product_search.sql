@@ -1,5 +1,6 @@
 -- name: product_search
 -- params: q(text), like(text), limit(int), offset(int)
+-- Legacy offset pagination, kept for clients that still send `offset`.
 SELECT
   p.id, p.sku, p.name, p.description
 FROM core.products AS p
@@ -10,3 +11,40 @@ WHERE p.is_active
   )
 ORDER BY ts_rank(p.search_tsv, plainto_tsquery('english', :q)) DESC, p.id
 LIMIT :limit OFFSET :offset;
+
+-- name: product_search_keyset
+-- params: q(text), limit(int), candidates(int), after_rank(real, nullable), after_id(uuid, nullable)
+-- Only the :candidates active products nearest to the term are ranked: the GiST trigram index
+-- (49_product_search_knn.sql) hands them out in word-similarity distance order and the scan stops
+-- there, so a broad term ("a", a common SKU prefix) costs O(:candidates) per page, not
+-- O(matches). Candidates must be word-similar to the term (`%>`, pg_trgm.word_similarity_threshold),
+-- which covers SKU substrings and typos in the name. Those candidates are ranked by full-text
+-- rank or trigram similarity and paged by (rank DESC, id); the next page starts strictly after
+-- the last row's pair, within the same candidates. The legacy offset query still matches
+-- full-text-only terms beyond them.
+WITH candidates AS (
+  SELECT p.id, p.sku, p.name, p.description, p.search_tsv
+  FROM core.products AS p
+  WHERE p.tenant_id = current_setting('app.tenant_id', true)::uuid
+    AND p.is_active
+    AND lower(p.sku || ' ' || p.name) %> lower(:q)
+  ORDER BY lower(p.sku || ' ' || p.name) <->> lower(:q)
+  LIMIT :candidates
+), matches AS (
+  SELECT
+    c.id, c.sku, c.name, c.description,
+    GREATEST(
+      ts_rank(c.search_tsv, plainto_tsquery('english', :q)),
+      similarity(lower(c.sku), lower(:q)),
+      similarity(c.name, :q),
+      word_similarity(lower(:q), lower(c.sku || ' ' || c.name))
+    )::real AS rank
+  FROM candidates AS c
+)
+SELECT id, sku, name, description, rank
+FROM matches
+WHERE CAST(:after_rank AS real) IS NULL
+   OR rank < CAST(:after_rank AS real)
+   OR (rank = CAST(:after_rank AS real) AND id > CAST(:after_id AS uuid))
+ORDER BY rank DESC, id
+LIMIT :limit;
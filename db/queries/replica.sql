@@ -0,0 +1,15 @@
+-- name: replica_lag
+-- Seconds the server is behind its primary: 0 when fully replayed or not a standby at all.
+SELECT CASE
+         WHEN NOT pg_is_in_recovery() THEN 0
+         WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+         ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+       END::float8 AS lag_seconds;
+
+-- name: replayed_lsn
+-- Has this server applied WAL up to :lsn? (pg_current_wal_lsn() when it is not a standby)
+SELECT COALESCE(pg_last_wal_replay_lsn(), pg_current_wal_lsn()) >= CAST(:lsn AS pg_lsn) AS replayed;
+
+-- name: current_lsn
+-- Primary WAL position after a write; clients echo it back as X-Min-Lsn.
+SELECT pg_current_wal_lsn()::text AS lsn;
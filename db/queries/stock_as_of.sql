@@ -0,0 +1,37 @@
+-- name: stock_as_of
+-- params: ts(timestamptz), product_id(uuid|null), warehouse_id(uuid|null)
+-- On-hand per lot/location including every ledger row with ts <= :ts.
+-- Starts from the latest checkpoint set at or before :ts (core.close_stock_ledger_month) and adds the
+-- ledger rows between that checkpoint and :ts; both bounds are initplan values, so only the
+-- partitions in that window are scanned (run-time pruning). `checkpoint` is NULL when no month
+-- before :ts has been closed yet.
+WITH base AS (
+  SELECT COALESCE(max(period_end), '-infinity'::timestamptz) AS as_of
+    FROM core.stock_ledger_closed_periods
+   WHERE period_end <= CAST(:ts AS timestamptz)
+)
+SELECT b.product_id, b.warehouse_id, b.location_id, b.lot_id, SUM(b.qty)::bigint AS qty,
+       NULLIF((SELECT as_of FROM base), '-infinity') AS checkpoint
+FROM (
+  SELECT cp.product_id, cp.warehouse_id, cp.location_id, cp.lot_id, cp.qty
+    FROM core.stock_balance_checkpoints cp
+   WHERE cp.as_of = (SELECT as_of FROM base)
+     AND cp.tenant_id = current_setting('app.tenant_id', true)::uuid
+     AND (CAST(:product_id AS uuid) IS NULL OR cp.product_id = CAST(:product_id AS uuid))
+     AND (CAST(:warehouse_id AS uuid) IS NULL OR cp.warehouse_id = CAST(:warehouse_id AS uuid))
+  UNION ALL
+  SELECT sl.product_id, sl.warehouse_id, sl.location_id, sl.lot_id, sl.qty_delta::bigint
+    FROM core.stock_ledger sl
+   WHERE sl.ts >= (SELECT as_of FROM base)
+     AND sl.ts <= CAST(:ts AS timestamptz)
+     AND sl.tenant_id = current_setting('app.tenant_id', true)::uuid
+     AND (CAST(:product_id AS uuid) IS NULL OR sl.product_id = CAST(:product_id AS uuid))
+     AND (CAST(:warehouse_id AS uuid) IS NULL OR sl.warehouse_id = CAST(:warehouse_id AS uuid))
+) b
+GROUP BY b.product_id, b.warehouse_id, b.location_id, b.lot_id
+HAVING SUM(b.qty) <> 0
+ORDER BY b.product_id, b.warehouse_id, b.location_id, b.lot_id;
+
+-- name: watermark
+-- End of the last closed month (NULL when none): everything dated before it is immutable.
+SELECT max(period_end) AS watermark FROM core.stock_ledger_closed_periods;
@@ -0,0 +1,5 @@
+-- name: rebalance
+-- params: slots(int), min_qty(bigint)
+-- Across tenants (SECURITY DEFINER); see db/ddl/46_stock_slots.sql.
+SELECT created_keys, rebalanced_keys
+  FROM core.rebalance_stock_slots(CAST(:slots AS integer), CAST(:min_qty AS bigint));
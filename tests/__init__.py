@@ -52,3 +52,25 @@ def tenant_ids(engine_app: Engine):
         conn.execute(text("SET app.tenant_id = :t"), {"t": str(t2)})
         conn.execute(text("INSERT INTO core.tenants (id, name) VALUES (current_setting('app.tenant_id')::uuid, 'Tenant B')"))
     return (t1, t2)
+
+@pytest.fixture()
+def closed_ledger_month(pg_url: str):
+    """
+    Last month, with its partition in place, reopened after the test: the checkpoints and the
+    closed period the test adds are removed, so the watermark (and trg_stock_ledger_closed_period)
+    is back where it was for every later test.
+    """
+    import datetime as dt
+
+    last_month = (dt.date.today().replace(day=1) - dt.timedelta(days=1)).replace(day=1)
+    owner = create_engine(pg_url, future=True)
+    with owner.begin() as conn:
+        conn.execute(text("SELECT core.ensure_stock_ledger_partition(:m)"), {"m": last_month})
+        watermark = conn.execute(text("SELECT core.stock_checkpoint_watermark()")).scalar_one()
+    try:
+        yield last_month
+    finally:
+        with owner.begin() as conn:
+            conn.execute(text("DELETE FROM core.stock_balance_checkpoints WHERE as_of > :w"), {"w": watermark})
+            conn.execute(text("DELETE FROM core.stock_ledger_closed_periods WHERE period_end > :w"), {"w": watermark})
+        owner.dispose()
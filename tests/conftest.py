@@ -6,7 +6,7 @@ from urllib.parse import urlparse
 
 import pytest
 
-from tests.__init__ import pg_url, engine_app, tenant_ids  # re-export fixtures for pytest discovery
+from tests.__init__ import pg_url, engine_app, tenant_ids, closed_ledger_month  # re-export fixtures for pytest discovery
 
 
 @pytest.fixture()
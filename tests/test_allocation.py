@@ -3,6 +3,7 @@ import threading
 import uuid
 from sqlalchemy import text
 from backend.services.allocation import allocate_order
+from backend.services.metrics import ALLOCATION_ATTEMPTS, ALLOCATION_CANDIDATE_ROWS, metrics
 
 def setup_stock(c, tenant, product_id, warehouse_id, location_id, lot_id, qty):
     c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
@@ -40,6 +41,8 @@ def test_concurrent_allocators_no_double_book(engine_app, tenant_ids):
         o2 = create_order(c, t1, prod, 6)
 
     results = {}
+    attempts = metrics.value(ALLOCATION_ATTEMPTS, mode="order")
+    lines_seen = metrics.value(ALLOCATION_CANDIDATE_ROWS)
 
     def worker(order_id, key):
         res = allocate_order(engine_app, tenant_id=t1, order_id=order_id, request_hint={})
@@ -50,6 +53,10 @@ def test_concurrent_allocators_no_double_book(engine_app, tenant_ids):
     tA.start(); tB.start()
     tA.join(); tB.join()
 
+    # Counters written by the worker threads are visible after they exit
+    assert metrics.value(ALLOCATION_ATTEMPTS, mode="order") >= attempts + 2
+    assert metrics.value(ALLOCATION_CANDIDATE_ROWS) == lines_seen + 2
+
     a_alloc = results["a"]["lines"][0]["allocated"]
     b_alloc = results["b"]["lines"][0]["allocated"]
 
@@ -70,3 +77,127 @@ def test_concurrent_allocators_no_double_book(engine_app, tenant_ids):
         """), {"p": str(prod)}).scalar_one()
 
         assert holds_sum == reserves
+
+
+def test_plpgsql_strategy_matches_python_rules(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    wh = uuid.uuid4(); loc = uuid.uuid4(); lot = uuid.uuid4()
+
+    with engine_app.begin() as c:
+        setup_stock(c, t1, prod, wh, loc, lot, 10)
+    with engine_app.begin() as c:
+        o1 = create_order(c, t1, prod, 6)
+        o2 = create_order(c, t1, prod, 6)
+
+    first = allocate_order(engine_app, tenant_id=t1, order_id=o1, strategy="plpgsql")
+    assert [line["allocated"] for line in first["lines"]] == [6]
+
+    # The only lot/location now carries an active hold, so the second order gets nothing
+    second = allocate_order(engine_app, tenant_id=t1, order_id=o2, request_hint={"strategy": "plpgsql"})
+    assert [line["allocated"] for line in second["lines"]] == [0]
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        status = c.execute(text("SELECT status FROM core.orders WHERE id = :o"), {"o": str(o1)}).scalar_one()
+        reserved = c.execute(text("""
+            SELECT COALESCE(SUM(-qty_delta),0) FROM core.stock_ledger
+            WHERE event_type = 'RESERVE' AND order_id = :o
+        """), {"o": str(o1)}).scalar_one()
+        held = c.execute(text("""
+            SELECT COALESCE(SUM(qty),0) FROM core.holds WHERE order_id = :o AND released_at IS NULL
+        """), {"o": str(o1)}).scalar_one()
+    assert status == "allocated"
+    assert int(reserved) == int(held) == 6
+
+
+def test_allocation_wave_distributes_in_priority_order(engine_app, tenant_ids):
+    from backend.services.allocation_waves import allocate_wave
+
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    wh = uuid.uuid4(); loc = uuid.uuid4(); lot_a = uuid.uuid4(); lot_b = uuid.uuid4()
+
+    with engine_app.begin() as c:
+        setup_stock(c, t1, prod, wh, loc, lot_a, 5)
+        c.execute(text("INSERT INTO core.lots (id, tenant_id, product_id, lot_number) VALUES (:id, current_setting('app.tenant_id')::uuid, :p, 'LOT-B')"), {"id": str(lot_b), "p": str(prod)})
+        c.execute(text("""
+            INSERT INTO core.stock_ledger
+            (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+            VALUES (current_setting('app.tenant_id')::uuid, 'RECEIPT', :wh, :loc, :prod, :lot, 3, gen_random_uuid())
+        """), {"wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot_b)})
+
+    # Separate transactions so created_at (the fifo key) differs per order
+    orders = []
+    for _ in range(3):
+        with engine_app.begin() as c:
+            orders.append(create_order(c, t1, prod, 4))
+
+    res = allocate_wave(engine_app, tenant_id=t1, order_ids=list(reversed(orders)), priority="fifo")
+    by_order = {r["order_id"]: r for r in res["orders"]}
+
+    assert by_order[str(orders[0])]["status"] == "allocated"
+    assert by_order[str(orders[2])]["status"] == "unallocated"
+    assert res["stats"]["orders_processed"] == 3
+    assert 4 <= res["stats"]["units_allocated"] <= 8
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        holds_sum = c.execute(text("""
+            SELECT COALESCE(SUM(qty),0) FROM core.holds
+            WHERE tenant_id = current_setting('app.tenant_id')::uuid AND product_id = :p AND released_at IS NULL
+        """), {"p": str(prod)}).scalar_one()
+        reserves = c.execute(text("""
+            SELECT -COALESCE(SUM(qty_delta),0) FROM core.stock_ledger
+            WHERE tenant_id = current_setting('app.tenant_id')::uuid AND product_id = :p AND event_type='RESERVE'
+        """), {"p": str(prod)}).scalar_one()
+        assert holds_sum == reserves == res["stats"]["units_allocated"]
+
+
+def test_availability_index_invalidated_by_notify(engine_app, tenant_ids):
+    import time
+    from backend.services.allocation import SQL, _select_candidates
+    from backend.services.availability_index import AvailabilityIndex
+
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    wh = uuid.uuid4(); loc = uuid.uuid4(); lot = uuid.uuid4()
+    with engine_app.begin() as c:
+        setup_stock(c, t1, prod, wh, loc, lot, 4)
+
+    index = AvailabilityIndex(engine_app, SQL["availability_snapshot"], max_products=8)
+    index.start()
+    try:
+        for _ in range(50):
+            if index.stats()["listening"]:
+                break
+            time.sleep(0.1)
+
+        with engine_app.begin() as c:
+            c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+            rows = index.available(c, t1, prod)
+            assert [str(r["lot_id"]) for r in rows] == [str(lot)]
+            assert index.stats()["entries"] == 1
+            candidates = _select_candidates(c, prod, tenant_id=t1, index=index)
+            assert [int(r["available_qty"]) for r in candidates] == [4]
+
+        # A committed ledger insert for the product drops the cached entry, whatever the session
+        with engine_app.begin() as c:
+            c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+            c.execute(text("""
+                INSERT INTO core.stock_ledger
+                (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+                VALUES (current_setting('app.tenant_id')::uuid, 'SHIP', :wh, :loc, :prod, :lot, -4, gen_random_uuid())
+            """), {"wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot)})
+
+        for _ in range(50):
+            if index.stats()["entries"] == 0:
+                break
+            time.sleep(0.1)
+        assert index.stats()["entries"] == 0
+
+        with engine_app.begin() as c:
+            c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+            assert _select_candidates(c, prod, tenant_id=t1, index=index) == []
+    finally:
+        index.stop(timeout=5)
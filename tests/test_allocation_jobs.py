@@ -0,0 +1,175 @@
+from __future__ import annotations
+import uuid
+
+from sqlalchemy import text
+
+from backend.services.allocation import allocate_order
+from backend.services.allocation_jobs import AllocationWorkerPool, enqueue_allocation, get_allocation_job
+from tests.test_allocation import create_order, setup_stock
+
+
+def _stock(engine, tenant, qty):
+    prod = uuid.uuid4()
+    with engine.begin() as c:
+        setup_stock(c, tenant, prod, uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), qty)
+    return prod
+
+
+def _enqueue(engine, tenant, order_id):
+    with engine.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        return enqueue_allocation(c, order_id, {})
+
+
+def _job(engine, tenant, job_id):
+    with engine.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        return get_allocation_job(c, uuid.UUID(job_id))
+
+
+def test_jobs_run_one_at_a_time_per_tenant_in_submission_order(engine_app, tenant_ids):
+    t1, t2 = tenant_ids
+    p1, p2 = _stock(engine_app, t1, 10), _stock(engine_app, t2, 10)
+    with engine_app.begin() as c:
+        o1, o2 = create_order(c, t1, p1, 3), create_order(c, t1, p1, 3)
+        o3 = create_order(c, t2, p2, 3)
+    j1, j2, j3 = _enqueue(engine_app, t1, o1), _enqueue(engine_app, t1, o2), _enqueue(engine_app, t2, o3)
+    assert _enqueue(engine_app, t1, o2) == j2  # a pending job is returned, not duplicated
+    assert _job(engine_app, t1, j2)["ahead"] == 1
+    assert _job(engine_app, t2, j1) is None  # RLS: another tenant's job is invisible
+
+    pool = AllocationWorkerPool(engine_app, lease=60)
+    first, second = pool.claim("w1"), pool.claim("w2")
+    assert (str(first["id"]), str(second["id"])) == (j1, j3)  # t1's second job waits for its first
+    assert pool.claim("w3") is None
+
+    assert pool.process(first, "w1")["status"] == "done"
+    third = pool.claim("w3")
+    assert str(third["id"]) == j2
+    pool.process(third, "w3")
+    pool.process(second, "w2")
+    assert pool.claim("w4") is None
+
+    job = _job(engine_app, t1, j1)
+    assert job["status"] == "done" and job["attempts"] == 1 and job["ahead"] == 0
+    assert sum(line["allocated"] for line in job["result"]["lines"]) == 3
+    assert _job(engine_app, t1, j2)["result"]["lines"][0]["allocated"] == 3
+
+
+def test_reclaimed_job_does_not_allocate_twice(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod = _stock(engine_app, t1, 10)
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 4)
+    job_id = _enqueue(engine_app, t1, order)
+
+    pool = AllocationWorkerPool(engine_app, lease=0)
+    lost = pool.claim("lost-worker")
+    # The lost worker's allocation committed, but it died before recording the outcome
+    allocate_order(engine_app, tenant_id=t1, order_id=order, request_hint={})
+
+    again = pool.claim("w2")
+    assert str(again["id"]) == str(lost["id"]) == job_id and again["attempts"] == 2
+    assert pool.process(again, "w2")["result"]["recovered"] is True
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        held = c.execute(
+            text("SELECT COALESCE(SUM(qty), 0) FROM core.holds WHERE order_id = :o AND released_at IS NULL"),
+            {"o": str(order)},
+        ).scalar_one()
+    assert held == 4
+    assert _job(engine_app, t1, job_id)["status"] == "done"
+
+
+def test_async_allocate_endpoint_returns_pollable_job(api_client, engine_app, tenant_ids):
+    client, _ = api_client
+    t1, t2 = tenant_ids
+    prod = _stock(engine_app, t1, 10)
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 2)
+    headers = {"X-Tenant-Id": str(t1)}
+
+    resp = client.post(f"/api/orders/{order}/allocate?async=1", json={}, headers=headers)
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert job["status"] == "queued" and job["order_id"] == str(order)
+    assert resp.headers["Location"] == f"/api/allocation_jobs/{job['job_id']}"
+
+    resp = client.post(f"/api/orders/{order}/allocate", json={}, headers={**headers, "Prefer": "respond-async"})
+    assert resp.status_code == 202 and resp.get_json()["job_id"] == job["job_id"]
+    assert client.post(f"/api/orders/{uuid.uuid4()}/allocate?async=1", headers=headers).status_code == 404
+
+    pool = AllocationWorkerPool(engine_app)
+    while pool.run_once() is not None:
+        pass
+
+    body = client.get(f"/api/allocation_jobs/{job['job_id']}", headers=headers).get_json()
+    assert body["status"] == "done"
+    assert body["result"]["lines"][0]["allocated"] == 2
+    assert client.get(f"/api/allocation_jobs/{job['job_id']}", headers={"X-Tenant-Id": str(t2)}).status_code == 404
+    assert client.get("/api/allocation_jobs/not-a-uuid", headers=headers).status_code == 400
+
+
+def test_lease_is_extended_while_the_job_runs(engine_app, tenant_ids, monkeypatch):
+    import threading
+    import time
+
+    from backend.services import allocation_jobs
+
+    t1, _ = tenant_ids
+    prod = _stock(engine_app, t1, 10)
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 2)
+    _enqueue(engine_app, t1, order)
+
+    def slow_allocate(*args, **kwargs):
+        time.sleep(2.0)  # well past the lease
+        return allocate_order(*args, **kwargs)
+
+    monkeypatch.setattr(allocation_jobs, "allocate_order", slow_allocate)
+    pool = AllocationWorkerPool(engine_app, lease=0.6)
+    job = pool.claim("w1")
+    runner = threading.Thread(target=pool.process, args=(job, "w1"))
+    runner.start()
+    time.sleep(1.2)
+    assert pool.claim("w2") is None  # still leased to w1
+    runner.join()
+    assert pool.claim("w2") is None
+
+
+def test_reclaim_waits_for_the_allocation_in_flight(engine_app, tenant_ids):
+    import threading
+
+    from backend.services.allocation import _advisory_lock_order
+
+    t1, _ = tenant_ids
+    prod = _stock(engine_app, t1, 10)
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 4)
+    _enqueue(engine_app, t1, order)
+
+    pool = AllocationWorkerPool(engine_app, lease=0)
+    pool.claim("stuck-worker")
+    again = pool.claim("w2")
+    outcome = []
+    # The first worker is still allocating: it holds the order's advisory lock until it commits
+    with engine_app.connect() as busy:
+        with busy.begin():
+            busy.execute(text("SELECT set_config('app.tenant_id', :t, true)"), {"t": str(t1)})
+            _advisory_lock_order(busy, t1, order)
+            runner = threading.Thread(target=lambda: outcome.append(pool.process(again, "w2")))
+            runner.start()
+            runner.join(0.5)
+            assert runner.is_alive()  # waiting, not reading the order as still open
+            busy.execute(text("UPDATE core.orders SET status = 'allocated' WHERE id = :o"), {"o": str(order)})
+    runner.join()
+    assert outcome[0]["result"]["recovered"] is True
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        held = c.execute(
+            text("SELECT COALESCE(SUM(qty), 0) FROM core.holds WHERE order_id = :o AND released_at IS NULL"),
+            {"o": str(order)},
+        ).scalar_one()
+    assert held == 0  # the second worker allocated nothing
@@ -2,7 +2,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime, timedelta
 
-from sqlalchemy import text
+from sqlalchemy import create_engine, text
 
 
 def _insert_product_bundle(conn, tenant_id, product_id, sku, warehouse_id, location_id, lot_id, price_cents=1000):
@@ -105,7 +105,8 @@ def test_analytics_materialized_views(engine_app, tenant_ids):
         _insert_ledger(conn, tenant_id, "RECEIPT", prod_c, wh, loc, lot_c, 16, now - timedelta(days=10))
         _insert_ledger(conn, tenant_id, "SHIP", prod_c, wh, loc, lot_c, -15, now - timedelta(days=1))
 
-        # Refresh derived views
+        # Roll up the new (back-dated) movements, then refresh derived views
+        conn.execute(text("SELECT dw.load_fact_daily_movements()"))
         conn.execute(text("REFRESH MATERIALIZED VIEW dw.current_stock_mv"))
         conn.execute(text("REFRESH MATERIALIZED VIEW dw.product_abc_mv"))
         conn.execute(text("REFRESH MATERIALIZED VIEW dw.inventory_aging_mv"))
@@ -152,3 +153,125 @@ def test_analytics_materialized_views(engine_app, tenant_ids):
         assert reorder["on_hand"] == 1
         assert reorder["needs_reorder"] is True
         assert reorder["reorder_point"] >= 4
+
+
+def test_daily_movements_rollup_picks_up_late_events(engine_app, tenant_ids):
+    tenant_id, _ = tenant_ids
+    prod, wh, loc, lot = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    late = datetime.utcnow() - timedelta(days=12)
+
+    with engine_app.begin() as conn:
+        _insert_product_bundle(conn, tenant_id, prod, f"SKU-{prod.hex[:8]}", wh, loc, lot)
+        conn.execute(text("SELECT dw.load_fact_daily_movements()"))
+
+    # A back-dated event lands behind the watermark and marks its day for the next load
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        _insert_ledger(conn, tenant_id, "RECEIPT", prod, wh, loc, lot, 7, late)
+    with engine_app.connect() as conn:
+        dirty = conn.execute(text("SELECT day FROM dw.fact_daily_movements_dirty")).scalars().all()
+    assert late.date() in dirty
+
+    with engine_app.begin() as conn:
+        conn.execute(text("SELECT dw.load_fact_daily_movements()"))
+        row = conn.execute(
+            text(
+                """
+                SELECT day, receipt_qty, events
+                  FROM dw.fact_daily_movements
+                 WHERE tenant_id = :t AND product_id = :prod
+                """
+            ),
+            {"t": str(tenant_id), "prod": str(prod)},
+        ).mappings().one()
+        dirty = conn.execute(text("SELECT count(*) FROM dw.fact_daily_movements_dirty")).scalar_one()
+    assert (row["day"], row["receipt_qty"], row["events"]) == (late.date(), 7, 1)
+    assert dirty == 0
+
+
+def test_fifo_layers_consume_oldest_receipts_first(engine_app, tenant_ids):
+    tenant_id, _ = tenant_ids
+    prod, wh, loc, lot = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    now = datetime.utcnow()
+
+    with engine_app.begin() as conn:
+        _insert_product_bundle(conn, tenant_id, prod, f"SKU-{prod.hex[:8]}", wh, loc, lot, price_cents=250)
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        for days in (100, 40, 5):
+            _insert_ledger(conn, tenant_id, "RECEIPT", prod, wh, loc, lot, 10, now - timedelta(days=days))
+    # Separate statements: the ship consumes the 100-day layer and half of the 40-day one
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        _insert_ledger(conn, tenant_id, "SHIP", prod, wh, loc, lot, -15, now - timedelta(days=1))
+
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        layers = conn.execute(
+            text(
+                """
+                SELECT qty_in, qty_remaining, unit_cost_cents
+                  FROM dw.stock_fifo_layers
+                 WHERE tenant_id = :t AND product_id = :prod
+                 ORDER BY received_at
+                """
+            ),
+            {"t": str(tenant_id), "prod": str(prod)},
+        ).all()
+        assert [tuple(layer) for layer in layers] == [(10, 5, 250), (10, 10, 250)]
+
+        conn.execute(text("REFRESH MATERIALIZED VIEW dw.inventory_aging_mv"))
+        buckets = conn.execute(
+            text(
+                """
+                SELECT age_bucket, qty, value_cents
+                  FROM dw.inventory_aging_mv
+                 WHERE tenant_id = current_setting('app.tenant_id')::uuid AND product_id = :prod
+                """
+            ),
+            {"prod": str(prod)},
+        ).all()
+    assert {b.age_bucket: (b.qty, b.value_cents) for b in buckets} == {"30-59": (5, 1250), "0-29": (10, 2500)}
+
+
+def test_fifo_layers_match_a_rebuild_when_shipping_before_receiving(pg_url, engine_app, tenant_ids):
+    tenant_id, _ = tenant_ids
+    prod, wh, loc, lot = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    now = datetime.utcnow()
+    key = {"t": str(tenant_id), "prod": str(prod)}
+    layers_sql = text(
+        """
+        SELECT qty_in, qty_remaining
+          FROM dw.stock_fifo_layers
+         WHERE tenant_id = :t AND product_id = :prod
+         ORDER BY received_at, id
+        """
+    )
+    deficits_sql = text("SELECT qty FROM dw.stock_fifo_deficits WHERE tenant_id = :t AND product_id = :prod")
+
+    with engine_app.begin() as conn:
+        _insert_product_bundle(conn, tenant_id, prod, f"SKU-{prod.hex[:8]}", wh, loc, lot)
+        _insert_ledger(conn, tenant_id, "SHIP", prod, wh, loc, lot, -5, now - timedelta(days=2))
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        assert conn.execute(layers_sql, key).all() == []
+        assert conn.execute(deficits_sql, key).scalars().all() == [5]
+    # The receipt covers the 5 units owed first, as the rebuild nets them against it
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        _insert_ledger(conn, tenant_id, "RECEIPT", prod, wh, loc, lot, 10, now - timedelta(days=1))
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        maintained = [tuple(r) for r in conn.execute(layers_sql, key).all()]
+        assert maintained == [(10, 5)]
+        assert conn.execute(deficits_sql, key).scalars().all() == []
+
+    owner = create_engine(pg_url, future=True)
+    try:
+        with owner.connect() as conn:
+            with conn.begin() as tx:
+                conn.execute(text("SELECT dw.rebuild_stock_fifo_layers()"))
+                assert [tuple(r) for r in conn.execute(layers_sql, key).all()] == maintained
+                assert conn.execute(deficits_sql, key).scalars().all() == []
+                tx.rollback()
+    finally:
+        owner.dispose()
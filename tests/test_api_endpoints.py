@@ -2,6 +2,7 @@ from __future__ import annotations
 import uuid
 
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 
 
 def _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-API"):
@@ -48,7 +49,7 @@ def _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lo
     )
 
 
-def test_inventory_event_endpoint_refreshes_mv(api_client, engine_app, tenant_ids):
+def test_inventory_event_endpoint_updates_current_stock(api_client, engine_app, tenant_ids):
     client, _ = api_client
     token = "test-token"
     tenant_id, _ = tenant_ids
@@ -80,7 +81,7 @@ def test_inventory_event_endpoint_refreshes_mv(api_client, engine_app, tenant_id
         qty = conn.execute(
             text(
                 """
-                SELECT qty FROM dw.current_stock_mv
+                SELECT qty FROM dw.current_stock
                  WHERE tenant_id = current_setting('app.tenant_id')::uuid
                    AND product_id = :prod AND warehouse_id = :wh AND location_id = :loc AND lot_id = :lot
                 """
@@ -108,7 +109,7 @@ def test_inventory_event_endpoint_refreshes_mv(api_client, engine_app, tenant_id
         qty = conn.execute(
             text(
                 """
-                SELECT qty FROM dw.current_stock_mv
+                SELECT qty FROM dw.current_stock
                  WHERE tenant_id = current_setting('app.tenant_id')::uuid
                    AND product_id = :prod AND warehouse_id = :wh AND location_id = :loc AND lot_id = :lot
                 """
@@ -117,6 +118,14 @@ def test_inventory_event_endpoint_refreshes_mv(api_client, engine_app, tenant_id
         ).scalar_one()
         assert qty == 6
 
+    # The same events drive the FIFO layers behind the aging/valuation lookup
+    resp = client.get("/api/inventory_aging", query_string={"product_id": str(product_id)}, headers=headers)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert (body["qty"], body["value_cents"]) == (6, 6 * 1250)
+    assert [item["age_bucket"] for item in body["items"]] == ["0-29"]
+    assert client.get("/api/inventory_aging", headers=headers).status_code == 400
+
 
 def test_product_api_triggers_scd(api_client, engine_app, tenant_ids):
     client, _ = api_client
@@ -208,3 +217,301 @@ def test_customer_api_updates_dim(api_client, engine_app, tenant_ids):
     assert len(rows) == 2
     assert rows[0][0] == "Blue Crate" and rows[0][1] is False
     assert rows[1][0] == "Blue Crate Intl" and rows[1][1] is True
+
+
+def test_reorder_candidates_reports_data_age(api_client, engine_app, tenant_ids):
+    client, app_module = api_client
+    tenant_id, _ = tenant_ids
+    product_id = uuid.uuid4()
+    warehouse_id = uuid.uuid4()
+    location_id = uuid.uuid4()
+    lot_id = uuid.uuid4()
+
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-REORDER")
+
+    headers = {"X-Tenant-Id": str(tenant_id), "X-Api-Token": "test-token"}
+    resp = client.post(
+        "/api/stock_events",
+        json={
+            "event_type": "RECEIPT",
+            "warehouse_id": str(warehouse_id),
+            "location_id": str(location_id),
+            "product_id": str(product_id),
+            "lot_id": str(lot_id),
+            "qty": 3,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 201
+
+    # Synchronous refresh instead of waiting for the debounced worker
+    app_module.mv_refresher.refresh_now()
+
+    resp = client.get("/api/reorder_candidates", headers=headers)
+    assert resp.status_code == 200
+    assert float(resp.headers["X-Data-Age"]) >= 0
+    items = {item["product_id"]: item for item in resp.get_json()["items"]}
+    assert items[str(product_id)]["on_hand"] == 3
+
+
+def test_bulk_stock_events_dedupes_and_rejects(api_client, engine_app, tenant_ids):
+    import json
+
+    client, _ = api_client
+    tenant_id, _ = tenant_ids
+    product_id = uuid.uuid4()
+    warehouse_id = uuid.uuid4()
+    location_id = uuid.uuid4()
+    lot_id = uuid.uuid4()
+
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-BULK")
+
+    base = {
+        "warehouse_id": str(warehouse_id),
+        "location_id": str(location_id),
+        "product_id": str(product_id),
+        "lot_id": str(lot_id),
+    }
+    repeated_op = str(uuid.uuid4())
+    lines = [
+        {**base, "event_type": "RECEIPT", "qty": 10, "op_id": repeated_op},
+        {**base, "event_type": "RECEIPT", "qty": 10, "op_id": repeated_op},  # duplicate within batch
+        {**base, "event_type": "SHIP", "qty": 3},
+        {**base, "event_type": "SHIP", "qty": 0},  # rejected: qty must be positive
+        {**base, "event_type": "RECEIPT", "qty": 1, "product_id": str(uuid.uuid4())},  # rejected: unknown product
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot-json\n"
+    headers = {"X-Tenant-Id": str(tenant_id), "X-Api-Token": "test-token"}
+
+    resp = client.post("/api/stock_events/bulk", data=body, content_type="application/x-ndjson", headers=headers)
+    assert resp.status_code == 200
+    summary = resp.get_json()
+    assert summary["received"] == 6
+    assert summary["accepted"] == 2
+    assert summary["duplicates"] == 1
+    assert summary["rejected"] == 3
+    assert [e["row"] for e in summary["errors"]] == [4, 5, 6]
+
+    # Re-sending the same op_id in a later batch is a duplicate, not a second receipt
+    csv_body = "event_type,qty,warehouse_id,location_id,product_id,lot_id,op_id\n" + (
+        f"RECEIPT,10,{warehouse_id},{location_id},{product_id},{lot_id},{repeated_op}\n"
+    )
+    resp = client.post("/api/stock_events/bulk", data=csv_body, content_type="text/csv", headers=headers)
+    assert resp.get_json()["duplicates"] == 1
+
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        qty = conn.execute(
+            text(
+                """
+                SELECT qty FROM dw.current_stock
+                 WHERE tenant_id = current_setting('app.tenant_id')::uuid
+                   AND product_id = :prod AND warehouse_id = :wh AND location_id = :loc AND lot_id = :lot
+                """
+            ),
+            {"prod": str(product_id), "wh": str(warehouse_id), "loc": str(location_id), "lot": str(lot_id)},
+        ).scalar_one()
+        assert qty == 7
+
+
+def test_db_connection_is_checked_out_lazily(api_client, tenant_ids):
+    client, app_module = api_client
+    tenant_id, _ = tenant_ids
+
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    assert "Server-Timing" not in resp.headers
+    assert resp.get_json()["pool"]["checked_out"] == 0
+
+    resp = client.get(
+        "/api/current_stock",
+        query_string={"product_id": str(uuid.uuid4())},
+        headers={"X-Tenant-Id": str(tenant_id)},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["Server-Timing"].startswith("db-wait;dur=")
+    assert app_module.engine.pool.checkedout() == 0  # returned at teardown
+
+    with app_module.engine.connect() as conn:
+        name = conn.execute(text("SELECT current_setting('application_name')")).scalar_one()
+    assert name == app_module.DB_APPLICATION_NAME
+
+
+def test_metrics_endpoint_exposes_latency_and_pool(api_client, tenant_ids):
+    client, _ = api_client
+    tenant_id, _ = tenant_ids
+
+    resp = client.get(
+        "/api/current_stock",
+        query_string={"product_id": str(uuid.uuid4())},
+        headers={"X-Tenant-Id": str(tenant_id)},
+    )
+    assert resp.status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    body = resp.get_data(as_text=True)
+    assert "# TYPE osl_http_request_duration_seconds histogram" in body
+    assert 'osl_http_request_duration_seconds_count{method="GET",route="/api/current_stock",status="200"}' in body
+    assert 'osl_db_pool_checked_out{pool="primary"} 0' in body
+    assert body.count("# TYPE osl_db_pool_checked_out gauge") == 1  # one collector per module, however often imported
+    assert "osl_db_pool_wait_seconds_count" in body
+    assert 'osl_sql_statement_calls_total{statement="current_stock.current_stock"}' in body
+
+
+def test_product_search_keyset_pages_and_fuzzy_match(api_client, engine_app, tenant_ids):
+    client, _ = api_client
+    tenant_id, _ = tenant_ids
+    headers = {"X-Tenant-Id": str(tenant_id)}
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        conn.execute(text("""
+            INSERT INTO core.products (tenant_id, sku, name)
+            SELECT current_setting('app.tenant_id')::uuid, 'KSET-' || lpad(g::text, 3, '0'), 'Keyset widget ' || g
+              FROM generate_series(1, 25) g
+        """))
+
+    seen: list[str] = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"q": "kset", "limit": "10", **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/products", query_string=params, headers=headers).get_json()
+        seen += [item["id"] for item in body["items"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 25
+
+    # Trigram match on the name survives a typo that full-text search would miss.
+    body = client.get("/api/products", query_string={"q": "keyset widgte"}, headers=headers).get_json()
+    assert body["items"]
+
+    # Legacy offset pagination still works.
+    body = client.get("/api/products", query_string={"q": "kset", "limit": "5", "offset": "20"}, headers=headers).get_json()
+    assert len(body["items"]) == 5 and "next_cursor" not in body
+
+    assert client.get("/api/products", query_string={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+
+
+def test_get_requests_route_to_replica_with_read_your_writes(pg_url, monkeypatch, request, tenant_ids):
+    # A second engine on the same server stands in for the replica: routing, lag and LSN checks
+    # behave as on a standby that is fully caught up.
+    from urllib.parse import urlparse
+
+    parsed = urlparse(pg_url)
+    replica_url = f"postgresql+psycopg://osl_app:osl_app@{parsed.hostname}:{parsed.port}/{parsed.path.lstrip('/')}"
+    monkeypatch.setenv("REPLICA_DATABASE_URL", replica_url)
+    client, app_module = request.getfixturevalue("api_client")
+    tenant_id, _ = tenant_ids
+    headers = {"X-Tenant-Id": str(tenant_id)}
+    query = {"product_id": str(uuid.uuid4())}
+
+    resp = client.get("/api/current_stock", query_string=query, headers=headers)
+    assert resp.status_code == 200 and resp.headers["X-Db-Route"] == "replica"
+
+    resp = client.post(
+        "/api/warehouses",
+        json={"code": f"WH-{uuid.uuid4().hex[:6]}", "name": "Replica test"},
+        headers={**headers, "X-Api-Token": "test-token"},
+    )
+    assert resp.status_code == 201 and resp.headers["X-Db-Route"] == "primary"
+    write_lsn = resp.headers["X-Write-Lsn"]
+
+    resp = client.get("/api/current_stock", query_string=query, headers={**headers, "X-Min-Lsn": write_lsn})
+    assert resp.headers["X-Db-Route"] == "replica"
+    resp = client.get("/api/current_stock", query_string=query, headers={**headers, "X-Min-Lsn": "FFFFFFFF/FFFFFFFF"})
+    assert resp.headers["X-Db-Route"] == "primary"
+    resp = client.get("/api/current_stock", query_string=query, headers={**headers, "X-Read-Primary": "1"})
+    assert resp.headers["X-Db-Route"] == "primary"
+
+    monkeypatch.setattr(app_module.replica_router, "max_lag", -1.0)  # every replica now "lags"
+    resp = client.get("/api/current_stock", query_string=query, headers=headers)
+    assert resp.status_code == 200 and resp.headers["X-Db-Route"] == "primary"
+
+    def lsn_unavailable(conn):
+        raise DBAPIError("SELECT pg_current_wal_lsn()", {}, Exception("connection lost"))
+
+    monkeypatch.setattr(app_module, "current_lsn", lsn_unavailable)
+    resp = client.post(
+        "/api/warehouses",
+        json={"code": f"WH-{uuid.uuid4().hex[:6]}", "name": "Replica test"},
+        headers={**headers, "X-Api-Token": "test-token"},
+    )
+    assert resp.status_code == 201 and "X-Write-Lsn" not in resp.headers
+
+
+def test_exports_stream_ledger_and_stock_with_resume(api_client, engine_app, tenant_ids):
+    import csv
+    import io
+    import json
+
+    client, app_module = api_client
+    tenant_id, _ = tenant_ids
+    product_id = uuid.uuid4()
+    warehouse_id = uuid.uuid4()
+    location_id = uuid.uuid4()
+    lot_id = uuid.uuid4()
+
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-EXPORT")
+        started = conn.execute(text("SELECT now()")).scalar_one()
+
+    headers = {"X-Tenant-Id": str(tenant_id), "X-Api-Token": "test-token"}
+    base = {
+        "warehouse_id": str(warehouse_id),
+        "location_id": str(location_id),
+        "product_id": str(product_id),
+        "lot_id": str(lot_id),
+    }
+    for event_type, qty in (("RECEIPT", 10), ("SHIP", 2), ("SHIP", 3)):
+        resp = client.post("/api/stock_events", json={**base, "event_type": event_type, "qty": qty}, headers=headers)
+        assert resp.status_code == 201
+
+    window = {"from": started.isoformat()}
+    resp = client.get("/api/exports/ledger", query_string=window, headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    ours = [r for r in rows if r["product_id"] == str(product_id)]
+    assert [r["qty_delta"] for r in ours] == [10, -2, -3]
+    assert [(r["ts"], r["id"]) for r in rows] == sorted((r["ts"], r["id"]) for r in rows)
+
+    # Resume after the first row: the rest of the stream, nothing repeated
+    first = rows[0]
+    resp = client.get(
+        "/api/exports/ledger",
+        query_string={**window, "after_ts": first["ts"], "after_id": first["id"]},
+        headers=headers,
+    )
+    resumed = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert resumed == rows[1:]
+
+    resp = client.get("/api/exports/ledger", query_string={**window, "format": "csv"}, headers=headers)
+    assert resp.mimetype == "text/csv"
+    records = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [int(r["qty_delta"]) for r in records if r["product_id"] == str(product_id)] == [10, -2, -3]
+
+    resp = client.get(
+        "/api/exports/current_stock",
+        query_string={"from_product_id": str(product_id), "limit": 1},
+        headers={**headers, "Accept": "text/csv"},
+    )
+    records = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [(r["product_id"], int(r["qty"])) for r in records] == [(str(product_id), 5)]
+
+    # A body that is never iterated (HEAD) still returns its connection to the pool
+    resp = client.head("/api/exports/ledger", query_string=window, headers=headers)
+    assert resp.status_code == 200
+    resp.close()
+    assert app_module.engine.pool.checkedout() == 0
+
+    resp = client.get("/api/exports/ledger", query_string={"after_ts": first["ts"]}, headers=headers)
+    assert resp.status_code == 400
+    resp = client.get("/api/exports/current_stock", query_string={"format": "xml"}, headers=headers)
+    assert resp.status_code == 400
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import asyncio
+import importlib
+import json
+import sys
+import uuid
+
+from sqlalchemy import text
+
+from tests.test_api_endpoints import _insert_core_refs
+
+
+async def _asgi_get(app, path: str, query: str, tenant_id) -> tuple[int, dict]:
+    sent: list[dict] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [(b"x-tenant-id", str(tenant_id).encode())],
+        },
+        receive,
+        send,
+    )
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return sent[0]["status"], json.loads(body)
+
+
+def _asgi_get_all(app, requests: list[tuple[str, str, object]]) -> list[tuple[int, dict]]:
+    """Run every request within one pool lifetime: a closed AsyncConnectionPool cannot be reopened."""
+    async def call():
+        await app.pool.open(wait=True)
+        try:
+            return [await _asgi_get(app, path, query, tenant_id) for path, query, tenant_id in requests]
+        finally:
+            await app.pool.close()
+
+    return asyncio.run(call())
+
+
+def test_async_read_path_matches_flask(api_client, engine_app, tenant_ids):
+    client, _ = api_client
+    sys.modules.pop("backend.asgi", None)
+    asgi = importlib.import_module("backend.asgi")
+    tenant_id, other_tenant = tenant_ids
+    product_id, warehouse_id, location_id, lot_id = (uuid.uuid4() for _ in range(4))
+
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-ASGI")
+        conn.execute(text("""
+            INSERT INTO core.stock_ledger
+              (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+            VALUES (current_setting('app.tenant_id')::uuid, 'RECEIPT', :wh, :loc, :prod, :lot, 7, gen_random_uuid())
+        """), {"wh": str(warehouse_id), "loc": str(location_id), "prod": str(product_id), "lot": str(lot_id)})
+
+    query = f"product_id={product_id}"
+    stock, other, products, missing = _asgi_get_all(asgi.app, [
+        ("/api/current_stock", query, tenant_id),
+        ("/api/current_stock", query, other_tenant),
+        ("/api/products", "q=sku-asgi", tenant_id),
+        ("/api/current_stock", "", tenant_id),
+    ])
+
+    status, body = stock
+    flask_resp = client.get(f"/api/current_stock?{query}", headers={"X-Tenant-Id": str(tenant_id)})
+    assert status == 200
+    assert body == flask_resp.get_json()
+    assert [row["qty"] for row in body["items"]] == [7]
+
+    # RLS: another tenant sees nothing
+    status, body = other
+    assert status == 200 and body == {"items": []}
+
+    status, body = products
+    flask_resp = client.get("/api/products?q=sku-asgi", headers={"X-Tenant-Id": str(tenant_id)})
+    assert status == 200
+    assert body == flask_resp.get_json()
+
+    status, body = missing
+    assert status == 400 and body == {"error": "product_id required"}
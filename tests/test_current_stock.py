@@ -42,3 +42,154 @@ def test_current_stock_matches_mv(engine_app, tenant_ids):
         """), {"p": str(prod), "lot": str(lot), "wh": str(wh), "loc": str(loc)}).scalar_one()
 
         assert mv == sum_ledger == 9
+
+
+def test_current_stock_projection_tracks_ledger_without_refresh(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    wh = uuid.uuid4()
+    loc = uuid.uuid4()
+    lot = uuid.uuid4()
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(text("INSERT INTO core.products (id, tenant_id, sku, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'SKU-PROJ', 'Thing')"), {"id": str(prod)})
+        c.execute(text("INSERT INTO core.warehouses (id, tenant_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'W-PROJ','W')"), {"id": str(wh)})
+        c.execute(text("INSERT INTO core.locations (id, tenant_id, warehouse_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, :wh, 'L-PROJ','L')"), {"id": str(loc), "wh": str(wh)})
+        c.execute(text("INSERT INTO core.lots (id, tenant_id, product_id, lot_number) VALUES (:id, current_setting('app.tenant_id')::uuid, :p, 'LOT-PROJ')"), {"id": str(lot), "p": str(prod)})
+
+        # One multi-row statement (aggregated by the statement trigger) plus single-row inserts
+        c.execute(text("""
+            INSERT INTO core.stock_ledger
+            (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+            SELECT current_setting('app.tenant_id')::uuid, 'RECEIPT', :wh, :loc, :prod, :lot, 5, gen_random_uuid()
+              FROM generate_series(1, 4)
+        """), {"wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot)})
+        for evt, delta in [('SHIP', -7), ('ADJUST_IN', 1)]:
+            c.execute(text("""
+                INSERT INTO core.stock_ledger
+                (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+                VALUES (current_setting('app.tenant_id')::uuid, :evt, :wh, :loc, :prod, :lot, :delta, gen_random_uuid())
+            """), {"evt": evt, "wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot), "delta": delta})
+
+        rows = c.execute(text("""
+           SELECT qty FROM dw.current_stock
+           WHERE tenant_id = current_setting('app.tenant_id')::uuid
+             AND product_id = :p AND lot_id = :lot AND warehouse_id = :wh AND location_id = :loc
+        """), {"p": str(prod), "lot": str(lot), "wh": str(wh), "loc": str(loc)}).scalars().all()
+
+        assert rows == [14]
+
+
+def test_month_close_checkpoint_plus_tail(closed_ledger_month, engine_app, tenant_ids):
+    import datetime as dt
+    import pytest
+    from sqlalchemy.exc import IntegrityError
+    from backend.services.allocation import _select_candidates
+
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    wh = uuid.uuid4()
+    loc = uuid.uuid4()
+    lot = uuid.uuid4()
+    last_month = closed_ledger_month
+    backdated = dt.datetime.combine(last_month + dt.timedelta(days=14), dt.time(12), tzinfo=dt.timezone.utc)
+
+    insert_event = text("""
+        INSERT INTO core.stock_ledger
+        (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id, ts)
+        VALUES (current_setting('app.tenant_id')::uuid, :evt, :wh, :loc, :prod, :lot, :delta, gen_random_uuid(),
+                COALESCE(CAST(:ts AS timestamptz), now()))
+    """)
+    refs = {"wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot)}
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(text("INSERT INTO core.products (id, tenant_id, sku, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'SKU-CKPT', 'Thing')"), {"id": str(prod)})
+        c.execute(text("INSERT INTO core.warehouses (id, tenant_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'W-CKPT','W')"), {"id": str(wh)})
+        c.execute(text("INSERT INTO core.locations (id, tenant_id, warehouse_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, :wh, 'L-CKPT','L')"), {"id": str(loc), "wh": str(wh)})
+        c.execute(text("INSERT INTO core.lots (id, tenant_id, product_id, lot_number) VALUES (:id, current_setting('app.tenant_id')::uuid, :p, 'LOT-CKPT')"), {"id": str(lot), "p": str(prod)})
+        c.execute(insert_event, {**refs, "evt": "RECEIPT", "delta": 10, "ts": backdated})
+        c.execute(insert_event, {**refs, "evt": "SHIP", "delta": -4, "ts": backdated})
+
+    with engine_app.begin() as c:
+        c.execute(text("SELECT core.close_stock_ledger_month(:m)"), {"m": last_month})
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(insert_event, {**refs, "evt": "RECEIPT", "delta": 5, "ts": None})
+
+        checkpoint = c.execute(text("""
+            SELECT qty, shipped_qty FROM core.stock_balance_checkpoints
+            WHERE as_of = core.stock_checkpoint_watermark() AND product_id = :p AND lot_id = :lot
+        """), {"p": str(prod), "lot": str(lot)}).one()
+        assert (checkpoint.qty, checkpoint.shipped_qty) == (6, 4)
+
+        on_hand = c.execute(text("""
+            SELECT SUM(qty) FROM core.stock_balance_rows WHERE product_id = :p AND lot_id = :lot
+        """), {"p": str(prod), "lot": str(lot)}).scalar_one()
+        assert on_hand == 11
+        candidates = _select_candidates(c, prod)
+        assert [int(r["available_qty"]) for r in candidates] == [11]
+
+    # The closed month no longer accepts events
+    with pytest.raises(IntegrityError):
+        with engine_app.begin() as c:
+            c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+            c.execute(insert_event, {**refs, "evt": "ADJUST_IN", "delta": 1, "ts": backdated})
+
+
+def test_stock_as_of_combines_checkpoint_and_tail(closed_ledger_month, api_client, engine_app, tenant_ids):
+    import datetime as dt
+
+    client, _ = api_client
+    t1, _ = tenant_ids
+    prod, wh, loc, lot = (uuid.uuid4() for _ in range(4))
+    last_month = closed_ledger_month
+
+    with engine_app.begin() as c:
+        c.execute(text("SELECT core.close_stock_ledger_month(:m)"), {"m": last_month})
+
+    insert_event = text("""
+        INSERT INTO core.stock_ledger
+        (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+        VALUES (current_setting('app.tenant_id')::uuid, :evt, :wh, :loc, :prod, :lot, :delta, gen_random_uuid())
+    """)
+    refs = {"wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot)}
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(text("INSERT INTO core.products (id, tenant_id, sku, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'SKU-ASOF', 'Thing')"), {"id": str(prod)})
+        c.execute(text("INSERT INTO core.warehouses (id, tenant_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'W-ASOF','W')"), {"id": str(wh)})
+        c.execute(text("INSERT INTO core.locations (id, tenant_id, warehouse_id, code, name) VALUES (:id, current_setting('app.tenant_id')::uuid, :wh, 'L-ASOF','L')"), {"id": str(loc), "wh": str(wh)})
+        c.execute(text("INSERT INTO core.lots (id, tenant_id, product_id, lot_number) VALUES (:id, current_setting('app.tenant_id')::uuid, :p, 'LOT-ASOF')"), {"id": str(lot), "p": str(prod)})
+        c.execute(insert_event, {**refs, "evt": "RECEIPT", "delta": 10})
+    with engine_app.begin() as c:
+        between = c.execute(text("SELECT now()")).scalar_one()
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(insert_event, {**refs, "evt": "SHIP", "delta": -3})
+    with engine_app.begin() as c:
+        after = c.execute(text("SELECT now()")).scalar_one()
+
+    headers = {"X-Tenant-Id": str(t1)}
+
+    def as_of(ts, **filters):
+        return client.get("/api/stock_as_of", query_string={"ts": ts.isoformat(), **filters}, headers=headers)
+
+    resp = as_of(between, product_id=str(prod))
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [(i["lot_id"], i["qty"]) for i in body["items"]] == [(str(lot), 10)]
+    assert body["checkpoint"] is not None and body["closed"] is False
+
+    assert [i["qty"] for i in as_of(after, product_id=str(prod)).get_json()["items"]] == [7]
+    assert [i["qty"] for i in as_of(after, warehouse_id=str(wh)).get_json()["items"]] == [7]
+
+    # Closed month: immutable, served from the cache on the second call
+    closed_ts = dt.datetime.combine(last_month + dt.timedelta(days=10), dt.time(12), tzinfo=dt.timezone.utc)
+    first = as_of(closed_ts, product_id=str(prod))
+    assert (first.get_json()["closed"], first.get_json()["items"]) == (True, [])
+    assert first.headers["X-Cache"] == "miss"
+    assert as_of(closed_ts, product_id=str(prod)).headers["X-Cache"] == "hit"
+
+    assert as_of(after).status_code == 400
@@ -0,0 +1,56 @@
+from __future__ import annotations
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from backend.services.datagen import generate
+
+
+def test_datagen_is_deterministic_and_tenant_scoped(engine_app):
+    url = engine_app.url.render_as_string(hide_password=False)
+    this_month = date.today().replace(day=1)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    month_before = (last_month - timedelta(days=1)).replace(day=1)
+    args = dict(seed=7, tenants=2, products=30, warehouses=2, locations=4, months=2,
+                events=300, orders=10, hold_ratio=0.5, batch_rows=250, workers=2)
+
+    # Rows are spread over whole months: a month that has not ended would get future-dated rows
+    with pytest.raises(ValueError):
+        generate(url, **{**args, "end_month": this_month})
+
+    first = generate(url, **args)
+    assert first["months"] == [month_before.strftime("%Y-%m"), last_month.strftime("%Y-%m")]
+    assert first["ledger_rows"] == first["rows_generated"] > 2 * 2 * 300
+    assert 0 < first["allocated_orders"] <= 2 * 5 and first["allocated_qty"] > 0
+
+    # Same seed: same rows (op ids included), so nothing new is inserted or allocated
+    again = generate(url, **{**args, "workers": 1})
+    assert again["rows_generated"] == first["rows_generated"]
+    assert again["ledger_rows"] == 0 and again["allocated_orders"] == 0
+
+    t1 = first["tenant_ids"][0]
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": t1})
+        visible = c.execute(
+            text("SELECT array_agg(DISTINCT tenant_id::text) FROM core.stock_ledger WHERE reason = 'datagen'")
+        ).scalar_one()
+        assert visible == [t1]
+        latest = c.execute(text("SELECT max(ts) FROM core.stock_ledger WHERE reason = 'datagen'")).scalar_one()
+        assert latest < datetime.combine(this_month, datetime.min.time(), timezone.utc)
+        negative = c.execute(
+            text("SELECT count(*) FROM dw.current_stock WHERE tenant_id = CAST(:t AS uuid) AND qty < 0"), {"t": t1}
+        ).scalar_one()
+        assert negative == 0
+        held = c.execute(text("SELECT count(DISTINCT order_id) FROM core.holds WHERE released_at IS NULL")).scalar_one()
+        assert 0 < held <= 5
+        # Every receipt went into its own month's lot, and lots carry an expiry date
+        lots = c.execute(
+            text("""
+                SELECT count(*) FILTER (WHERE l.lot_number <> 'L' || to_char(s.ts AT TIME ZONE 'UTC', 'YYYYMM')),
+                       count(*) FILTER (WHERE l.expiry_date IS NULL)
+                  FROM core.stock_ledger s JOIN core.lots l ON l.id = s.lot_id
+                 WHERE s.reason = 'datagen' AND s.event_type = 'RECEIPT'
+            """)
+        ).one()
+        assert tuple(lots) == (0, 0)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from backend.services.ingest import normalize_stock_event
+from backend.services.ledger_writer import DuplicateOpId, LedgerWriter
+from tests.test_api_endpoints import _insert_core_refs
+
+
+def _event(product_id, warehouse_id, location_id, lot_id, **extra):
+    return normalize_stock_event({
+        "event_type": "RECEIPT",
+        "product_id": str(product_id),
+        "warehouse_id": str(warehouse_id),
+        "location_id": str(location_id),
+        "lot_id": str(lot_id),
+        "qty": 1,
+        **extra,
+    })
+
+
+def test_group_commit_writer_batches_and_rejects_per_event(engine_app, tenant_ids):
+    tenant_id, _ = tenant_ids
+    product_id, warehouse_id, location_id, lot_id = (uuid.uuid4() for _ in range(4))
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-GC")
+
+    writer = LedgerWriter(engine_app, max_batch=64, max_delay_ms=20)
+    try:
+        events = [_event(product_id, warehouse_id, location_id, lot_id) for _ in range(40)]
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            results = list(pool.map(lambda e: writer.write(tenant_id, e), events))
+        assert len({r["id"] for r in results}) == 40
+        assert writer.batches < 40  # concurrent requests shared commits
+
+        with pytest.raises(DuplicateOpId):
+            writer.write(tenant_id, events[0])
+
+        # An event failing a foreign key fails alone; the rest of its batch still commits.
+        good = [_event(product_id, warehouse_id, location_id, lot_id) for _ in range(5)]
+        bad = _event(uuid.uuid4(), warehouse_id, location_id, lot_id)
+        futures = [writer.submit(tenant_id, e) for e in (*good[:2], bad, *good[2:])]
+        with pytest.raises(IntegrityError):
+            futures[2].result(10)
+        assert all(f.result(10)["op_id"] for i, f in enumerate(futures) if i != 2)
+    finally:
+        writer.stop(5)
+
+    with engine_app.begin() as conn:
+        conn.execute(text("SET app.tenant_id = :t"), {"t": str(tenant_id)})
+        qty = conn.execute(
+            text("SELECT COALESCE(SUM(qty_delta), 0) FROM core.stock_ledger WHERE product_id = :p"),
+            {"p": str(product_id)},
+        ).scalar_one()
+    assert qty == 45
+
+
+def test_direct_path_rejects_a_retried_op_id_like_the_writer(api_client, engine_app, tenant_ids):
+    client, _ = api_client
+    tenant_id, _ = tenant_ids
+    product_id, warehouse_id, location_id, lot_id = (uuid.uuid4() for _ in range(4))
+    with engine_app.begin() as conn:
+        _insert_core_refs(conn, tenant_id, product_id, warehouse_id, location_id, lot_id, sku="SKU-RETRY")
+
+    headers = {"X-Tenant-Id": str(tenant_id), "X-Api-Token": "test-token"}
+    body = {
+        "event_type": "RECEIPT",
+        "product_id": str(product_id),
+        "warehouse_id": str(warehouse_id),
+        "location_id": str(location_id),
+        "lot_id": str(lot_id),
+        "qty": 1,
+        "op_id": str(uuid.uuid4()),
+    }
+    # No ts: each attempt is stamped now(), so only the op_id says it is a retry
+    assert client.post("/api/stock_events", json=body, headers=headers).status_code == 201
+    resp = client.post("/api/stock_events", json=body, headers=headers)
+    assert resp.status_code == 409 and resp.get_json()["error"] == "duplicate op_id"
+
+    writer = LedgerWriter(engine_app)
+    try:
+        with pytest.raises(DuplicateOpId):
+            writer.write(tenant_id, normalize_stock_event(body))
+    finally:
+        writer.stop(5)
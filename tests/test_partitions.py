@@ -0,0 +1,50 @@
+from __future__ import annotations
+import uuid
+from datetime import date
+
+from sqlalchemy import text
+
+from backend.services.partitions import PartitionManager, _add_months
+
+
+def test_rows_for_missing_month_land_in_default_and_move_on_create(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod = uuid.uuid4()
+    month = _add_months(date.today().replace(day=1), 30)  # well past any pre-made partition
+    row_id = uuid.uuid4()
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        c.execute(text("INSERT INTO core.products (id, tenant_id, sku, name) VALUES (:id, current_setting('app.tenant_id')::uuid, 'SKU-PART', 'Thing')"), {"id": str(prod)})
+        c.execute(text("""
+            INSERT INTO core.stock_ledger (id, tenant_id, ts, event_type, product_id, qty_delta, op_id)
+            VALUES (:id, current_setting('app.tenant_id')::uuid, :ts, 'RECEIPT', :prod, 4, gen_random_uuid())
+        """), {"id": str(row_id), "ts": month.replace(day=15), "prod": str(prod)})
+
+    where_row = """
+        SELECT c.relname FROM core.stock_ledger sl JOIN pg_class c ON c.oid = sl.tableoid
+         WHERE sl.id = :id
+    """
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        assert c.execute(text(where_row), {"id": str(row_id)}).scalar_one() == "stock_ledger_default"
+
+    manager = PartitionManager(engine_app, premake_months=1, retention_months=0, interval=0)
+    assert month.isoformat() in [r["month"].isoformat() for r in manager.status()["default_partition_rows"]]
+
+    report = manager.run_once()
+    assert report["ok"], report
+    created = [s for s in report["steps"] if s["target"] == month.strftime("%Y-%m")]
+    assert created and created[0]["rows_moved"] >= 1
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        assert c.execute(text(where_row), {"id": str(row_id)}).scalar_one() == f"stock_ledger_{month:%Y_%m}"
+        # Moving rows between partitions must not re-apply them to the projection.
+        qty = c.execute(text("SELECT qty FROM dw.current_stock WHERE product_id = :p"), {"p": str(prod)}).scalar_one()
+        assert qty == 4
+
+    # Idempotent: nothing left to create or move.
+    again = manager.run_once()
+    assert all("rows_moved" not in s for s in again["steps"] if s["action"] == "create")
+    assert not manager.status()["missing_months"]
@@ -0,0 +1,249 @@
+from __future__ import annotations
+import json
+import re
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend.services.product_search import SEARCH_CANDIDATE_PAGES
+from backend.services.sql_registry import sql_registry
+
+MATVIEWS = ("dw.current_stock_mv", "dw.product_abc_mv", "dw.inventory_aging_mv", "dw.reorder_candidates_mv")
+LARGE_TABLE_ROWS = 500  # after seeding + ANALYZE; anything smaller may legitimately be seq-scanned
+
+# Relations a statement is expected to read in full. MVs aggregate the whole open ledger tail, the
+# whole daily rollup or every open FIFO layer, and the reorder window (last 30 days) covers every
+# seeded row.
+ALLOWED_SEQ_SCANS = {
+    "dw.current_stock_mv": {"stock_ledger"},
+    "dw.product_abc_mv": {"stock_ledger", "fact_daily_movements"},
+    "dw.inventory_aging_mv": {"stock_fifo_layers"},
+    "dw.reorder_candidates_mv": {"stock_ledger", "fact_daily_movements"},
+}
+
+PARTITION_RE = re.compile(r"^stock_ledger_(\d{4}_\d{2}(_\w+)?|default)$")
+PARAM_RE = re.compile(r"(?<![:\w]):([a-z_]\w*)")
+
+
+def _relation(name: str) -> str:
+    return "stock_ledger" if PARTITION_RE.match(name) else name
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+@pytest.fixture()
+def seeded(pg_url):
+    """One tenant with 300 products, 1,200 lots, 12,000 ledger rows, 2,000 order lines, ~1,100 holds."""
+    owner = create_engine(pg_url, future=True)
+    t = str(uuid.uuid4())
+    with owner.begin() as c:
+        c.execute(text("INSERT INTO core.tenants (id, name) VALUES (:t, :name)"), {"t": t, "name": f"plans-{t}"})
+        c.execute(text("""
+            INSERT INTO core.products (tenant_id, sku, name)
+            SELECT :t, 'PLAN-' || g, 'Plan product ' || g FROM generate_series(1, 300) g
+        """), {"t": t})
+        c.execute(text("""
+            INSERT INTO core.warehouses (tenant_id, code, name)
+            SELECT :t, 'PW' || g, 'PW' || g FROM generate_series(1, 2) g
+        """), {"t": t})
+        c.execute(text("""
+            INSERT INTO core.locations (tenant_id, warehouse_id, code, name)
+            SELECT :t, w.id, 'PL' || g, 'PL' || g
+              FROM core.warehouses w, generate_series(1, 5) g
+             WHERE w.tenant_id = :t
+        """), {"t": t})
+        c.execute(text("""
+            INSERT INTO core.lots (tenant_id, product_id, lot_number, expiry_date)
+            SELECT :t, p.id, 'L' || g, current_date + g * 30
+              FROM core.products p, generate_series(1, 4) g
+             WHERE p.tenant_id = :t
+        """), {"t": t})
+        c.execute(text("""
+            WITH locs AS (
+              SELECT id, warehouse_id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM core.locations WHERE tenant_id = :t
+            )
+            INSERT INTO core.stock_ledger
+              (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+            SELECT :t, CASE WHEN g <= 7 THEN 'RECEIPT' ELSE 'SHIP' END, locs.warehouse_id, locs.id,
+                   l.product_id, l.id, CASE WHEN g <= 7 THEN 10 ELSE -3 END, gen_random_uuid()
+              FROM core.lots l
+              CROSS JOIN generate_series(1, 10) g
+              JOIN locs ON locs.n = (g % 2)
+             WHERE l.tenant_id = :t
+        """), {"t": t})
+        c.execute(text("""
+            INSERT INTO core.orders (tenant_id, status)
+            SELECT :t, 'open' FROM generate_series(1, 1000)
+        """), {"t": t})
+        c.execute(text("""
+            INSERT INTO core.order_lines (tenant_id, order_id, product_id, qty)
+            SELECT :t, o.id, p.id, 1 + g
+              FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM core.orders WHERE tenant_id = :t) o
+              CROSS JOIN generate_series(1, 2) g
+              JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM core.products WHERE tenant_id = :t) p
+                ON p.n = 1 + (o.n * 2 + g) % 300
+        """), {"t": t})
+        # One active hold per product on the first location; released holds on the second location
+        # use disjoint time ranges so holds_no_overlap accepts them.
+        c.execute(text("""
+            WITH lines AS (
+              SELECT ol.id, ol.order_id, ol.product_id, row_number() OVER (ORDER BY ol.id) AS n
+                FROM core.order_lines ol WHERE ol.tenant_id = :t
+            ), lots AS (
+              SELECT DISTINCT ON (l.product_id) l.id, l.product_id
+                FROM core.lots l WHERE l.tenant_id = :t ORDER BY l.product_id, l.id
+            ), locs AS (
+              SELECT id, warehouse_id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM core.locations WHERE tenant_id = :t
+            )
+            INSERT INTO core.holds
+              (tenant_id, order_id, order_line_id, product_id, lot_id, warehouse_id, location_id, qty,
+               created_at, released_at)
+            SELECT :t, lines.order_id, lines.id, lines.product_id, lots.id, locs.warehouse_id, locs.id, 1,
+                   now() - make_interval(mins => 2 * lines.n::int + 2),
+                   CASE WHEN locs.n = 1 THEN now() - make_interval(mins => 2 * lines.n::int + 1) END
+              FROM lines
+              JOIN lots ON lots.product_id = lines.product_id
+              JOIN locs ON locs.n = 1 OR (locs.n = 0 AND NOT EXISTS (
+                SELECT 1 FROM lines prev
+                 WHERE prev.product_id = lines.product_id AND prev.n < lines.n))
+             WHERE lines.n <= 800
+        """), {"t": t})
+        for table in ("core.products", "core.lots", "core.stock_ledger", "core.orders", "core.order_lines",
+                      "core.holds", "dw.current_stock", "dw.stock_fifo_layers", "core.stock_balance_checkpoints"):
+            c.execute(text(f"ANALYZE {table}"))
+        sizes = {
+            r.relname: r.reltuples
+            for r in c.execute(text("""
+                SELECT c.relname, c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                 WHERE n.nspname IN ('core', 'dw') AND c.relkind IN ('r', 'm')
+            """))
+        }
+        sample = c.execute(text("""
+            SELECT o.id AS order_id, ol.id AS order_line_id, l.product_id, l.id AS lot_id,
+                   sl.warehouse_id, sl.location_id
+              FROM core.orders o
+              JOIN core.order_lines ol ON ol.order_id = o.id
+              JOIN core.lots l ON l.product_id = ol.product_id
+              JOIN core.stock_ledger sl ON sl.lot_id = l.id
+             WHERE o.tenant_id = :t
+             LIMIT 1
+        """), {"t": t}).mappings().one()
+    large = {_relation(name) for name, rows in sizes.items() if rows >= LARGE_TABLE_ROWS}
+    yield uuid.UUID(t), dict(sample), large, owner
+    owner.dispose()
+
+
+def _params(sql: str, sample: dict) -> dict:
+    values = {
+        "product_id": str(sample["product_id"]),
+        "order_id": str(sample["order_id"]),
+        "order_line_id": str(sample["order_line_id"]),
+        "lot_id": str(sample["lot_id"]),
+        "warehouse_id": str(sample["warehouse_id"]),
+        "location_id": str(sample["location_id"]),
+        "order_ids": [str(sample["order_id"])],
+        "product_ids": [str(sample["product_id"])],
+        "lot_ids": [str(sample["lot_id"])],
+        "lock_keys": [1],
+        "take_limit": 64,
+        "slot_no": 0,
+        "slot_seed": 0,
+        "holds": "[]",
+        "options": "{}",
+        "id": str(uuid.uuid4()),
+        "qty": 1,
+        "wh": str(sample["warehouse_id"]),
+        "loc": str(sample["location_id"]),
+        "prod": str(sample["product_id"]),
+        "lot": str(sample["lot_id"]),
+        "ord": str(sample["order_id"]),
+        "ol": str(sample["order_line_id"]),
+        "delta": -1,
+        "reason": "plan check",
+        "op_id": str(uuid.uuid4()),
+        "only_needed": False,
+        "limit": 50,
+    }
+    return {name: values[name] for name in set(PARAM_RE.findall(sql))}
+
+
+def _offending_scans(conn, label: str, sql: str, params: dict | None, large: set) -> list[str]:
+    explain = f"EXPLAIN (FORMAT JSON) {sql}"
+    if params is None:  # server-rendered SQL: no bind parameters to parse
+        raw = conn.exec_driver_sql(explain).scalar_one()
+    else:
+        raw = conn.execute(text(explain), params).scalar_one()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    allowed = ALLOWED_SEQ_SCANS.get(label, set())
+    return [
+        f"{label}: Seq Scan on {rel}"
+        for rel in _seq_scans(plan)
+        if _relation(rel) in large and _relation(rel) not in allowed
+    ]
+
+
+def test_hot_queries_avoid_seq_scans_on_large_tables(engine_app, seeded):
+    tenant_id, sample, large, owner = seeded
+    assert {"stock_ledger", "holds", "lots", "order_lines"} <= large
+
+    statements = {}
+    for file in ("allocate", "current_stock", "analytics"):
+        for name in sql_registry.statements(file):
+            statements[f"{file}.sql:{name}"] = sql_registry.source(f"{file}.{name}")
+
+    offending: list[str] = []
+    with engine_app.connect() as c:
+        with c.begin():
+            c.execute(text("SELECT set_config('app.tenant_id', :t, true)"), {"t": str(tenant_id)})
+            for label, sql in statements.items():
+                offending += _offending_scans(c, label, sql, _params(sql, sample), large)
+
+    # MV refreshes run as the owner (no RLS), over every tenant.
+    with owner.connect() as c:
+        for view in MATVIEWS:
+            definition = c.execute(
+                text("SELECT pg_get_viewdef(CAST(:v AS regclass))"), {"v": view}
+            ).scalar_one().rstrip().rstrip(";")
+            offending += _offending_scans(c, view, definition, None, large)
+
+    assert not offending, "sequential scans on large tables:\n" + "\n".join(offending)
+
+
+def test_broad_product_search_ranks_a_bounded_candidate_set(engine_app, seeded):
+    """
+    A term matching all 300 seeded products: product_search_keyset ranks only the page's
+    candidates, and the GiST index can hand them out nearest-first.
+    """
+    tenant_id, _, _, _ = seeded
+    sql = sql_registry.source("product_search.product_search_keyset")
+    limit = 5
+    params = {"q": "plan", "limit": limit, "candidates": limit * SEARCH_CANDIDATE_PAGES,
+              "after_rank": None, "after_id": None}
+    plans = {}
+    with engine_app.connect() as c:
+        for seqscan in ("on", "off"):
+            with c.begin():
+                c.execute(text("SELECT set_config('app.tenant_id', :t, true)"), {"t": str(tenant_id)})
+                c.execute(text("SELECT set_config('enable_seqscan', :v, true)"), {"v": seqscan})
+                raw = c.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar_one()
+            plans[seqscan] = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+    for plan in plans.values():
+        ranked = next(node for node in _nodes(plan) if node["Node Type"] == "Sort")["Plans"][0]
+        assert ranked["Actual Rows"] == limit * SEARCH_CANDIDATE_PAGES < 300
+        assert plan["Actual Rows"] == limit
+    assert "ix_products_search_knn" in {node.get("Index Name") for node in _nodes(plans["off"])}
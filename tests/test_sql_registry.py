@@ -0,0 +1,45 @@
+from __future__ import annotations
+import uuid
+
+from sqlalchemy import text
+
+from backend.services.sql_registry import SqlRegistry, sql_registry
+
+
+def test_every_named_statement_validates_against_schema(engine_app):
+    with engine_app.connect() as conn:
+        assert sql_registry.validate(conn) == {}
+
+
+def test_registry_reports_broken_statements(engine_app, tmp_path):
+    (tmp_path / "sample.sql").write_text(
+        "-- name: ok\nSELECT id FROM core.products WHERE id = :id;\n\n"
+        "-- name: broken\nSELECT no_such_column FROM core.products WHERE id = :id;\n",
+        encoding="utf-8",
+    )
+    registry = SqlRegistry(query_dir=tmp_path, prepared=())
+    with engine_app.connect() as conn:
+        errors = registry.validate(conn)
+    assert set(errors) == {"sample.broken"}
+    assert "no_such_column" in errors["sample.broken"]
+
+
+def test_hot_statements_are_prepared_and_timed(engine_app, tenant_ids):
+    tenant_id, _ = tenant_ids
+    registry = SqlRegistry(prepared=["current_stock.current_stock"])
+    registry.instrument(engine_app)
+
+    with engine_app.connect() as conn:
+        conn.execute(text("SELECT set_config('app.tenant_id', :t, false)"), {"t": str(tenant_id)})
+        for _ in range(3):
+            conn.execute(registry["current_stock.current_stock"], {"product_id": str(uuid.uuid4())}).all()
+        prepared = conn.execute(
+            text("SELECT count(*) FROM pg_prepared_statements WHERE statement LIKE '%dw.current_stock%'")
+        ).scalar_one()
+        conn.rollback()
+    assert prepared >= 1
+
+    stats = {row["statement"]: row for row in registry.stats()}
+    entry = stats["current_stock.current_stock"]
+    assert entry["calls"] == 3 and entry["errors"] == 0 and entry["prepared"]
+    assert entry["max_ms"] >= entry["mean_ms"] > 0
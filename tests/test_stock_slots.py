@@ -0,0 +1,171 @@
+from __future__ import annotations
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from backend.services import allocation
+from backend.services.allocation import allocate_order, release_order
+from backend.services.stock_slots import StockSlotRebalancer
+from tests.test_allocation import create_order, setup_stock
+
+# The rebalancer runs across tenants; a threshold no other test reaches keeps it on these lots.
+HOT = 1_000_000
+
+
+def _hot_lot(engine, tenant, slots=4):
+    prod, wh, loc, lot = (uuid.uuid4() for _ in range(4))
+    with engine.begin() as c:
+        setup_stock(c, tenant, prod, wh, loc, lot, HOT)
+    assert StockSlotRebalancer(engine, slots=slots, min_qty=HOT, interval=0).run_once()["created_keys"] >= 1
+    return prod, wh, loc, lot
+
+
+def _budgets(engine, tenant, lot):
+    with engine.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        return c.execute(
+            text("SELECT array_agg(qty ORDER BY slot_no) FROM core.stock_slots WHERE lot_id = :l"), {"l": str(lot)}
+        ).scalar_one()
+
+
+def _projection(engine, tenant, lot):
+    """(dw.current_stock.qty, sum of the buckets' pending_qty) of the lot's one location."""
+    with engine.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        return tuple(c.execute(
+            text("""
+                SELECT cs.qty, (SELECT COALESCE(SUM(pending_qty), 0) FROM core.stock_slots WHERE lot_id = :l)
+                  FROM dw.current_stock cs WHERE cs.lot_id = :l
+            """),
+            {"l": str(lot)},
+        ).one())
+
+
+def _free(engine, tenant, lot):
+    return sum(_projection(engine, tenant, lot))
+
+
+def _ledger(engine, tenant, event_type, prod, wh, loc, lot, delta):
+    with engine.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(tenant)})
+        c.execute(
+            text("""
+                INSERT INTO core.stock_ledger
+                (tenant_id, event_type, warehouse_id, location_id, product_id, lot_id, qty_delta, op_id)
+                VALUES (current_setting('app.tenant_id')::uuid, :e, :wh, :loc, :prod, :lot, :delta, gen_random_uuid())
+            """),
+            {"e": event_type, "wh": str(wh), "loc": str(loc), "prod": str(prod), "lot": str(lot), "delta": delta},
+        )
+
+
+def test_slotted_allocation_proceeds_while_the_lot_is_locked(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod, _, _, lot = _hot_lot(engine_app, t1)
+    assert _budgets(engine_app, t1, lot) == [HOT // 4] * 4
+    with engine_app.begin() as c:
+        o1, o2 = create_order(c, t1, prod, 10), create_order(c, t1, prod, 10)
+
+    # Another allocator is mid-flight: it holds the lot row and the first bucket
+    with engine_app.connect() as busy:
+        with busy.begin():
+            busy.execute(text("SET LOCAL app.tenant_id = :t"), {"t": str(t1)})
+            busy.execute(text("SELECT 1 FROM core.lots WHERE id = :l FOR UPDATE"), {"l": str(lot)})
+            busy.execute(
+                text("SELECT 1 FROM core.stock_slots WHERE lot_id = :l AND slot_no = 0 FOR UPDATE"), {"l": str(lot)}
+            )
+            unslotted = allocate_order(engine_app, tenant_id=t1, order_id=o2, request_hint={}, slotted=False)
+            slotted = allocate_order(engine_app, tenant_id=t1, order_id=o1, request_hint={}, slotted=True)
+    assert unslotted["lines"][0]["allocated"] == 0
+    assert slotted["lines"][0]["allocated"] == 10
+
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        hold = c.execute(
+            text("SELECT slot_no, qty FROM core.holds WHERE order_id = :o AND released_at IS NULL"), {"o": str(o1)}
+        ).one()
+    assert hold.slot_no != 0 and hold.qty == 10
+    assert sum(_budgets(engine_app, t1, lot)) == _free(engine_app, t1, lot) == HOT - 10
+    assert _projection(engine_app, t1, lot) == (HOT, -10)  # the RESERVE only wrote its bucket
+
+    release_order(engine_app, t1, o1)
+    assert _budgets(engine_app, t1, lot) == [HOT // 4] * 4  # units went back to their bucket
+    assert _projection(engine_app, t1, lot) == (HOT, 0)
+
+
+def test_request_body_cannot_turn_on_slotting(engine_app, tenant_ids, monkeypatch):
+    t1, _ = tenant_ids
+    monkeypatch.setattr(allocation, "ALLOCATION_SLOTS", 0)
+    prod, _, _, lot = _hot_lot(engine_app, t1)
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 10)
+
+    with engine_app.connect() as busy:
+        with busy.begin():
+            busy.execute(text("SET LOCAL app.tenant_id = :t"), {"t": str(t1)})
+            busy.execute(text("SELECT 1 FROM core.lots WHERE id = :l FOR UPDATE"), {"l": str(lot)})
+            res = allocate_order(engine_app, tenant_id=t1, order_id=order, request_hint={"slotted": True})
+    assert res["lines"][0]["allocated"] == 0
+    assert _budgets(engine_app, t1, lot) == [HOT // 4] * 4
+
+
+def test_concurrent_allocators_share_one_hot_lot(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    # At least one bucket per allocator, as in the benchmark: nobody has to come back empty
+    threads_n = 8
+    prod, _, _, lot = _hot_lot(engine_app, t1, slots=2 * threads_n)
+    with engine_app.begin() as c:
+        orders = [create_order(c, t1, prod, 7) for _ in range(threads_n)]
+
+    results = []
+
+    def worker(order_id):
+        res = allocate_order(engine_app, tenant_id=t1, order_id=order_id, request_hint={}, slotted=True)
+        results.append(res["lines"][0]["allocated"])
+
+    threads = [threading.Thread(target=worker, args=(o,)) for o in orders]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [7] * threads_n
+    with engine_app.begin() as c:
+        c.execute(text("SET app.tenant_id = :t"), {"t": str(t1)})
+        held = c.execute(
+            text("SELECT COALESCE(SUM(qty), 0) FROM core.holds WHERE lot_id = :l AND released_at IS NULL"),
+            {"l": str(lot)},
+        ).scalar_one()
+    # Nothing over-allocated: what is held plus what is free is exactly what was received
+    budgets = _budgets(engine_app, t1, lot)
+    assert held == 7 * threads_n
+    assert min(budgets) >= 0 and sum(budgets) == _free(engine_app, t1, lot) == HOT - held
+
+
+def test_outflows_trim_slots_and_rebalance_folds_and_respreads(engine_app, tenant_ids):
+    t1, _ = tenant_ids
+    prod, wh, loc, lot = _hot_lot(engine_app, t1)
+    # Ship almost everything: the shipment trims the buckets to what is left
+    _ledger(engine_app, t1, "SHIP", prod, wh, loc, lot, -(HOT - 100))
+    assert _budgets(engine_app, t1, lot) == [25] * 4
+    with engine_app.begin() as c:
+        order = create_order(c, t1, prod, 500)
+
+    res = allocate_order(engine_app, tenant_id=t1, order_id=order, request_hint={}, slotted=True)
+    assert res["lines"][0]["allocated"] == 100
+    assert _budgets(engine_app, t1, lot) == [0] * 4
+    assert _projection(engine_app, t1, lot) == (100, -100)
+
+    # An unslotted reservation cannot take what the buckets already handed out
+    with pytest.raises(DBAPIError) as exc:
+        _ledger(engine_app, t1, "RESERVE", prod, wh, loc, lot, -1)
+    assert exc.value.orig.sqlstate == "40001"
+
+    # A receipt and a new bucket count: the next run folds the deltas and re-spreads what is free
+    _ledger(engine_app, t1, "RECEIPT", prod, wh, loc, lot, HOT + 3)
+    report = StockSlotRebalancer(engine_app, slots=3, min_qty=HOT, interval=0).run_once()
+    assert report["ok"] and report["rebalanced_keys"] >= 1
+    assert _budgets(engine_app, t1, lot) == [HOT // 3 + 2, HOT // 3 + 1, HOT // 3 + 1]
+    assert _projection(engine_app, t1, lot) == (HOT + 3, 0)